@@ -17,6 +17,7 @@ from ixian.task import Task
 from ixian.config import CONFIG
 from ixian.modules.filesystem.file_hash import FileHash
 from ixian_docker.modules.docker.checker import (
+    All,
     DockerVolumeExists,
     DockerImageExists,
 )
@@ -52,7 +53,7 @@ class BuildBowerImage(Task):
             dockerfile=CONFIG.BOWER.DOCKERFILE,
             force=self.__task__.force,
             pull=pull,
-            # recheck=self.check.check,
+            recheck=All(*self.check),
             buildargs={
                 "FROM_REPOSITORY": CONFIG.DOCKER.REPOSITORY,
                 "FROM_TAG": CONFIG.DOCKER.BASE_IMAGE_TAG,
@@ -3,6 +3,7 @@ OPTIONS = {
     "tasks": "ixian_docker.modules.django.tasks",
     "config": "ixian_docker.modules.django.config.DjangoConfig",
     "dockerfile_template": "{DJANGO.MODULE_DIR}/Dockerfile.template",
+    "dockerfile_dependencies_template": "{DJANGO.MODULE_DIR}/Dockerfile.dependencies.template",
     # Runtime volumes mounted in all environments.
     "volumes": [],
 }
@@ -14,9 +14,11 @@
 
 import docker
 
-from ixian.check.checker import MultiValueChecker
+from ixian.check.checker import Checker, MultiValueChecker, hash_object
 from ixian.config import CONFIG
 from ixian_docker.modules.docker.utils.client import docker_client
+from ixian_docker.modules.docker.utils.spans import span
+from ixian_docker.modules.docker.utils.volumes import find_volumes
 
 
 class DockerVolumeExists(MultiValueChecker):
@@ -25,17 +27,16 @@ class DockerVolumeExists(MultiValueChecker):
     keys are volume tags.
     """
 
+    @span("DockerVolumeExists.state")
     def state(self):
-        volume_ids = {}
-        for volume_tag in self.keys:
-            try:
-                volume = docker_client().volumes.get(volume_tag)
-            except docker.errors.NotFound:
-                volume_id = None
-            else:
-                volume_id = volume.id
-            volume_ids[volume_tag] = volume_id
-        return volume_ids
+        """
+        State is the current set of volume ids. Volumes are found with a single query.
+        """
+        volumes = find_volumes(*self.keys)
+        return {
+            volume_tag: volumes[volume_tag].id if volume_tag in volumes else None
+            for volume_tag in self.keys
+        }
 
 
 class DockerImageExists(MultiValueChecker):
@@ -50,6 +51,7 @@ class DockerImageExists(MultiValueChecker):
         """All images must be present for this checker to pass"""
         return all((self.state().get(key) for key in self.keys))
 
+    @span("DockerImageExists.state")
     def state(self):
         """
         State is the current set of image ids.
@@ -70,3 +72,61 @@ class DockerImageExists(MultiValueChecker):
                 image_id = image.id
             image_ids[image_tag] = image_id
         return image_ids
+
+
+class All(Checker):
+    """Composite checker that aggregates a list of checkers.
+
+    The checker passes if all of its checkers pass. State is the state of the checkers that
+    contribute to task state, e.g. ``FileHash``.
+
+    ``recheck`` is used after pulling an image. It confirms the pulled image satisfies the
+    checkers: contributing state hasn't changed since ``snapshot`` was called, and the other
+    checkers, e.g. ``DockerImageExists``, pass. State is only computed when it's needed, hashing
+    files is skipped unless an image is pulled. Calling the checker rechecks it.
+
+    :Example:
+
+    build_image_if_needed(..., recheck=All(*self.check))
+    """
+
+    def __init__(self, *checkers):
+        assert len(checkers) != 0, "At least one checker must be given"
+        self.checkers = checkers
+        self.initial_state = None
+
+    def snapshot(self):
+        """
+        Record contributing state, ``recheck`` fails if it changes after. Called before pulling.
+        """
+        self.initial_state = self.state()
+
+    def state(self):
+        return [checker.state() for checker in self.checkers if checker.contribute_to_task_state]
+
+    def check(self):
+        """All checkers must pass for this checker to pass"""
+        return all(checker.check() for checker in self.checkers)
+
+    def recheck(self):
+        """
+        Check that contributing state is unchanged since ``snapshot`` and that all other checkers
+        pass.
+        """
+        if self.initial_state is not None and self.state() != self.initial_state:
+            return False
+        return all(
+            checker.check() for checker in self.checkers if not checker.contribute_to_task_state
+        )
+
+    __call__ = recheck
+
+    def save(self):
+        for checker in self.checkers:
+            checker.save()
+
+    def filename(self):
+        return hash_object([checker.filename() for checker in self.checkers])
+
+    def clone(self):
+        return type(self)(*(checker.clone() for checker in self.checkers))
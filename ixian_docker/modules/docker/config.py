@@ -90,6 +90,23 @@ class DockerConfig(Config):
             volumes.extend(module_configs.get("dev_volumes", []))
         return volumes
 
+    @property
+    def NAMED_VOLUMES(self) -> List[str]:
+        """
+        Docker volumes mounted by :code:`compose`. They're created and labeled before compose runs
+        so :code:`docker_gc` collects them.
+
+        This property aggregates :code:`named_volumes` from modules that define it, for volumes
+        mounted by the compose file, and the sources of :code:`VOLUMES` and :code:`DEV_VOLUMES`.
+        Sources that are host paths are skipped when the volumes are created.
+        """
+        volumes = []
+        for module_configs in MODULES.values():
+            volumes.extend(module_configs.get("named_volumes", []))
+        for volume in CONFIG.DOCKER.VOLUMES + CONFIG.DOCKER.DEV_VOLUMES:
+            volumes.append(volume.split(":")[0])
+        return volumes
+
     @property
     def ENV(self):
         """
@@ -159,6 +176,9 @@ class DockerConfig(Config):
     DOCKERFILE: str = "Dockerfile"
     #: Path to Dockerfile used to build base image
     DOCKERFILE_BASE: str = "Dockerfile.base"
+    #: Jinja2 template that ``build_dockerfile`` renders ``DOCKER.DOCKERFILE`` from. Module
+    #: snippets are included in it.
+    DOCKERFILE_TEMPLATE: str = "{DOCKER.MODULE_DIR}/Dockerfile.template"
 
     #: Files needed to build the image. These images will be included in the image hash and will
     #: trigger rebuilds when changed.
@@ -174,6 +194,78 @@ class DockerConfig(Config):
     #: Module files added to docker build context.
     MODULE_CONTEXT: str = "{BUILDER_DIR}/module_context"
 
+    #: File recording the last time each volume managed by ixian was used.
+    VOLUME_USAGE_FILE: str = "{BUILDER}/volumes.json"
+
+    #: Disk budget, in bytes, for volumes managed by ixian. :code:`docker_gc` evicts the least
+    #: recently used volumes until they fit within the budget.
+    VOLUME_BUDGET: int = 10 * 2 ** 30
+
+    #: Remote docker daemons that may build images. Maps builder name to kwargs for
+    #: :code:`docker.DockerClient`, e.g. :code:`{"shared": {"base_url": "ssh://builder"}}`.
+    BUILDERS: Dict[str, Dict] = {}
+
+    #: Builder for each stage, e.g. :code:`{"wheelhouse": "shared"}`. Values are the name of a
+    #: builder in :code:`DOCKER.BUILDERS` or a list of builders to select the least loaded from.
+    #: Stages that aren't listed are built by the local docker daemon.
+    STAGE_BUILDERS: Dict[str, str] = {}
+
+    #: Record every docker API request and print a summary at exit. Same as running with
+    #: :code:`--trace-docker`, e.g. :code:`ix --trace-docker build_image`.
+    TRACE: bool = False
+
+    #: File to append spans to as OTLP/JSON, one line per run, e.g. :code:`{BUILDER}/spans.jsonl`.
+    #: Spans are recorded for builds, pulls, pushes, compose, and docker checkers.
+    SPANS_FILE: str = None
+
+    #: OTLP/HTTP collector to export spans to, e.g. :code:`http://localhost:4318/v1/traces`.
+    SPANS_ENDPOINT: str = None
+
+    #: Build report, JSON Lines. Every stage build appends a record with the decision made
+    #: (:code:`local-hit`, :code:`registry-pull` or :code:`build`), phase timings, bytes pulled,
+    #: and image size. Set to :code:`None` to disable.
+    BUILD_REPORT: str = "{BUILDER}/build_report.jsonl"
+
+    #: Directory for build logs. Each stage's build output is written to :code:`<stage>.log`.
+    LOG_DIR: str = "{BUILDER}/logs"
+
+    #: Bytes of build output kept in memory for each stage, printed when a build fails.
+    LOG_BUFFER_SIZE: int = 64 * 1024
+
+    #: Lines of build output shown on screen as a rolling tail. Set to 0 to only show build steps.
+    LOG_TAIL: int = 10
+
+    #: Cache of digests resolved by :code:`pin()` in dockerfile templates.
+    DIGEST_CACHE: str = "{BUILDER}/digests.json"
+
+    #: Seconds a resolved digest is reused before the registry is checked again.
+    DIGEST_TTL: int = 24 * 60 * 60
+
+    #: Platforms to build images for, e.g. :code:`["linux/amd64", "linux/arm64"]`. Each stage is
+    #: built for every platform concurrently with :code:`docker buildx` and pushed as a manifest
+    #: list. Platform images are tagged :code:`<tag>-<arch>`. Native builds are used when empty.
+    PLATFORMS: List[str] = []
+
+    #: buildx builder used for multi-platform builds, default is the current builder.
+    BUILDX_BUILDER: str = None
+
+    #: Stages whose layers are squashed into a single layer after build, e.g.
+    #: :code:`["python", "npm"]`. Layers from the parent stage are kept. Squashing requires a
+    #: daemon with experimental features enabled, stages are built normally otherwise.
+    SQUASH_STAGES: List[str] = []
+
+    #: Layer compression for each stage, e.g. :code:`{"python": "zstd"}`. One of :code:`gzip`,
+    #: :code:`zstd` or :code:`estargz`. Stages with a compression are built and pushed with
+    #: :code:`docker buildx` and then pulled. Other stages use the daemon's default, gzip.
+    STAGE_COMPRESSION: Dict[str, str] = {}
+
+    #: Max size, in bytes, of each stage's image. :code:`image_report` fails if a stage is over
+    #: its budget, e.g. :code:`{"python": 800 * 2 ** 20}`.
+    IMAGE_SIZE_BUDGETS: Dict[str, int] = {}
+
+    #: Number of images kept for each stage by :code:`prune_images`.
+    IMAGE_RETENTION: int = 3
+
     #: Image to use when running :code:`compose`
     #:
     #: This may be an image other than the runtime image. Often you'll want to skip the final build
@@ -12,21 +12,37 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
 import docker
 import logging
 from ixian.task import Task, VirtualTarget
 from ixian.config import CONFIG
+from ixian.exceptions import ExecuteFailed
 from ixian.modules.filesystem.file_hash import FileHash
 from ixian.utils.process import execute
-from ixian_docker.modules.docker.checker import DockerImageExists
+from ixian_docker.modules.docker.checker import All, DockerImageExists
+from ixian_docker.modules.docker.utils.advise import advise, read_dockerfile
 from ixian_docker.modules.docker.utils.compose import run
+from ixian_docker.modules.docker.utils.dockerfile import build_dockerfile
 from ixian_docker.modules.docker.utils.images import (
     build_image_if_needed,
+    image_layers,
+    prune_dangling_images,
+    prune_images,
     pull_image,
     push_image,
+    stage_images,
 )
+from ixian_docker.modules.docker.utils.layers import image_layer_files, wasted_files
+from ixian_docker.modules.docker.utils.print import (
+    format_advice,
+    format_bytes,
+    format_layer_report,
+    format_wasted_files,
+)
+from ixian_docker.modules.docker.utils.report import read_build_report
+from ixian_docker.modules.docker.utils.volumes import evict_volumes
 from ixian_docker.modules.docker.utils.client import docker_client
-from ixian_docker.modules.docker import utils
 
 
 logger = logging.getLogger(__name__)
@@ -46,6 +62,173 @@ class CleanDocker(Task):
         execute("docker-compose rm -f -v")
 
 
+class DockerGC(Task):
+    """
+    Garbage collect docker volumes and images:
+        - evict least recently used volumes until they fit within ``DOCKER.VOLUME_BUDGET``
+        - remove dangling images built for the project
+
+    Only volumes created and labeled by ixian are evicted. Volumes in use by a container are
+    never evicted.
+    """
+
+    name = "docker_gc"
+    category = "docker"
+    short_description = "Remove stale volumes and dangling images"
+
+    def execute(self):
+        evicted = evict_volumes(CONFIG.DOCKER.VOLUME_BUDGET)
+        for volume, size in evicted:
+            print(f"Deleted volume {volume}: {format_bytes(size)}")
+        volumes_reclaimed = sum(size for volume, size in evicted)
+
+        image_count, images_reclaimed = prune_dangling_images()
+        print(f"Deleted {len(evicted)} volumes: {format_bytes(volumes_reclaimed)}")
+        print(f"Deleted {image_count} dangling images: {format_bytes(images_reclaimed)}")
+
+
+class PruneImages(Task):
+    """
+    Prune stage images.
+
+    Stage images are tagged ``<stage>-<hash>`` and a new tag is created whenever a stage changes.
+    This task keeps the ``DOCKER.IMAGE_RETENTION`` most recent images of each stage, and any image
+    used by a running container. The rest are removed.
+
+    Flags:
+        --keep N:    number of images to keep per stage, overrides ``DOCKER.IMAGE_RETENTION``
+        --registry:  also prune the registry
+    """
+
+    name = "prune_images"
+    category = "docker"
+    short_description = "Remove old stage images"
+
+    def execute(self, *args):
+        parser = argparse.ArgumentParser(prog=self.name)
+        parser.add_argument("--keep", type=int, default=CONFIG.DOCKER.IMAGE_RETENTION)
+        parser.add_argument("--registry", action="store_true")
+        options = parser.parse_args(args)
+
+        repository = CONFIG.DOCKER.REPOSITORY
+        pruned, reclaimed = prune_images(repository, options.keep, registry=options.registry)
+        for tag in pruned:
+            print(f"Deleted {repository}:{tag}")
+        print(f"Deleted {len(pruned)} images: {format_bytes(reclaimed)}")
+
+
+class ImageReport(Task):
+    """
+    Report the layers of stage images.
+
+    Reports each layer's size and the instruction that created it, and files stored in a layer but
+    hidden by a later one (duplicated or deleted). By default the newest image of each stage in
+    ``DOCKER.REPOSITORY`` is reported, or pass image names to report.
+
+    The task fails if a stage is larger than its budget in ``DOCKER.IMAGE_SIZE_BUDGETS``.
+
+    Flags:
+        --no-files:  skip finding hidden files, this requires exporting the image.
+    """
+
+    name = "image_report"
+    category = "docker"
+    short_description = "Report image layers and size budgets"
+
+    def execute(self, *args):
+        parser = argparse.ArgumentParser(prog=self.name)
+        parser.add_argument("images", nargs="*")
+        parser.add_argument("--no-files", action="store_true")
+        options = parser.parse_args(args)
+
+        if options.images:
+            images = {image: image for image in options.images}
+        else:
+            repository = CONFIG.DOCKER.REPOSITORY
+            images = {
+                stage: f"{repository}:{stage_tags[0][0]}"
+                for stage, stage_tags in stage_images(repository).items()
+            }
+
+        budgets = CONFIG.DOCKER.IMAGE_SIZE_BUDGETS
+        over_budget = []
+        for stage, image in images.items():
+            layers = image_layers(image)
+            for line in format_layer_report(image, layers):
+                print(line)
+            if not options.no_files:
+                for line in format_wasted_files(wasted_files(image_layer_files(image))):
+                    print(line)
+            print()
+
+            size = sum(layer["size"] for layer in layers)
+            budget = budgets.get(stage)
+            if budget is not None and size > budget:
+                over_budget.append(
+                    f"{stage}: {format_bytes(size)} is over budget {format_bytes(budget)}"
+                )
+
+        if over_budget:
+            raise ExecuteFailed("Images over size budget:\n" + "\n".join(over_budget))
+
+
+class DockerfileAdvise(Task):
+    """
+    Find dockerfile instructions that invalidate the layer cache early or bloat layers.
+
+    By default the last dockerfile built for each stage is checked, as recorded in
+    ``DOCKER.BUILD_REPORT``. Or pass dockerfiles to check as ``path`` or ``stage=path``.
+    Templates are rendered first.
+
+    Cache issues are ranked by the time they add to each rebuild, estimated from the stage's
+    build times in the build report.
+
+    Flags:
+        --strict:  fail if any issues are found.
+    """
+
+    name = "dockerfile_advise"
+    category = "docker"
+    short_description = "Find cache and size issues in dockerfiles"
+
+    def execute(self, *args):
+        parser = argparse.ArgumentParser(prog=self.name)
+        parser.add_argument("dockerfiles", nargs="*")
+        parser.add_argument("--strict", action="store_true")
+        options = parser.parse_args(args)
+
+        records = read_build_report()
+        if options.dockerfiles:
+            dockerfiles = [
+                dockerfile.split("=", 1) if "=" in dockerfile else (None, dockerfile)
+                for dockerfile in options.dockerfiles
+            ]
+        else:
+            # last dockerfile built for each stage
+            latest = {}
+            for record in records:
+                if record.get("stage") and record.get("dockerfile"):
+                    latest[record["stage"]] = record["dockerfile"]
+            dockerfiles = list(latest.items())
+            if not dockerfiles:
+                print("No dockerfiles in the build report, pass dockerfiles to check.")
+
+        found = 0
+        for stage, path in dockerfiles:
+            try:
+                text = read_dockerfile(path)
+            except FileNotFoundError:
+                print(f"{path}: not found")
+                continue
+            issues = advise(text, stage, records)
+            found += len(issues)
+            for line in format_advice(path, issues):
+                print(line)
+
+        if options.strict and found:
+            raise ExecuteFailed(f"{found} dockerfile issues found")
+
+
 class BuildDockerfile(Task):
     """
     Build dockerfile from configured modules and settings.
@@ -55,15 +238,18 @@ class BuildDockerfile(Task):
     a base template that renders them.
 
     The base template is read from {{DOCKER.DOCKERFILE_TEMPLATE}}. The base
-    template is passed CONFIG and MODULES in the context.
+    template is passed CONFIG and the modules' snippets in the context.
 
-    Each module may have template snippet to include.
+    Each module may have two template snippets. `dockerfile_dependencies_template`
+    installs dependencies, these snippets are rendered before the project source
+    is added so their layers stay cached when only code changes.
+    `dockerfile_template` is rendered after the source is added.
 
-    The compiled Dockerfile is written to {{CONFIG.DOCKER.DOCKER_FILE}}.
+    The compiled Dockerfile is written to {{DOCKER.DOCKERFILE}}.
 
     Config:
         - DOCKER.DOCKERFILE_TEMPLATE:  Jinja2 base template.
-        - DOCKER.DOCKER_FILE:          Dockerfile output.
+        - DOCKER.DOCKERFILE:           Dockerfile output.
     """
 
     name = "build_dockerfile"
@@ -72,8 +258,8 @@ class BuildDockerfile(Task):
     short_description = "build app's dockerfile"
 
     def execute(self):
-        text = utils.build_dockerfile()
-        with open(CONFIG.DOCKER.DOCKER_FILE, "w") as dockerfile:
+        text = build_dockerfile()
+        with open(CONFIG.DOCKER.DOCKERFILE, "w") as dockerfile:
             dockerfile.write(text)
 
 
@@ -109,13 +295,12 @@ class BuildImage(Task):
             dockerfile=CONFIG.DOCKER.DOCKERFILE,
             force=self.__task__.force,
             pull=pull,
+            recheck=All(*self.check),
             buildargs={
                 "PYTHON_IMAGE": CONFIG.PYTHON.IMAGE,
                 "COMPILED_STATIC_IMAGE": CONFIG.WEBPACK.IMAGE,
             },
         )
-        # TODO: this is why All is needed, to encapsulate running a list of checkers
-        # recheck=self.check.check)
 
 
 class BuildBaseImage(Task):
@@ -138,9 +323,8 @@ class BuildBaseImage(Task):
             dockerfile=CONFIG.DOCKER.DOCKERFILE_BASE,
             force=self.__task__.force,
             pull=pull,
+            recheck=All(*self.check),
         )
-        # TODO: this is why All is needed, to encapsulate running a list of checkers
-        # recheck=self.check.check)
 
 
 class PullImage(Task):
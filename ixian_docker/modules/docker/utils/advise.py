@@ -0,0 +1,262 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import shlex
+
+from ixian_docker.modules.docker.utils.dockerfile import build_dockerfile
+from ixian_docker.modules.docker.utils.report import BUILD
+
+
+# Kinds of issues. Cache issues cause layers to be rebuilt, size issues bloat layers.
+CACHE = "cache"
+SIZE = "size"
+
+# Commands that install dependencies. They're slow and should be cached.
+INSTALL_PATTERN = re.compile(
+    r"\b(apt-get install|apk add|pip3? install|npm (install|ci)|yarn( install)?\b|"
+    r"bundle install|poetry install)"
+)
+
+# Redirections that write a command's output to a file: ``>``, ``>>`` and ``| tee``.
+REDIRECT_PATTERN = re.compile(r">|\|\s*tee\b")
+
+# Sources of COPY and ADD that copy the whole build context.
+CONTEXT_SOURCES = {".", "./", "*"}
+
+
+def parse_dockerfile(text):
+    """
+    Parse a dockerfile into instructions. Line continuations are joined and comments are skipped.
+    Templates must be rendered first.
+
+    :param text: dockerfile
+    :return: list of dicts with ``line`` number, ``instruction``, ``arguments``, and ``block``,
+     the index of the ``FROM`` block the instruction is in.
+    """
+    instructions = []
+    block = -1
+    current = None
+    for number, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        if current is None:
+            if not stripped or stripped.startswith("#"):
+                continue
+            instruction, _, arguments = stripped.partition(" ")
+            current = {"line": number, "instruction": instruction.upper(), "arguments": ""}
+            line = arguments
+        elif stripped.startswith("#"):
+            # comments within a continued instruction
+            continue
+
+        continued = line.rstrip().endswith("\\")
+        part = line.rstrip()[:-1] if continued else line
+        current["arguments"] = f"{current['arguments']} {part.strip()}".strip()
+        if not continued:
+            if current["instruction"] == "FROM":
+                block += 1
+            current["block"] = max(block, 0)
+            instructions.append(current)
+            current = None
+    if current is not None:
+        current["block"] = max(block, 0)
+        instructions.append(current)
+    return instructions
+
+
+def read_dockerfile(path):
+    """
+    Read a dockerfile. Templates, ``.jinja`` and ``.template`` files, are rendered.
+    :param path: path to dockerfile
+    :return: dockerfile text
+    """
+    if path.endswith((".jinja", ".template")):
+        return build_dockerfile(path)
+    with open(path) as file:
+        return file.read()
+
+
+def copy_sources(arguments):
+    """Sources of a COPY or ADD instruction, options like ``--from`` are skipped."""
+    try:
+        parts = shlex.split(arguments)
+    except ValueError:
+        parts = arguments.split()
+    parts = [part for part in parts if not part.startswith("--")]
+    return parts[:-1]
+
+
+def is_context_copy(instruction):
+    if instruction["instruction"] not in ("COPY", "ADD"):
+        return False
+    if "--from" in instruction["arguments"]:
+        return False
+    return bool(CONTEXT_SOURCES & set(copy_sources(instruction["arguments"])))
+
+
+def run_commands(instruction):
+    """Commands in a RUN instruction, split on ``&&``, ``;`` and ``||``."""
+    return [command.strip() for command in re.split(r"&&|;|\|\|", instruction["arguments"])]
+
+
+def check_context_copy(instructions):
+    """Whole build context copied before dependencies are installed."""
+    issues = []
+    for index, instruction in enumerate(instructions):
+        if not is_context_copy(instruction):
+            continue
+        installs = [
+            later
+            for later in instructions[index + 1 :]
+            if later["block"] == instruction["block"]
+            and later["instruction"] == "RUN"
+            and INSTALL_PATTERN.search(later["arguments"])
+        ]
+        if installs:
+            issues.append(
+                {
+                    "rule": "context-copy-before-install",
+                    "kind": CACHE,
+                    "instruction": instruction,
+                    "message": (
+                        f"Build context is copied before dependencies are installed on line "
+                        f"{installs[0]['line']}. Any change to the project reinstalls them. Copy "
+                        f"only the dependency manifests first, and the project after installing."
+                    ),
+                }
+            )
+    return issues
+
+
+def check_apt_update(instructions):
+    """apt-get install without apt-get update in the same RUN instruction."""
+    issues = []
+    for instruction in instructions:
+        if instruction["instruction"] != "RUN":
+            continue
+        arguments = instruction["arguments"]
+        if "apt-get install" in arguments and "apt-get update" not in arguments:
+            issues.append(
+                {
+                    "rule": "apt-update-split",
+                    "kind": CACHE,
+                    "instruction": instruction,
+                    "message": (
+                        "apt-get install isn't in the same RUN instruction as apt-get update. "
+                        "A cached update goes stale and installs fail or get old packages. "
+                        "Run them in the same instruction."
+                    ),
+                }
+            )
+    return issues
+
+
+def check_apt_lists(instructions):
+    """apt lists left in the layer they were downloaded in."""
+    return [
+        {
+            "rule": "apt-lists-not-removed",
+            "kind": SIZE,
+            "instruction": instruction,
+            "message": (
+                "apt lists are stored in the layer. Add `rm -rf /var/lib/apt/lists/*` to the "
+                "same RUN instruction."
+            ),
+        }
+        for instruction in instructions
+        if instruction["instruction"] == "RUN"
+        and "apt-get update" in instruction["arguments"]
+        and "/var/lib/apt/lists" not in instruction["arguments"]
+    ]
+
+
+def is_debug_command(command):
+    """echo that only prints, echoes redirected to a file or ``tee`` write to the image."""
+    return command.startswith("echo ") and not REDIRECT_PATTERN.search(command)
+
+
+def check_debug_layers(instructions):
+    """RUN instructions that only echo."""
+    return [
+        {
+            "rule": "debug-layer",
+            "kind": SIZE,
+            "instruction": instruction,
+            "message": "RUN only echoes, it adds a layer and a build step. Remove it.",
+        }
+        for instruction in instructions
+        if instruction["instruction"] == "RUN"
+        and all(is_debug_command(command) for command in run_commands(instruction))
+    ]
+
+
+#: Rules run by ``advise``
+RULES = [check_context_copy, check_apt_update, check_apt_lists, check_debug_layers]
+
+
+def stage_build_time(records, stage):
+    """
+    Average build time of a stage from build report records.
+    :param records: build report records
+    :param stage: name of stage
+    :return: seconds or None if the stage hasn't been built.
+    """
+    times = [
+        record["timings"]["build"]
+        for record in records
+        if record.get("stage") == stage
+        and record.get("decision") == BUILD
+        and "build" in record.get("timings", {})
+    ]
+    return sum(times) / len(times) if times else None
+
+
+def rebuild_cost(instructions, instruction, build_time):
+    """
+    Estimate the time to rebuild when an instruction's layer is invalidated. The instruction and
+    every RUN after it are rebuilt. Build time is split evenly between RUN instructions, they do
+    most of the work.
+
+    :param instructions: instructions in the dockerfile
+    :param instruction: invalidated instruction
+    :param build_time: recorded build time of the dockerfile's stage
+    :return: seconds or None if the build time isn't known.
+    """
+    runs = [item for item in instructions if item["instruction"] == "RUN"]
+    if build_time is None or not runs:
+        return None
+    rebuilt = [item for item in runs if item["line"] >= instruction["line"]]
+    return build_time * len(rebuilt) / len(runs)
+
+
+def advise(text, stage=None, records=None):
+    """
+    Find instructions in a dockerfile that invalidate the layer cache early or bloat layers.
+
+    :param text: rendered dockerfile
+    :param stage: name of the stage the dockerfile builds, used to look up build times.
+    :param records: build report records, see ``read_build_report``
+    :return: list of issues, dicts with ``rule``, ``kind``, ``instruction``, ``message``, and
+     ``cost``, the estimated seconds each rebuild takes because of the issue. Costliest first.
+    """
+    instructions = parse_dockerfile(text)
+    build_time = stage_build_time(records or [], stage) if stage else None
+    issues = [issue for rule in RULES for issue in rule(instructions)]
+    for issue in issues:
+        issue["cost"] = (
+            rebuild_cost(instructions, issue["instruction"], build_time)
+            if issue["kind"] == CACHE
+            else None
+        )
+    return sorted(issues, key=lambda issue: (-(issue["cost"] or 0), issue["instruction"]["line"]))
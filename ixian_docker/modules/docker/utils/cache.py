@@ -0,0 +1,221 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import re
+
+import docker
+
+from ixian.check.checker import hash_object
+from ixian.utils.filesystem import pwd
+from ixian_docker.modules.docker.utils.client import docker_client
+from ixian_docker.modules.docker.utils.labels import CACHE_KEY_LABEL
+
+
+logger = logging.getLogger(__name__)
+
+FROM_PATTERN = re.compile(
+    r"^\s*FROM\s+(?:--platform=\S+\s+)?(?P<image>\S+)(?:\s+AS\s+(?P<stage>\S+))?",
+    re.IGNORECASE | re.MULTILINE,
+)
+COPY_FROM_PATTERN = re.compile(r"^\s*COPY\s+.*--from=(?P<image>\S+)", re.IGNORECASE | re.MULTILINE)
+ARG_PATTERN = re.compile(
+    r"^\s*ARG\s+(?P<name>\w+)(?:=(?P<default>\S*))?", re.IGNORECASE | re.MULTILINE
+)
+VARIABLE_PATTERN = re.compile(r"\$\{(?P<braced>\w+)\}|\$(?P<name>\w+)")
+# Build arg at the end of a FROM image, e.g. FROM_TAG in ``${FROM_REPOSITORY}:${FROM_TAG}``
+TRAILING_VARIABLE_PATTERN = re.compile(r"\$\{?(?P<name>\w+)\}?$")
+
+
+class Substitution:
+    """Substitutes build args, and their defaults in ``ARG``, into a dockerfile's values."""
+
+    def __init__(self, text, buildargs=None):
+        self.args = {
+            match.group("name"): match.group("default") or ""
+            for match in ARG_PATTERN.finditer(text)
+        }
+        self.args.update(buildargs or {})
+        self.stages = {
+            match.group("stage").lower()
+            for match in FROM_PATTERN.finditer(text)
+            if match.group("stage")
+        }
+
+    def __call__(self, value):
+        return VARIABLE_PATTERN.sub(
+            lambda match: self.args.get(match.group("braced") or match.group("name"), ""), value
+        )
+
+    def is_image(self, image):
+        """False for stages defined within the dockerfile."""
+        return not (image.lower() in self.stages or image == "scratch" or image.isdigit())
+
+
+def dockerfile_parents(text, buildargs=None):
+    """
+    Find the images a dockerfile builds from. Includes images in ``FROM`` and ``COPY --from``.
+    Build args are substituted, stages defined within the dockerfile are excluded.
+
+    :param text: contents of dockerfile
+    :param buildargs: build args passed to the build
+    :return: sorted list of image names
+    """
+    substitute = Substitution(text, buildargs)
+    images = set()
+    for pattern in (FROM_PATTERN, COPY_FROM_PATTERN):
+        for match in pattern.finditer(text):
+            image = substitute(match.group("image"))
+            if substitute.is_image(image):
+                images.add(image)
+    return sorted(images)
+
+
+def resolve_parent(name):
+    """
+    Resolve a parent image to the key it contributes to a stage's cache key, and the digest to
+    pin it to. Keys are the same on every machine, whether or not the parent exists locally.
+
+    - Images built by ixian are keyed by their own cache key, it covers their inputs and is the
+      same wherever they were built or pulled. They're pinned to the registry digest they were
+      pushed or pulled with, images that were only built locally aren't pinned.
+    - Images pinned to a digest are keyed by it.
+    - Other images are keyed and pinned by the digest their tag resolves to in the registry, see
+      ``resolve_digest``.
+
+    :param name: name of image
+    :return: tuple of key and digest. Key is None if the image couldn't be resolved.
+    """
+    repository, _, digest = name.partition("@")
+    if digest:
+        return digest, None
+
+    try:
+        image = docker_client().images.get(name)
+    except docker.errors.NotFound:
+        image = None
+    key = (image.labels or {}).get(CACHE_KEY_LABEL) if image else None
+    if key:
+        repository = image_repository(name)
+        for repo_digest in image.attrs.get("RepoDigests") or []:
+            digest_repository, _, digest = repo_digest.partition("@")
+            if digest_repository == repository:
+                return key, digest
+        return key, None
+
+    # imported here, digests imports images which imports this module.
+    from ixian_docker.modules.docker.utils.digests import resolve_digest
+
+    digest = resolve_digest(name)
+    return digest, digest
+
+
+def image_repository(name):
+    """
+    Repository of an image, e.g. ``registry:5000/project`` for ``registry:5000/project:tag``.
+    """
+    repository, _, tag = name.rpartition(":")
+    return repository if repository and "/" not in tag else name
+
+
+def dockerfile_cache_key(text, buildargs=None):
+    """
+    Cache key for a dockerfile. The key covers the full set of inputs to a build other than the
+    files in the context, which are covered by the stage's tag:
+
+    - the dockerfile, after it's rendered
+    - build args
+    - parent images, see ``resolve_parent``. Parents that can't be resolved are left out.
+
+    :param text: contents of dockerfile
+    :param buildargs: build args passed to the build
+    :return: sha256 hash
+    """
+    parents = {}
+    for parent in dockerfile_parents(text, buildargs):
+        key, digest = resolve_parent(parent)
+        if key is None:
+            logger.debug(f"Parent image couldn't be resolved, it's left out of the key: {parent}")
+        else:
+            parents[parent] = key
+    return hash_object({"dockerfile": text, "buildargs": buildargs or {}, "parents": parents})
+
+
+def pin_buildargs(text, buildargs=None):
+    """
+    Pin parent images set by build args to the digests they're keyed by. An image in ``FROM``
+    that ends with a build arg, e.g. ``${BASE_IMAGE}`` or ``${FROM_REPOSITORY}:${FROM_TAG}``, is
+    pinned by appending ``@<digest>`` to that arg. The builder then uses the same image the
+    stage's cache key was computed from, even if the tag moved since.
+
+    Images that are written out in ``FROM`` can't be pinned this way, use ``pin()`` in templates.
+
+    :param text: contents of dockerfile
+    :param buildargs: build args passed to the build
+    :return: build args with pinned images
+    """
+    substitute = Substitution(text, buildargs)
+    pinned = dict(buildargs or {})
+    for match in FROM_PATTERN.finditer(text):
+        variable = TRAILING_VARIABLE_PATTERN.search(match.group("image"))
+        image = substitute(match.group("image"))
+        if not variable or not substitute.is_image(image) or "@" in image:
+            continue
+        name = variable.group("name")
+        key, digest = resolve_parent(image)
+        if digest and "@" not in pinned.get(name, ""):
+            pinned[name] = f"{substitute.args.get(name, '')}@{digest}"
+    return pinned
+
+
+def read_dockerfile(dockerfile, context=None):
+    """
+    :param dockerfile: path to dockerfile, relative to context or absolute.
+    :param context: build context, default is the working directory.
+    :return: contents of dockerfile, or an empty string if it doesn't exist.
+    """
+    path = os.path.join(context or pwd(), dockerfile)
+    try:
+        with open(path) as file:
+            return file.read()
+    except FileNotFoundError:
+        logger.warning(f"Dockerfile not found: {path}")
+        return ""
+
+
+def stage_cache_key(dockerfile, context=None, buildargs=None):
+    """
+    Cache key for a stage. Images are labeled with the key when built. An image is only reused if
+    it's key matches.
+
+    :param dockerfile: path to dockerfile, relative to context or absolute.
+    :param context: build context, default is the working directory.
+    :param buildargs: build args passed to the build
+    :return: sha256 hash
+    """
+    return dockerfile_cache_key(read_dockerfile(dockerfile, context), buildargs)
+
+
+def image_cache_key(name):
+    """
+    Get the cache key an image was built with.
+    :param name: name of image
+    :return: cache key or None if the image doesn't exist or has no key.
+    """
+    try:
+        labels = docker_client().images.get(name).labels or {}
+    except docker.errors.NotFound:
+        return None
+    return labels.get(CACHE_KEY_LABEL)
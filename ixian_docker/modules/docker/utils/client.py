@@ -14,12 +14,19 @@
 
 import base64
 import logging
+import re
+import subprocess
+from datetime import datetime, timezone
+from urllib.parse import urljoin
 
 import boto3
 import docker
+import requests
 
 from ixian.config import CONFIG
+from ixian.exceptions import ExecuteFailed
 from ixian.utils.decorators import cached_property
+from ixian_docker.modules.docker.utils.trace import trace_client
 
 
 logger = logging.getLogger(__name__)
@@ -28,9 +35,26 @@ logger = logging.getLogger(__name__)
 # Global cache of registries that are created.
 DOCKER_REGISTRIES = {}
 
+# Media types of manifests. Multi-platform images are pushed as a manifest list or OCI index.
+MANIFEST_V2 = "application/vnd.docker.distribution.manifest.v2+json"
+MANIFEST_LIST_V2 = "application/vnd.docker.distribution.manifest.list.v2+json"
+OCI_MANIFEST = "application/vnd.oci.image.manifest.v1+json"
+OCI_INDEX = "application/vnd.oci.image.index.v1+json"
+MANIFEST_TYPES = [MANIFEST_V2, MANIFEST_LIST_V2, OCI_MANIFEST, OCI_INDEX]
+
+# Docker hub's registry API isn't served from docker.io.
+DOCKER_HUB = "docker.io"
+DOCKER_HUB_API = "registry-1.docker.io"
+
+# Parameters of a WWW-Authenticate challenge, e.g. ``realm="https://auth.docker.io/token"``
+CHALLENGE_PARAM_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+
+# Max number of image ids ECR accepts in a single batch request.
+ECR_BATCH_SIZE = 100
+
 
 def docker_client():
-    return docker.from_env()
+    return trace_client(docker.from_env())
 
 
 class UnknownRegistry(Exception):
@@ -39,6 +63,41 @@ class UnknownRegistry(Exception):
     pass
 
 
+class RegistrySession(requests.Session):
+    """
+    Session for the registry v2 API. Requests are authenticated with the scheme the registry
+    challenges with: basic auth, or a bearer token from the registry's token server. Bearer tokens
+    are scoped, a new token is requested for each scope challenged.
+    """
+
+    def __init__(self, username=None, password=None):
+        super().__init__()
+        self.credentials = (username, password) if username else None
+
+    def token(self, challenge):
+        params = dict(CHALLENGE_PARAM_PATTERN.findall(challenge))
+        realm = params.pop("realm")
+        response = requests.get(realm, params=params, auth=self.credentials)
+        response.raise_for_status()
+        data = response.json()
+        return data.get("token") or data["access_token"]
+
+    def request(self, method, url, **kwargs):
+        response = super().request(method, url, **kwargs)
+        if response.status_code != 401:
+            return response
+
+        scheme, _, challenge = response.headers.get("WWW-Authenticate", "").partition(" ")
+        if scheme.lower() == "bearer":
+            self.auth = None
+            self.headers["Authorization"] = f"Bearer {self.token(challenge)}"
+        elif scheme.lower() == "basic" and self.credentials and self.auth is None:
+            self.auth = self.credentials
+        else:
+            return response
+        return super().request(method, url, **kwargs)
+
+
 class DockerClient:
     def __init__(self, registry, **options):
         self.registry = registry
@@ -68,16 +127,172 @@ class DockerClient:
     def client(self):
         return docker_client()
 
-    def login(self):
-        # authenticate
+    def credentials(self):
+        """
+        Credentials for the registry.
+        :return: tuple of username, password, and registry to login to
+        """
         username = self.options.get("username", None)
         password = self.options.get("password", None)
         if not username:
             raise KeyError(f"Cannot login to {self.registry}, username not found in options.")
         if not password:
             raise KeyError(f"Cannot login to {self.registry}, password not found in options.")
+        return username, password, self.registry
+
+    def login(self, client=None):
+        """
+        Authenticate with the registry.
+        :param client: docker client to authenticate, default is ``self.client``
+        """
+        client = client or self.client
+        username, password, registry = self.credentials()
+        client.login(username, password, "", registry=registry)
+
+    def cli_login(self):
+        """
+        Log the docker CLI in to the registry. ``docker buildx`` pushes with the CLI's stored
+        credentials, the session opened by ``login`` isn't shared with it. The password is passed
+        on stdin so it isn't visible in the process list.
+        """
+        username, password, registry = self.credentials()
+        process = subprocess.run(
+            ["docker", "login", "--username", username, "--password-stdin", registry],
+            input=password,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+        if process.returncode != 0:
+            raise ExecuteFailed(f"docker login failed for {registry}: {process.stdout.strip()}")
+
+    def repository_name(self, repository):
+        """
+        Name of a repository within the registry, e.g. ``path/project`` for
+        ``registry.example.com/path/project``. Official docker hub images are in ``library``.
+        """
+        prefix = f"{self.registry}/"
+        name = repository[len(prefix) :] if repository.startswith(prefix) else repository
+        if self.registry == DOCKER_HUB and "/" not in name:
+            name = f"library/{name}"
+        return name
 
-        self.client.login(username, password, "", registry=self.registry)
+    @property
+    def api_url(self):
+        """
+        URL of the registry v2 API. Registries are accessed over https unless the ``insecure``
+        option is set. The ``api_url`` option overrides the URL.
+        """
+        if "api_url" in self.options:
+            return self.options["api_url"]
+        scheme = "http" if self.options.get("insecure", False) else "https"
+        host = DOCKER_HUB_API if self.registry == DOCKER_HUB else self.registry
+        return f"{scheme}://{host}/v2"
+
+    def session(self):
+        return RegistrySession(self.options.get("username"), self.options.get("password"))
+
+    def list_tags(self, repository):
+        """
+        List tags in the registry, following the API's pagination.
+        :param repository: repository the tags are in
+        :return: list of tags
+        """
+        session = self.session()
+        url = f"{self.api_url}/{self.repository_name(repository)}/tags/list"
+        tags = []
+        while url:
+            response = session.get(url)
+            if response.status_code == 404:
+                break
+            response.raise_for_status()
+            tags.extend(response.json().get("tags") or [])
+            next_url = response.links.get("next", {}).get("url")
+            url = urljoin(url, next_url) if next_url else None
+        return tags
+
+    def tags_created(self, repository, tags):
+        """
+        Time the images for tags were created, from the images' config. Manifest lists are
+        resolved to their first manifest.
+
+        :param repository: repository the tags are in
+        :param tags: tags to look up
+        :return: dict mapping tag to timestamp, tags that don't exist are omitted.
+        """
+        session = self.session()
+        url = f"{self.api_url}/{self.repository_name(repository)}"
+        accept = {"Accept": ", ".join(MANIFEST_TYPES)}
+
+        def get_manifest(reference):
+            response = session.get(f"{url}/manifests/{reference}", headers=accept)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.json()
+
+        created = {}
+        for tag in tags:
+            manifest = get_manifest(tag)
+            if manifest and "manifests" in manifest:
+                manifest = get_manifest(manifest["manifests"][0]["digest"])
+            if not manifest:
+                continue
+            response = session.get(f"{url}/blobs/{manifest['config']['digest']}")
+            response.raise_for_status()
+            timestamp = response.json()["created"][:19]
+            created[tag] = (
+                datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S")
+                .replace(tzinfo=timezone.utc)
+                .timestamp()
+            )
+        return created
+
+    def delete_tags(self, repository, tags, keep=None):
+        """
+        Delete tags from the registry using the registry v2 API. The registry must have deletes
+        enabled.
+
+        The v2 API deletes manifests by digest, which removes every tag referencing it. Manifests
+        referenced by a tag in ``keep`` are not deleted. Tags the registry refuses to delete are
+        logged and skipped, docker hub doesn't support deletes through this API.
+
+        :param repository: repository the tags are in
+        :param tags: tags to delete
+        :param keep: tags that must not be deleted
+        :return: list of deleted tags
+        """
+        session = self.session()
+        url = f"{self.api_url}/{self.repository_name(repository)}/manifests"
+        accept = {"Accept": ", ".join(MANIFEST_TYPES)}
+
+        def get_digest(tag):
+            response = session.head(f"{url}/{tag}", headers=accept)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.headers["Docker-Content-Digest"]
+
+        keep_digests = {get_digest(tag) for tag in keep or []}
+        # digests are resolved before deleting, tags sharing a deleted manifest are gone after.
+        digests = {tag: get_digest(tag) for tag in tags}
+        deleted_digests = set()
+        deleted = []
+        for tag, digest in digests.items():
+            if digest is None or digest in keep_digests:
+                continue
+            if digest not in deleted_digests:
+                response = session.delete(f"{url}/{digest}")
+                if not response.ok:
+                    logger.warning(
+                        f"Could not delete {repository}:{tag}: "
+                        f"{response.status_code} {response.text}"
+                    )
+                    keep_digests.add(digest)
+                    continue
+                deleted_digests.add(digest)
+            deleted.append(tag)
+        return deleted
 
 
 class ECRDockerClient(DockerClient):
@@ -87,7 +302,7 @@ class ECRDockerClient(DockerClient):
         kwargs.update(self.options)
         return boto3.client("ecr", **kwargs)
 
-    def login(self):
+    def credentials(self):
         # fetch credentials from ECR
         logger.debug(
             "Authenticating with ECR: {}".format(self.options.get("region_name", "us-west-2"))
@@ -99,6 +314,51 @@ class ECRDockerClient(DockerClient):
             .split(":")
         )
         registry = token["authorizationData"][0]["proxyEndpoint"]
+        return username, password, registry
+
+    def list_tags(self, repository):
+        name = self.repository_name(repository)
+        paginator = self.ecr_client.get_paginator("list_images")
+        return [
+            image["imageTag"]
+            for page in paginator.paginate(repositoryName=name, filter={"tagStatus": "TAGGED"})
+            for image in page["imageIds"]
+        ]
+
+    def tags_created(self, repository, tags):
+        """
+        Time the images for tags were pushed. ECR records it, so no manifests are fetched.
+        """
+        name = self.repository_name(repository)
+        created = {}
+        for start in range(0, len(tags), ECR_BATCH_SIZE):
+            batch = tags[start : start + ECR_BATCH_SIZE]
+            response = self.ecr_client.describe_images(
+                repositoryName=name, imageIds=[{"imageTag": tag} for tag in batch]
+            )
+            for image in response.get("imageDetails", []):
+                for tag in image.get("imageTags", []):
+                    created[tag] = image["imagePushedAt"].timestamp()
+        return created
+
+    def delete_tags(self, repository, tags, keep=None):
+        """
+        Delete tags from ECR with batched ``batch_delete_image`` requests. ECR deletes tags, an
+        image is only deleted when it's last tag is, so ``keep`` is not needed.
 
-        # authenticate
-        self.client.login(username, password, "", registry=registry)
+        :param repository: repository the tags are in
+        :param tags: tags to delete
+        :param keep: ignored
+        :return: list of deleted tags
+        """
+        name = self.repository_name(repository)
+        deleted = []
+        for start in range(0, len(tags), ECR_BATCH_SIZE):
+            batch = tags[start : start + ECR_BATCH_SIZE]
+            response = self.ecr_client.batch_delete_image(
+                repositoryName=name, imageIds=[{"imageTag": tag} for tag in batch]
+            )
+            deleted.extend(image["imageTag"] for image in response.get("imageIds", []))
+            for failure in response.get("failures", []):
+                logger.warning(f"Could not delete {name}:{failure['imageId']}: {failure}")
+        return deleted
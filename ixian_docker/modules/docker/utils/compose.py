@@ -18,6 +18,8 @@ import logging
 from ixian.config import CONFIG
 from ixian.utils.argparse import argunparse, merge_parser_args
 from ixian.utils.process import execute
+from ixian_docker.modules.docker.utils.spans import span
+from ixian_docker.modules.docker.utils.volumes import prepare_volumes
 
 logger = logging.getLogger(__name__)
 
@@ -144,6 +146,7 @@ def run(command, *args, **options):
     return compose("run", command, *args, **options)
 
 
+@span("compose", "compose_command", "command")
 def compose(compose_command, command, *args, **options):
     logger.debug(f'compose {compose_command} command="{command}" args={args} options={options}')
     # Add default ENV and configured ENVs
@@ -176,6 +179,7 @@ def compose(compose_command, command, *args, **options):
         logger.info(CONFIG.format(formatted))
 
     render_command()
+    prepare_volumes()
     return execute(
         template.format(
             CR="",
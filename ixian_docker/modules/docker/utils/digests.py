@@ -0,0 +1,109 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import time
+
+from docker.errors import APIError
+from requests import RequestException
+
+from ixian.build import write_file
+from ixian.config import CONFIG
+from ixian_docker.modules.docker.utils.client import DockerClient, UnknownRegistry, docker_client
+from ixian_docker.modules.docker.utils.images import parse_registry
+
+
+logger = logging.getLogger(__name__)
+
+
+def read_digest_cache():
+    """
+    Read the cache of resolved digests, :code:`DOCKER.DIGEST_CACHE`.
+    :return: dict mapping image to a dict with ``digest`` and ``resolved`` timestamp
+    """
+    try:
+        with open(CONFIG.DOCKER.DIGEST_CACHE) as file:
+            return json.loads(file.read())
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return {}
+
+
+def registry_digest(image):
+    """
+    Look up the digest of an image's manifest in its registry. Registries in
+    ``DOCKER.REGISTRIES`` are logged into first, others are queried anonymously.
+
+    :param image: image and tag, e.g. ``ubuntu:18.04``
+    :return: digest, e.g. ``sha256:<hash>``
+    """
+    try:
+        registry_client = DockerClient.for_registry(parse_registry(image))
+    except UnknownRegistry:
+        client = docker_client()
+    else:
+        registry_client.login()
+        client = registry_client.client
+    return client.images.get_registry_data(image).id
+
+
+def resolve_digest(image, ttl=None):
+    """
+    Resolve an image's tag to a digest. Digests are cached in :code:`DOCKER.DIGEST_CACHE` and
+    reused until they're older than the TTL, builds within the TTL don't look up the manifest.
+
+    If the registry can't be reached an expired digest is used, with a warning.
+
+    :param image: image and tag, e.g. ``ubuntu:18.04``
+    :param ttl: seconds to reuse a cached digest, default is :code:`DOCKER.DIGEST_TTL`
+    :return: digest or None if it couldn't be resolved.
+    """
+    ttl = CONFIG.DOCKER.DIGEST_TTL if ttl is None else ttl
+    cache = read_digest_cache()
+    cached = cache.get(image)
+    if cached and time.time() - cached["resolved"] < ttl:
+        return cached["digest"]
+
+    logger.debug(f"Resolving digest for {image}")
+    try:
+        digest = registry_digest(image)
+    except (APIError, RequestException) as exception:
+        if cached:
+            logger.warning(f"Couldn't resolve {image}, using expired digest: {exception}")
+            return cached["digest"]
+        logger.warning(f"Couldn't resolve {image}: {exception}")
+        return None
+
+    cache[image] = {"digest": digest, "resolved": time.time()}
+    write_file(CONFIG.DOCKER.DIGEST_CACHE, json.dumps(cache, indent=4, sort_keys=True))
+    return digest
+
+
+def pin(image):
+    """
+    Pin an image to the digest its tag resolves to, e.g. ``ubuntu:18.04`` is
+    ``ubuntu:18.04@sha256:<hash>``. The tag is kept so the dockerfile stays readable, the digest
+    takes precedence. Images that are already pinned, or can't be resolved, are returned as is.
+
+    Available in dockerfile templates:
+
+        FROM {{ pin("ubuntu:18.04") }}
+
+    :param image: image and tag
+    :return: image pinned to a digest
+    """
+    if "@" in image:
+        return image
+    digest = resolve_digest(image)
+    return f"{image}@{digest}" if digest else image
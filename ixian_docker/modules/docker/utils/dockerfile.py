@@ -13,31 +13,106 @@
 # limitations under the License.
 
 import jinja2
+import logging
 import os
 
 from ixian.build import write_file
-from ixian.config import CONFIG
+from ixian.config import CONFIG, MissingConfiguration
+from ixian.module import MODULES
+from ixian_docker.modules.docker.utils.digests import pin
 
 
-def get_dockerfile(path: str, render_to: str = None):
+logger = logging.getLogger(__name__)
+
+# Module options for template snippets, mapped to the key they're passed to the base template as.
+# Dependency snippets are rendered before the project source is added, application snippets after.
+SNIPPET_OPTIONS = {
+    "dockerfile_dependencies_template": "dependencies_template",
+    "dockerfile_template": "template",
+}
+
+
+def get_dockerfile(path: str, render_to: str = None, context: dict = None):
     """
     Get the dockerfile for `path`. If the path ends in .jinja it will be rendered to `render_to`.
     :param path: original path of dockerfile
     :param render_to: render to this file if
+    :param context: additional context for rendering the template.
     :return: path to dockerfile
     """
     if path.endswith(".jinja"):
         dockerfile = render_to
-        write_file(dockerfile, build_dockerfile(path))
+        write_file(dockerfile, build_dockerfile(path, context))
     else:
         dockerfile = path
     return dockerfile
 
 
+def snippet_path(options, option):
+    """
+    Path to a module's template snippet. Snippets that aren't configured, or don't exist, are
+    skipped. A snippet isn't configured when its config root (``MissingConfiguration``) or key
+    (``AttributeError``) doesn't exist.
+
+    :param options: module OPTIONS
+    :param option: option the snippet is configured by, see ``SNIPPET_OPTIONS``
+    :return: path or None
+    """
+    value = options.get(option)
+    if not value:
+        return None
+    try:
+        path = CONFIG.format(value)
+    except (MissingConfiguration, AttributeError):
+        logger.debug(f"{options['name']}: {option} isn't configured: {value}")
+        return None
+    if not os.path.exists(path):
+        logger.debug(f"{options['name']}: {option} doesn't exist: {path}")
+        return None
+    return path
+
+
+def dockerfile_modules():
+    """
+    Template snippets of loaded modules.
+
+    Modules may provide two snippets. ``dockerfile_dependencies_template`` installs dependencies,
+    it must only use files it adds itself, e.g. a lockfile. ``dockerfile_template`` sets up the
+    application and may use the project source.
+
+    :return: tuple of (dict mapping loader prefix to directory, list of dicts with module
+     ``name``, ``dependencies_template`` and ``template``, the snippets' names in the loader)
+    """
+    directories = {}
+    modules = []
+    for name, options in MODULES.items():
+        module = {"name": name}
+        for option, key in SNIPPET_OPTIONS.items():
+            path = snippet_path(options, option)
+            if path:
+                directory, filename = os.path.split(path)
+                prefix = f"{name}.{key}"
+                directories[prefix] = directory
+                module[key] = f"{prefix}/{filename}"
+            else:
+                module[key] = None
+        modules.append(module)
+    return directories, modules
+
+
 def build_dockerfile(template_path=None, context=None):
     """Build dockerfile from configured modules and settings.
 
+    Templates are rendered with ``CONFIG`` and ``pin``, which pins an image to a digest:
+
+        FROM {{ pin("ubuntu:18.04") }}
+
+    The snippets of loaded modules are passed as ``modules``, see ``dockerfile_modules``. The base
+    template includes dependency snippets before the project source so their layers are reused
+    when only the source changes.
+
     :param template_path: base template to use for rendering Dockerfile
+    :param context: additional context for rendering the template.
     :return: DockerFile as a string.
     """
 
@@ -45,10 +120,14 @@ def build_dockerfile(template_path=None, context=None):
     #  - directory for base template
     #  - directories for each of the module's template snippets.
     path, filename = os.path.split(template_path or CONFIG.DOCKER.DOCKERFILE_TEMPLATE)
-    prefixes = {"base": jinja2.FileSystemLoader(path)}
+    directories, modules = dockerfile_modules()
+    prefixes = {
+        prefix: jinja2.FileSystemLoader(directory) for prefix, directory in directories.items()
+    }
+    prefixes["base"] = jinja2.FileSystemLoader(path)
     loader = jinja2.PrefixLoader(prefixes)
 
     # render template
     environment = jinja2.Environment(loader=loader)
     template = environment.get_template("base/%s" % filename)
-    return template.render({"CONFIG": CONFIG})
+    return template.render({"CONFIG": CONFIG, "pin": pin, "modules": modules, **(context or {})})
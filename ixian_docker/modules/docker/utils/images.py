@@ -14,17 +14,50 @@
 
 import json
 import logging
+import os
+import queue
+import re
+import threading
+import time
 from collections import defaultdict
 
+from docker.errors import APIError
 from docker.errors import NotFound as DockerNotFound
 from docker.errors import ImageNotFound as ImageNotFound
 
+from ixian.config import CONFIG
+from ixian.exceptions import ExecuteFailed
 from ixian.utils.filesystem import pwd
 from ixian_docker.modules.docker.utils.client import (
     DockerClient,
     UnknownRegistry,
     docker_client,
 )
+from ixian_docker.modules.docker.utils.cache import (
+    dockerfile_parents,
+    image_cache_key,
+    image_repository,
+    pin_buildargs,
+    read_dockerfile,
+    stage_cache_key,
+)
+from ixian_docker.modules.docker.utils.labels import CACHE_KEY_LABEL, PROJECT_LABEL
+from ixian_docker.modules.docker.utils.logs import StageLog, log_name
+from ixian_docker.modules.docker.utils.platforms import (
+    build_buildx,
+    build_platforms,
+    platform_tag,
+)
+from ixian_docker.modules.docker.utils.remote_builders import LOCAL_BUILDER, select_builder
+from ixian_docker.modules.docker.utils.report import (
+    BUILD,
+    LOCAL_HIT,
+    REGISTRY_PULL,
+    image_summary,
+    timed,
+    write_build_report,
+)
+from ixian_docker.modules.docker.utils.spans import set_span_attributes, span
 from ixian_docker.modules.docker.utils.print import (
     print_docker_transfer_events,
     format_pull_status_minimal,
@@ -34,6 +67,12 @@ from ixian_docker.utils.net import is_valid_hostname
 
 logger = logging.getLogger(__name__)
 
+#: Builder recorded for multi-platform builds.
+BUILDX_BUILDER = "buildx"
+
+#: Pattern matching tags of stage images, e.g. ``python-<hash>``. The stage is the prefix.
+STAGE_TAG_PATTERN = re.compile(r"^(?P<stage>.+)-(?P<hash>[0-9a-f]{64})$")
+
 
 def image_exists(name):
     """
@@ -50,6 +89,209 @@ def image_exists(name):
         return True
 
 
+def image_layers(name):
+    """
+    Get the layers of an image from its history. Layers are ordered newest first, the same as
+    ``docker history``.
+
+    :param name: name of image.
+    :return: list of dicts with ``id``, ``created_by``, and ``size`` for each layer.
+    """
+    client = docker_client()
+    return [
+        {"id": layer["Id"], "created_by": layer["CreatedBy"], "size": layer["Size"]}
+        for layer in client.api.history(name)
+    ]
+
+
+def prune_dangling_images():
+    """
+    Remove dangling images built for this project. Images are dangling when their tag has been
+    moved to a newer build.
+
+    :return: tuple of the number of images deleted and bytes reclaimed.
+    """
+    label = f"{PROJECT_LABEL}={CONFIG.PROJECT_NAME}"
+    result = docker_client().images.prune(filters={"dangling": True, "label": label})
+    return len(result.get("ImagesDeleted") or []), result.get("SpaceReclaimed") or 0
+
+
+def stage_images(repository):
+    """
+    Find stage images in a repository. Stage images are tagged ``<stage>-<hash>``.
+
+    :param repository: repository to search
+    :return: dict mapping stage to a list of (tag, image_id, created) tuples, newest first.
+    """
+    stages = defaultdict(list)
+    for image in docker_client().api.images(name=repository):
+        for repo_tag in image.get("RepoTags") or []:
+            image_repository, _, tag = repo_tag.rpartition(":")
+            match = STAGE_TAG_PATTERN.match(tag)
+            if image_repository == repository and match:
+                stages[match.group("stage")].append((tag, image["Id"], image["Created"]))
+    for images in stages.values():
+        images.sort(key=lambda image: image[2], reverse=True)
+    return dict(stages)
+
+
+def registry_stage_images(registry_client, repository):
+    """
+    Find stage images in a repository in the registry.
+
+    :param registry_client: ``DockerClient`` for the registry
+    :param repository: repository to search
+    :return: dict mapping stage to a list of (tag, None, created) tuples, newest first.
+    """
+    tags = [tag for tag in registry_client.list_tags(repository) if STAGE_TAG_PATTERN.match(tag)]
+    stages = defaultdict(list)
+    for tag, created in registry_client.tags_created(repository, tags).items():
+        stages[STAGE_TAG_PATTERN.match(tag).group("stage")].append((tag, None, created))
+    for images in stages.values():
+        images.sort(key=lambda image: image[2], reverse=True)
+    return dict(stages)
+
+
+def images_in_use():
+    """
+    :return: set of ids of images used by running containers.
+    """
+    return {container["ImageID"] for container in docker_client().api.containers()}
+
+
+def select_images_to_prune(stages, keep, in_use=None):
+    """
+    Select the stage image tags to prune. The ``keep`` most recent images of each stage are kept,
+    and so is any image used by a running container.
+
+    :param stages: stage images from ``stage_images``
+    :param keep: number of images to keep per stage
+    :param in_use: set of image ids to keep
+    :return: list of tags to prune
+    """
+    in_use = in_use or set()
+    tags = []
+    for images in stages.values():
+        for tag, image_id, created in images[keep:]:
+            if image_id not in in_use:
+                tags.append(tag)
+    return tags
+
+
+def prune_images(repository, keep, registry=False):
+    """
+    Prune stage images, keeping the ``keep`` most recent images of each stage and any image used
+    by a running container. Tags are removed locally in a single pass, and optionally from the
+    registry.
+
+    The registry is pruned separately, tags beyond the ``keep`` most recent of each stage in the
+    registry are deleted, including tags that were never pulled locally. A tag pruned locally may
+    still be one of the most recent in the registry, it's kept there. Tags kept locally are kept
+    in the registry too.
+
+    :param repository: repository to prune
+    :param keep: number of images to keep per stage
+    :param registry: also prune the registry.
+    :return: tuple of the list of pruned tags and the size of the images deleted locally.
+    """
+    client = docker_client()
+    stages = stage_images(repository)
+    tags = select_images_to_prune(stages, keep, images_in_use())
+
+    pruned = []
+    reclaimed = 0
+    if tags:
+        sizes = {image["Id"]: image["Size"] for image in client.api.images(name=repository)}
+        for tag in tags:
+            try:
+                removed = client.api.remove_image(f"{repository}:{tag}")
+            except APIError as exception:
+                logger.warning(f"Could not remove image {repository}:{tag}: {exception}")
+            else:
+                pruned.append(tag)
+                # images with other tags are only untagged
+                deleted = {item.get("Deleted") for item in removed or []}
+                reclaimed += sum(size for id, size in sizes.items() if id in deleted)
+
+    if registry:
+        registry_client = DockerClient.for_registry(parse_registry(repository))
+        keep_tags = [tag for images in stages.values() for tag, *_ in images if tag not in tags]
+        delete_tags = [
+            tag
+            for tag in select_images_to_prune(
+                registry_stage_images(registry_client, repository), keep
+            )
+            if tag not in keep_tags
+        ]
+        if delete_tags:
+            # multi-platform builds also push a tag for each platform
+            platforms = CONFIG.DOCKER.PLATFORMS
+            delete_tags += [platform_tag(tag, p) for tag in delete_tags for p in platforms]
+            keep_tags += [platform_tag(tag, p) for tag in keep_tags for p in platforms]
+            deleted = registry_client.delete_tags(repository, delete_tags, keep=keep_tags)
+            for tag in deleted:
+                logger.info(f"Deleted {repository}:{tag} from the registry")
+
+    return pruned, reclaimed
+
+
+def cli_login(repository):
+    """
+    Log the docker CLI in to the repository's registry, ``docker buildx`` pushes with the CLI's
+    credentials. Registries missing from ``DOCKER.REGISTRIES`` must be logged in to with
+    ``docker login``.
+    :param repository: repository that will be pushed to
+    """
+    try:
+        registry_client = DockerClient.for_registry(parse_registry(repository))
+    except UnknownRegistry:
+        return
+    registry_client.cli_login()
+
+
+def prepare_builder(client, builder, repository, text, buildargs=None):
+    """
+    Prepare a remote builder to build a stage. Remote builders can't use local images, parents are
+    pulled from the registry by the builder.
+
+    The builder is logged in to the stage's registry and to the registries of its parents that are
+    in ``DOCKER.REGISTRIES``. Parents that were only built locally, e.g. the previous stage, are
+    pushed. Parents in other registries are pulled anonymously.
+
+    :param client: docker client of the builder
+    :param builder: name of builder
+    :param repository: repository the stage is pushed to
+    :param text: contents of dockerfile
+    :param buildargs: build args passed to the build
+    :raises ExecuteFailed: if a parent isn't in the registry or locally.
+    """
+    logged_in = set()
+
+    def login(registry_client):
+        if registry_client.registry not in logged_in:
+            registry_client.login(client)
+            logged_in.add(registry_client.registry)
+
+    login(DockerClient.for_registry(parse_registry(repository)))
+    for parent in dockerfile_parents(text, buildargs):
+        name, _, digest = parent.partition("@")
+        parent_repository = image_repository(name)
+        tag = name[len(parent_repository) + 1 :] or "latest"
+        try:
+            login(DockerClient.for_registry(parse_registry(parent_repository)))
+        except UnknownRegistry:
+            continue
+        # pinned images were pushed or pulled with the digest
+        if digest or image_exists_in_registry(parent_repository, tag):
+            continue
+        if not image_exists(name):
+            raise ExecuteFailed(
+                f"Builder {builder} can't pull {name}, it isn't in the registry or built locally."
+            )
+        logger.info(f"Pushing {name} for builder {builder}")
+        push_image(parent_repository, tag)
+
+
 def image_exists_in_registry(repository, tag=None):
     """
     Check if image exists in the registry.
@@ -81,30 +323,149 @@ def delete_image(name, force=False):
 
 EMPTY_LINE = b'{"stream":"\\n"}'
 
+# Max number of build stream messages buffered between the reader thread and the log.
+BUILD_QUEUE_SIZE = 100
+
+# Seconds the reader thread waits on a full queue before checking if the build was cancelled.
+BUILD_QUEUE_TIMEOUT = 0.5
+
+# Put in the queue when the build stream ends.
+BUILD_STREAM_END = object()
+
+
+class BuildError(ExecuteFailed):
+    """Exception raised when the daemon reports an error while building an image"""
+
+    def __init__(self, image, message):
+        super().__init__(f"Build failed for {image}: {message}")
+        self.image = image
+        self.message = message
+
+
+def read_build_stream(stream, messages, cancelled):
+    """
+    Read a build stream into a bounded queue. Runs in a worker thread so the build can be
+    cancelled while the stream is blocked. The stream ends with ``BUILD_STREAM_END``, or the
+    exception that ended it.
+
+    :param stream: build stream from ``client.api.build``
+    :param messages: queue to put messages in
+    :param cancelled: ``threading.Event`` set when the build is cancelled.
+    """
+
+    def put(message):
+        while not cancelled.is_set():
+            try:
+                messages.put(message, timeout=BUILD_QUEUE_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        for message in stream:
+            if not put(message):
+                return
+    except Exception as exception:
+        # reading fails when the connection is closed to cancel the build.
+        if not cancelled.is_set():
+            put(exception)
+        return
+    put(BUILD_STREAM_END)
+
+
+def squash_supported(client):
+    """
+    Squashed builds require a daemon with experimental features enabled.
+    :param client: docker client of the daemon
+    :return: True if the daemon can squash builds.
+    """
+    try:
+        return bool(client.info().get("ExperimentalBuild"))
+    except APIError:
+        return False
 
-def build_image(dockerfile, tag, context=None, **kwargs):
+
+@span("build_image", "tag", "dockerfile")
+def build_image(dockerfile, tag, context=None, client=None, **kwargs):
     """Build a docker image.
 
     Builds a docker image. This is a shim around Docker-py that adds some
     ixian utilities to it.
 
+    The build stream is read by a worker thread and written to the stage's ``StageLog`` as it
+    arrives. The build is cancelled
+    if the first error is reported or the build is interrupted (Ctrl-C). Cancelling closes the
+    connection, the daemon then stops the build and removes intermediate containers.
+
     :param tag: Tag for image.
     :param file: Dockerfile.
     :param context: build context, default is the working directory.
+    :param client: docker client of the daemon to build with, default is the local daemon.
     :param args: args to pass as build-args to build
+    :raises BuildError: with the first error reported by the daemon.
     """
     if not context:
         context = pwd()
+    # label images with the project so dangling images can be garbage collected.
+    kwargs["labels"] = dict(kwargs.get("labels") or {}, **{PROJECT_LABEL: CONFIG.PROJECT_NAME})
+    # remove intermediate containers even if the build fails or is cancelled.
+    kwargs.setdefault("forcerm", True)
     logger.debug(f"Building image dockerfile={dockerfile} tag={tag} context={context}")
 
-    client = docker_client()
+    client = client or docker_client()
 
-    stream = client.api.build(path=context, dockerfile=dockerfile, tag=tag, **kwargs)
-    seen_layers = defaultdict(set)
+    # capture the build response so its connection can be closed to cancel the build.
+    responses = []
+
+    def capture_response(response, *args, **kwargs):
+        responses.append(response)
+
+    client.api.hooks["response"].append(capture_response)
+    try:
+        stream = client.api.build(path=context, dockerfile=dockerfile, tag=tag, **kwargs)
+    finally:
+        client.api.hooks["response"].remove(capture_response)
+
+    messages = queue.Queue(maxsize=BUILD_QUEUE_SIZE)
+    cancelled = threading.Event()
+    reader = threading.Thread(
+        target=read_build_stream, args=(stream, messages, cancelled), daemon=True
+    )
+    reader.start()
+    with StageLog(log_name(tag)) as log:
+        try:
+            log_build_stream(messages, tag, log)
+        except BaseException as exception:
+            cancelled.set()
+            if responses:
+                responses[-1].close()
+            if isinstance(exception, KeyboardInterrupt):
+                logger.error(f"Build cancelled: {tag}")
+            else:
+                log.report_failure()
+            raise
+        finally:
+            reader.join(BUILD_QUEUE_TIMEOUT)
+
+
+def log_build_stream(messages, tag, log):
+    """
+    Log build messages from the queue until the stream ends.
 
-    # log output from build
+    :param messages: queue filled by ``read_build_stream``
+    :param tag: image being built
+    :param log: ``StageLog`` to write output to
+    :raises BuildError: on the first error in the stream.
+    """
+    seen_layers = defaultdict(set)
     buffer = bytearray()
-    for message in stream:
+    while True:
+        message = messages.get()
+        if message is BUILD_STREAM_END:
+            return
+        if isinstance(message, Exception):
+            raise message
 
         # Add message to buffer and then split it on CRs to find individual lines. Messages may not
         # include a complete line (often because they are too large). Consume only the complete
@@ -135,19 +496,21 @@ def build_image(dockerfile, tag, context=None, **kwargs):
 
             # build steps
             if "stream" in decoded_line:
-                logger.info(decoded_line["stream"].rstrip("\\n").rstrip("\n"))
+                log.write(decoded_line["stream"].rstrip("\\n").rstrip("\n"))
 
             # errors
             elif "errorDetail" in decoded_line:
-                logger.error(decoded_line["errorDetail"]["message"])
-                # TODO: raise this error somehow, should reach cli
+                message = decoded_line["errorDetail"]["message"]
+                log.write(message)
+                raise BuildError(tag, message)
 
             # base image pull status
             elif "status" in decoded_line:
                 status = decoded_line["status"]
-                logger.info(format_pull_status_minimal(status, seen_layers))
+                log.write(format_pull_status_minimal(status, seen_layers))
 
 
+@span("build_image_if_needed", "repository", "tag", "stage", "force")
 def build_image_if_needed(
     repository,
     tag=None,
@@ -156,37 +519,111 @@ def build_image_if_needed(
     pull=True,
     recheck=None,
     force=False,
+    stage=None,
+    cache_key=None,
+    before_build=None,
     **kwargs,
 ):
+    """
+    Build an image if it doesn't exist locally or in the registry.
+
+    Images are built by the builder selected for the stage by ``DOCKER.STAGE_BUILDERS``. Images
+    built by a remote builder are pushed to the registry from the builder and then pulled.
+
+    Existing images are only used if their cache key matches ``stage_cache_key``. The key covers
+    the rendered dockerfile, build args, and parent images. Images built from other inputs are
+    rebuilt even if the tag matches. Parent images set by build args are pinned to the digests
+    they're keyed by, see ``pin_buildargs``.
+
+    Stages in ``DOCKER.SQUASH_STAGES`` are squashed into a single layer on top of their parent
+    image, fewer layers are quicker to pull.
+
+    If ``DOCKER.PLATFORMS`` is set the image is built for each platform concurrently with buildx
+    and pushed as a manifest list. The native image is then pulled. Stages with a layer compression
+    in ``DOCKER.STAGE_COMPRESSION`` are also built and pushed by buildx, and then pulled.
+
+    Each call appends a record to the build report, ``DOCKER.BUILD_REPORT``, with the decision
+    made, timings for each phase, bytes pulled, and the size and layer count of the image.
+
+    :param recheck: callable that confirms a pulled image satisfies the task. If it has a
+        ``snapshot`` method it's called before pulling, e.g. ``checker.All``.
+    :param stage: stage being built, default is the prefix of the tag. e.g. ``python-<hash>``
+    :param cache_key: cache key for the stage, default is ``stage_cache_key``.
+    :param before_build: callable run once it's decided the image will be built, e.g. to fetch a
+        build cache only when it's used.
+    :return: True if the image was built, False if an existing image was used.
+    """
     # if local: skip
     # if remote: pull & skip
     # else: build
     image_and_tag = "{}:{}".format(repository, tag or "latest")
+    if stage is None:
+        match = STAGE_TAG_PATTERN.match(tag or "")
+        stage = match.group("stage") if match else None
+
+    start = time.time()
+    timings = {}
+    report = {
+        "stage": stage,
+        "dockerfile": os.path.join(context or pwd(), dockerfile),
+        "repository": repository,
+        "tag": tag or "latest",
+        "timings": timings,
+        "bytes_pulled": 0,
+    }
+
+    def finish(decision):
+        """Record the decision in the build report"""
+        set_span_attributes(decision=decision)
+        timings["total"] = time.time() - start
+        report.update(decision=decision, **image_summary(image_and_tag))
+        write_build_report(report)
+        return decision == BUILD
 
     logger.debug(f"Attempting to build image={image_and_tag} dockerfile={dockerfile}")
+    with timed(timings, "cache_key"):
+        cache_key = cache_key or stage_cache_key(dockerfile, context, kwargs.get("buildargs"))
+    report["cache_key"] = cache_key
 
     if not force:
-        if image_exists(image_and_tag):
-            logger.debug("Image exists, skipping build.")
-            return
+        with timed(timings, "local"):
+            exists = image_exists(image_and_tag)
+            local_key = image_cache_key(image_and_tag) if exists else None
+        if exists:
+            if local_key == cache_key:
+                logger.debug("Image exists, skipping build.")
+                return finish(LOCAL_HIT)
+            logger.info(f"Image exists but was built from different inputs: {image_and_tag}")
         else:
             logger.debug("Image does not exist.".format(tag))
 
         try:
-            if pull and image_exists_in_registry(repository, tag):
+            with timed(timings, "registry"):
+                in_registry = pull and image_exists_in_registry(repository, tag)
+            if in_registry:
                 logger.debug("Image exists on registry. Pulling image.")
+                snapshot = getattr(recheck, "snapshot", None)
+                if snapshot:
+                    snapshot()
                 try:
-                    pull_image(repository, tag)
+                    with timed(timings, "pull"):
+                        report["bytes_pulled"] += pull_image(repository, tag) or 0
                 except DockerNotFound:
                     logger.debug("Image could not be pulled: NotFound")
                     pass
                 else:
                     logger.debug("Image pulled.")
                     # Re-check, if task now passes then build can be skipped
-                    if not recheck or recheck():
+                    with timed(timings, "recheck"):
+                        if image_cache_key(image_and_tag) != cache_key:
+                            logger.info("Pulled image was built from different inputs, building.")
+                            passed = False
+                        else:
+                            passed = not recheck or recheck()
+                    if passed:
                         logger.debug("Check passed, skipping build.")
                         # TODO: get image and return
-                        return
+                        return finish(REGISTRY_PULL)
             elif pull:
                 logger.debug("Image does not exist on registry.")
         except UnknownRegistry as exception:
@@ -194,7 +631,63 @@ def build_image_if_needed(
                 f"Registry '{str(exception)}' is not configured, couldn't check for remote image."
             )
 
-    return build_image(dockerfile, image_and_tag, context=context, **kwargs)
+    if before_build:
+        with timed(timings, "before_build"):
+            before_build()
+    kwargs["labels"] = dict(kwargs.get("labels") or {}, **{CACHE_KEY_LABEL: cache_key})
+    platforms = CONFIG.DOCKER.PLATFORMS
+    compression = CONFIG.DOCKER.STAGE_COMPRESSION.get(stage)
+    if compression:
+        kwargs["compression"] = report["compression"] = compression
+    if platforms or compression:
+        builder, client = BUILDX_BUILDER, None
+    else:
+        builder, client = select_builder(stage)
+    report["builder"] = builder
+    set_span_attributes(builder=builder)
+    text = read_dockerfile(dockerfile, context)
+    if builder not in (LOCAL_BUILDER, BUILDX_BUILDER):
+        with timed(timings, "push"):
+            prepare_builder(client, builder, repository, text, kwargs.get("buildargs"))
+    # parents pushed for the builder are pinned too
+    buildargs = pin_buildargs(text, kwargs.get("buildargs"))
+    if buildargs:
+        kwargs["buildargs"] = buildargs
+    if stage in CONFIG.DOCKER.SQUASH_STAGES:
+        if builder != BUILDX_BUILDER and squash_supported(client):
+            kwargs["squash"] = True
+            report["squash"] = True
+        else:
+            logger.warning(f"Builder {builder} doesn't support squashing, building {stage} as is.")
+    if platforms:
+        logger.info(f"Building {image_and_tag} for {', '.join(platforms)}")
+        cli_login(repository)
+        with timed(timings, "build"):
+            build_platforms(dockerfile, repository, tag or "latest", platforms, context, **kwargs)
+        # pull the native image so later stages and cache keys can use it.
+        with timed(timings, "pull"):
+            report["bytes_pulled"] += pull_image(repository, tag) or 0
+    elif compression:
+        logger.info(f"Building {image_and_tag} with {compression} layers")
+        cli_login(repository)
+        with timed(timings, "build"):
+            build_buildx(dockerfile, image_and_tag, context, **kwargs)
+        with timed(timings, "pull"):
+            report["bytes_pulled"] += pull_image(repository, tag) or 0
+    elif builder == LOCAL_BUILDER:
+        with timed(timings, "build"):
+            build_image(dockerfile, image_and_tag, context=context, **kwargs)
+    else:
+        logger.info(f"Building {image_and_tag} with builder {builder}")
+        with timed(timings, "build"):
+            build_image(
+                dockerfile, image_and_tag, context=context, client=client, gzip=True, **kwargs
+            )
+        with timed(timings, "push"):
+            push_image(repository, tag, client=client)
+        with timed(timings, "pull"):
+            report["bytes_pulled"] += pull_image(repository, tag) or 0
+    return finish(BUILD)
 
 
 def parse_registry(repository):
@@ -208,6 +701,15 @@ def parse_registry(repository):
     # netloc parsing method below.
     hostname = repository.split("/")[0]
 
+    # A port or localhost only makes the first component a hostname when a path follows it, e.g.
+    # registry:5000/image. Without one it's an image and tag, e.g. ubuntu:18.04
+    host, _, port = hostname.partition(":")
+    if port or host == "localhost":
+        if "/" in repository and (not port or port.isdigit()):
+            if is_valid_hostname(host, require_dot=False):
+                return hostname
+        return "docker.io"
+
     # Use the hostname if it's valid, otherwise return the default docker registry (docker.io)
     if is_valid_hostname(hostname):
         return hostname
@@ -215,6 +717,7 @@ def parse_registry(repository):
         return "docker.io"
 
 
+@span("pull_image", "repository", "tag")
 def pull_image(repository, tag=None, silent=False):
     """
     Pull an image from a repository.
@@ -222,7 +725,7 @@ def pull_image(repository, tag=None, silent=False):
     :param repository: image to pull from. Docker hub assumed if repository does not begin with a
      hostname
     :param tag: tag of image. defaults to "latest"
-    :return:
+    :return: bytes downloaded, None if silent.
     """
     resolved_tag = tag or "latest"
 
@@ -237,15 +740,18 @@ def pull_image(repository, tag=None, silent=False):
     event_stream = client.client.api.pull(
         repository, resolved_tag or "latest", stream=not silent, decode=not silent
     )
+    transferred = None
     if not silent:
-        print_docker_transfer_events(event_stream)
+        transferred = print_docker_transfer_events(event_stream)
 
     # Print pulled image
     # TODO: logger
     print("{}:{}".format(repository, resolved_tag))
+    return transferred
 
 
-def push_image(repository, tag=None, silent=False):
+@span("push_image", "repository", "tag")
+def push_image(repository, tag=None, silent=False, client=None):
     """
     Push an image to a registry.
 
@@ -253,16 +759,18 @@ def push_image(repository, tag=None, silent=False):
      with a hostname
     :param tag: image tag to push
     :param silent: don't output progress, default is False
+    :param client: docker client of the daemon to push from, default is the local daemon.
     :return:
     """
     # default tag to latest
     resolved_tag = tag or "latest"
 
     registry = parse_registry(repository)
-    client = DockerClient.for_registry(registry)
-    client.login()
+    registry_client = DockerClient.for_registry(registry)
+    client = client or registry_client.client
+    registry_client.login(client)
 
-    event_stream = client.client.api.push(
+    event_stream = client.api.push(
         repository, resolved_tag or "latest", stream=not silent, decode=not silent
     )
     if not silent:
@@ -0,0 +1,22 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#: Label identifying the project that created an image or volume.
+PROJECT_LABEL = "ixian.project"
+#: Label identifying the stage that created an image or volume.
+STAGE_LABEL = "ixian.stage"
+#: Label identifying the hash of a volume's contents.
+HASH_LABEL = "ixian.hash"
+#: Label recording the cache key of the inputs an image was built from.
+CACHE_KEY_LABEL = "ixian.cache_key"
@@ -0,0 +1,121 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import json
+import os
+import tarfile
+import tempfile
+
+from ixian_docker.modules.docker.utils.client import docker_client
+
+
+# Prefix of whiteout files. A whiteout in a layer deletes the file from the layers below it.
+WHITEOUT_PREFIX = ".wh."
+
+# Whiteout that deletes the contents of a directory from the layers below it.
+OPAQUE_WHITEOUT = ".wh..wh..opq"
+
+
+def normalize_path(name):
+    return "/" + os.path.normpath(name).lstrip("/")
+
+
+def read_layer(file):
+    """
+    Read the files in a layer tar.
+
+    :param file: file object of layer tar
+    :return: tuple of (dict mapping path to size, list of deleted paths, list of opaque dirs)
+    """
+    files = {}
+    deleted = []
+    opaque = []
+    with tarfile.open(fileobj=file, mode="r|") as layer:
+        for member in layer:
+            path = normalize_path(member.name)
+            directory, basename = os.path.split(path)
+            if basename == OPAQUE_WHITEOUT:
+                opaque.append(directory)
+            elif basename.startswith(WHITEOUT_PREFIX):
+                deleted.append(os.path.join(directory, basename[len(WHITEOUT_PREFIX) :]))
+            elif member.isreg():
+                files[path] = member.size
+    return files, deleted, opaque
+
+
+def image_layer_files(name):
+    """
+    Read the files in each layer of an image. The image is exported with ``docker save`` to a
+    temporary file and each layer is read from it.
+
+    :param name: name of image
+    :return: list of layers, oldest first. Each layer is a tuple of
+     (dict mapping path to size, list of deleted paths, list of opaque dirs)
+    """
+    image = docker_client().images.get(name)
+    with tempfile.TemporaryFile() as export:
+        for chunk in image.save():
+            export.write(chunk)
+        export.seek(0)
+        with tarfile.open(fileobj=export) as archive:
+            [manifest] = json.load(archive.extractfile("manifest.json"))
+            return [read_layer(archive.extractfile(path)) for path in manifest["Layers"]]
+
+
+def wasted_files(layers):
+    """
+    Find files that are stored in a layer but hidden by a later layer. These files are duplicated
+    between layers or deleted in a later layer, they take space in the image but can't be used.
+    e.g. apt lists downloaded in one RUN and removed in another.
+
+    :param layers: layers from ``image_layer_files``
+    :return: list of dicts with ``path``, ``size`` wasted, ``layers`` that stored the file, and
+     ``reason`` (``duplicated`` or ``deleted``). Largest first.
+    """
+    current = {}
+    wasted = {}
+
+    def hide(path, reason):
+        layer, size = current.pop(path)
+        entry = wasted.setdefault(path, {"path": path, "size": 0, "layers": [], "reason": reason})
+        entry["size"] += size
+        entry["layers"].append(layer)
+        entry["reason"] = reason
+
+    def under(paths, directory):
+        """paths in a sorted list that are within directory"""
+        prefix = directory.rstrip("/") + "/"
+        start = bisect.bisect_left(paths, prefix)
+        end = start
+        while end < len(paths) and paths[end].startswith(prefix):
+            end += 1
+        return paths[start:end]
+
+    for index, (files, deleted, opaque) in enumerate(layers):
+        if deleted or opaque:
+            paths = sorted(current)
+            hidden = [path for directory in opaque for path in under(paths, directory)]
+            for path in deleted:
+                hidden.extend(under(paths, path))
+                if path in current:
+                    hidden.append(path)
+            for path in set(hidden):
+                hide(path, "deleted")
+        for path, size in files.items():
+            if path in current:
+                hide(path, "duplicated")
+            current[path] = (index, size)
+
+    return sorted(wasted.values(), key=lambda entry: entry["size"], reverse=True)
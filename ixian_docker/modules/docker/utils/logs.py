@@ -0,0 +1,178 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+
+from ixian.config import CONFIG
+
+
+logger = logging.getLogger(__name__)
+
+# Max number of lines waiting to be written to a log file. Writes block when the writer falls
+# this far behind, memory stays bounded.
+LOG_QUEUE_SIZE = 1000
+
+# Min seconds between redraws of the rolling tail.
+REDRAW_INTERVAL = 0.1
+
+# Lines shown when the rolling tail isn't drawn, e.g. in CI. Build steps from the classic
+# builder and buildkit.
+STEP_PATTERN = re.compile(r"^(Step \d+/\d+ : |#\d+ \[)")
+
+# Put in the queue when the log is closed.
+LOG_END = object()
+
+# ANSI escapes to move the cursor to the start of a previous line and clear to end of screen.
+CURSOR_UP = "\x1b[{}F"
+CLEAR = "\x1b[J"
+
+
+# Hash in stage tags, e.g. ``python-<hash>``
+TAG_HASH_PATTERN = re.compile(r"-[0-9a-f]{64}")
+
+
+def log_name(image):
+    """
+    Log name for an image. The repository and stage hash are removed so each stage writes to the
+    same log, e.g. ``registry/project:python-<hash>-arm64`` is ``python-arm64``.
+    """
+    name = image.rsplit("/", 1)[-1]
+    name = name.split(":", 1)[1] if ":" in name else name
+    return re.sub(r"[^\w.-]+", "_", TAG_HASH_PATTERN.sub("", name))
+
+
+class RingBuffer:
+    """
+    Last lines of output, up to ``size`` bytes. Older lines are dropped as new lines are added.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.used = 0
+        self.lines = deque()
+
+    def append(self, line):
+        self.lines.append(line)
+        self.used += len(line)
+        while self.used > self.size and len(self.lines) > 1:
+            self.used -= len(self.lines.popleft())
+
+    def tail(self, count=None):
+        """
+        :param count: number of lines, default is every line in the buffer.
+        :return: list of lines, oldest first.
+        """
+        lines = list(self.lines)
+        return lines if count is None else lines[-count:] if count else []
+
+
+class StageLog:
+    """
+    Output of a stage build.
+
+    The full output is written to ``DOCKER.LOG_DIR/<name>.log`` by a writer thread. The last
+    ``DOCKER.LOG_BUFFER_SIZE`` bytes are kept in memory to report failures. On screen only a
+    rolling tail of the last ``DOCKER.LOG_TAIL`` lines is drawn. The tail isn't drawn when output
+    isn't a terminal or several logs share the screen, only build steps are printed then.
+
+    :Example:
+
+    with StageLog(log_name(image)) as log:
+        log.write("Step 1/4 : FROM base")
+    """
+
+    def __init__(self, name, interactive=None, stream=None):
+        self.name = name
+        self.stream = stream or sys.stdout
+        self.path = os.path.join(CONFIG.DOCKER.LOG_DIR, f"{name}.log")
+        self.buffer = RingBuffer(CONFIG.DOCKER.LOG_BUFFER_SIZE)
+        self.tail_lines = CONFIG.DOCKER.LOG_TAIL
+        if interactive is None:
+            interactive = self.stream.isatty()
+        self.interactive = interactive and self.tail_lines > 0
+        self.drawn = 0
+        self.last_draw = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.writer = threading.Thread(target=self.write_file, daemon=True)
+        self.writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_file(self):
+        """Writer thread, writes queued lines to the log file."""
+        with open(self.path, "w") as file:
+            while True:
+                line = self.queue.get()
+                if line is LOG_END:
+                    return
+                file.write(line + "\n")
+
+    def write(self, line):
+        """
+        Add a line of output.
+        :param line: line without trailing newline.
+        """
+        if line is None:
+            return
+        self.buffer.append(line)
+        self.queue.put(line)
+        if self.interactive:
+            if time.time() - self.last_draw >= REDRAW_INTERVAL:
+                self.draw()
+        elif STEP_PATTERN.match(line):
+            print(f"[{self.name}] {line}", file=self.stream)
+
+    def draw(self):
+        """Redraw the rolling tail in place."""
+        width = shutil.get_terminal_size().columns
+        output = CURSOR_UP.format(self.drawn) + CLEAR if self.drawn else ""
+        lines = [f"[{self.name}] {line}"[:width] for line in self.buffer.tail(self.tail_lines)]
+        self.stream.write(output + "".join(f"{line}\n" for line in lines))
+        self.stream.flush()
+        self.drawn = len(lines)
+        self.last_draw = time.time()
+
+    def clear(self):
+        """Remove the rolling tail from the screen."""
+        if self.drawn:
+            self.stream.write(CURSOR_UP.format(self.drawn) + CLEAR)
+            self.stream.flush()
+            self.drawn = 0
+
+    def report_failure(self):
+        """Print the output kept in memory, for a failed build."""
+        self.clear()
+        logger.error(f"Last output from {self.name}, full log: {self.path}")
+        for line in self.buffer.tail():
+            logger.error(line)
+
+    def close(self):
+        """Clear the rolling tail and wait for the log file to be written."""
+        self.clear()
+        self.queue.put(LOG_END)
+        self.writer.join()
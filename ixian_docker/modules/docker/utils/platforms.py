@@ -0,0 +1,218 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import platform
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from ixian.config import CONFIG
+from ixian.exceptions import ExecuteFailed
+from ixian.utils.filesystem import pwd
+from ixian_docker.modules.docker.utils.labels import PROJECT_LABEL
+from ixian_docker.modules.docker.utils.logs import StageLog, log_name
+
+
+logger = logging.getLogger(__name__)
+
+BUILDX = ["docker", "buildx"]
+
+#: Layer compression supported by ``DOCKER.STAGE_COMPRESSION``
+COMPRESSIONS = ["gzip", "zstd", "estargz"]
+
+# Docker architecture for each ``platform.machine()``
+MACHINE_ARCHITECTURES = {
+    "x86_64": "amd64",
+    "aarch64": "arm64",
+    "armv7l": "arm/v7",
+    "armv6l": "arm/v6",
+    "i386": "386",
+    "i686": "386",
+}
+
+
+def native_platform():
+    """
+    Platform of native builds on this machine, e.g. ``linux/amd64``. Images are linux images on
+    every OS, docker desktop runs a linux VM with the machine's architecture.
+    """
+    machine = platform.machine().lower()
+    return f"linux/{MACHINE_ARCHITECTURES.get(machine, machine)}"
+
+
+def platform_arch(platform):
+    """
+    Architecture of a platform, used as a tag suffix.
+    e.g. ``linux/amd64`` is ``amd64`` and ``linux/arm/v7`` is ``arm-v7``
+    """
+    return "-".join(platform.split("/")[1:]) or platform
+
+
+def platform_tag(tag, platform):
+    """
+    Tag for the image built for a single platform, e.g. ``python-<hash>-arm64``
+    """
+    return f"{tag}-{platform_arch(platform)}"
+
+
+def output_args(image, compression=None):
+    """
+    buildx args to push an image. Layers are gzipped unless another compression is given.
+
+    zstd and estargz layers are pushed with OCI media types, the daemon pulling them must support
+    them. eStargz layers can be lazily pulled by snapshotters that support it, and are pulled as
+    gzip by ones that don't.
+
+    :param image: image and tag to push
+    :param compression: ``gzip``, ``zstd`` or ``estargz``
+    :return: list of args
+    """
+    if not compression:
+        return ["--push", "-t", image]
+    if compression not in COMPRESSIONS:
+        raise ExecuteFailed(
+            f"Unknown layer compression '{compression}', expected one of: {', '.join(COMPRESSIONS)}"
+        )
+    output = f"type=image,name={image},push=true,compression={compression},force-compression=true"
+    if compression != "gzip":
+        output += ",oci-mediatypes=true"
+    return ["--output", output]
+
+
+def buildx_command(
+    dockerfile,
+    image,
+    platform,
+    context,
+    buildargs=None,
+    labels=None,
+    target=None,
+    compression=None,
+    **kwargs,
+):
+    """
+    Command to build and push an image for a single platform with ``docker buildx build``.
+
+    :param dockerfile: path to dockerfile, relative to context
+    :param image: image and tag to push
+    :param platform: platform to build for, e.g. ``linux/arm64``. None builds for the builder's
+     platform.
+    :param context: build context
+    :param buildargs: dict of build args
+    :param labels: dict of labels
+    :param target: build stage to target
+    :param compression: layer compression, default is gzip.
+    :return: list of args
+    """
+    if kwargs:
+        logger.debug(f"Options not supported by buildx are ignored: {sorted(kwargs)}")
+    command = BUILDX + ["build"]
+    if platform:
+        command += ["--platform", platform]
+    command += output_args(image, compression)
+    if CONFIG.DOCKER.BUILDX_BUILDER:
+        command += ["--builder", CONFIG.DOCKER.BUILDX_BUILDER]
+    command += ["-f", os.path.join(context, dockerfile)]
+    if target:
+        command += ["--target", target]
+    for key, value in (buildargs or {}).items():
+        command += ["--build-arg", f"{key}={value}"]
+    for key, value in (labels or {}).items():
+        command += ["--label", f"{key}={value}"]
+    command.append(context)
+    return command
+
+
+def run_buildx(command, platform, name=None):
+    """
+    Run a buildx command. Output is written to a ``StageLog`` for each platform so concurrent
+    builds can be told apart. Concurrent builds only show their build steps on screen.
+
+    :param command: buildx command
+    :param platform: platform being built, None for the builder's platform.
+    :param name: log name, default is the platform's arch.
+    :return: exit code
+    """
+    arch = platform_arch(platform) if platform else "buildx"
+    name = name or arch
+    logger.debug(f"[{name}] {' '.join(command)}")
+    with StageLog(name, interactive=False if platform else None) as log:
+        process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True
+        )
+        for line in process.stdout:
+            log.write(line.rstrip())
+        code = process.wait()
+        if code != 0:
+            log.report_failure()
+    return code
+
+
+def build_platforms(dockerfile, repository, tag, platforms, context=None, **kwargs):
+    """
+    Build an image for several platforms and push it as a manifest list.
+
+    Each platform is built concurrently by ``docker buildx`` and pushed with a per-platform tag,
+    e.g. ``python-<hash>-arm64``. A manifest list referencing them is then pushed as ``tag``.
+    Foreign platforms are emulated with qemu, binfmt handlers must be installed.
+
+    :param dockerfile: path to dockerfile, relative to context
+    :param repository: repository to push to
+    :param tag: tag for the manifest list
+    :param platforms: list of platforms, e.g. ``["linux/amd64", "linux/arm64"]``
+    :param context: build context, default is the working directory
+    :return: list of per-platform images
+    """
+    context = context or pwd()
+    kwargs["labels"] = dict(kwargs.get("labels") or {}, **{PROJECT_LABEL: CONFIG.PROJECT_NAME})
+    images = {platform: f"{repository}:{platform_tag(tag, platform)}" for platform in platforms}
+
+    with ThreadPoolExecutor(max_workers=len(platforms)) as executor:
+        codes = {
+            platform: executor.submit(
+                run_buildx,
+                buildx_command(dockerfile, image, platform, context, **kwargs),
+                platform,
+                log_name(image),
+            )
+            for platform, image in images.items()
+        }
+    failed = [platform for platform, future in codes.items() if future.result() != 0]
+    if failed:
+        raise ExecuteFailed(f"Build failed for platforms: {', '.join(failed)}")
+
+    manifest = f"{repository}:{tag}"
+    logger.info(f"Creating manifest list {manifest}")
+    command = BUILDX + ["imagetools", "create", "-t", manifest] + list(images.values())
+    if subprocess.call(command) != 0:
+        raise ExecuteFailed(f"Couldn't create manifest list: {manifest}")
+    return list(images.values())
+
+
+def build_buildx(dockerfile, image, context=None, **kwargs):
+    """
+    Build an image for the builder's platform with ``docker buildx`` and push it. Used for stages
+    with a layer compression set in ``DOCKER.STAGE_COMPRESSION``.
+
+    :param dockerfile: path to dockerfile, relative to context
+    :param image: image and tag to push
+    :param context: build context, default is the working directory
+    :param kwargs: buildx options, see ``buildx_command``
+    """
+    context = context or pwd()
+    kwargs["labels"] = dict(kwargs.get("labels") or {}, **{PROJECT_LABEL: CONFIG.PROJECT_NAME})
+    command = buildx_command(dockerfile, image, None, context, **kwargs)
+    if run_buildx(command, None, log_name(image)) != 0:
+        raise ExecuteFailed(f"Build failed: {image}")
@@ -14,19 +14,26 @@
 
 from ixian_docker.utils.print import ProgressPrinter
 
+# Statuses of push and pull events that report the progress of a layer transfer.
+TRANSFER_STATUSES = {"Downloading", "Pushing"}
+
 
 def print_docker_transfer_events(events):
     """
     Print a stream of events from a docker push or pull.
 
     :param events:
-    :return:
+    :return: bytes transferred, the sum of the sizes of layers that were downloaded or pushed.
     """
     printer = ProgressPrinter()
+    transferred = {}
     for event in events:
         if "id" in event:
             # layer events all have an id
             file_id = event["id"]
+            if event.get("status") in TRANSFER_STATUSES:
+                total = event.get("progressDetail", {}).get("total", 0)
+                transferred[file_id] = max(transferred.get(file_id, 0), total)
             if file_id not in printer.line_numbers:
                 printer.add_line(file_id)
             printer.print(
@@ -47,6 +54,8 @@ def print_docker_transfer_events(events):
                 # some events like push digest happen twice, they can be ignored.
                 pass
 
+    return sum(transferred.values())
+
 
 def format_pull_status_minimal(status, seen_layers=None):
     """
@@ -102,3 +111,143 @@ def format_bytes(size):
     else:
         formatted_size = size
     return f"{formatted_size}{power_labels[n]}"
+
+
+def format_layer_command(created_by, width=80):
+    """
+    Format the command that created a layer as a dockerfile instruction.
+    :param created_by: ``CreatedBy`` from image history
+    :param width: max length of the formatted command
+    :return: string
+    """
+    command = " ".join(created_by.split())
+    if command.startswith("/bin/sh -c #(nop) "):
+        command = command[len("/bin/sh -c #(nop) ") :]
+    elif command.startswith("/bin/sh -c "):
+        command = "RUN " + command[len("/bin/sh -c ") :]
+    if len(command) > width:
+        command = command[: width - 3] + "..."
+    return command
+
+
+def format_layer_report(name, layers, build_time=None):
+    """
+    Format a report of the layers in an image and their sizes.
+    :param name: name of image
+    :param layers: list of layers from ``image_layers``
+    :param build_time: seconds it took to build the image, if it was built.
+    :return: list of lines
+    """
+    total = sum(layer["size"] for layer in layers)
+    summary = f"size: {format_bytes(total)}  layers: {len(layers)}"
+    if build_time is not None:
+        summary += f"  build time: {build_time:.1f}s"
+
+    lines = [name, summary]
+    for layer in layers:
+        size = format_bytes(layer["size"])
+        lines.append(f"{size:>10}  {format_layer_command(layer['created_by'])}")
+    return lines
+
+
+def format_change(before, after, format_value):
+    """Format a change in a measurement, e.g. ``10.00MB -> 8.00MB (-2.00MB)``"""
+    delta = after - before
+    sign = "-" if delta < 0 else "+"
+    return f"{format_value(before)} -> {format_value(after)} ({sign}{format_value(abs(delta))})"
+
+
+def format_build_comparison(current, previous):
+    """
+    Compare a build with the previous build of the same stage.
+    :param current: build report record of the build
+    :param previous: build report record of the previous build
+    :return: list of lines, empty if nothing was recorded for both builds.
+    """
+    measures = [
+        ("size", current.get("size"), previous.get("size"), format_bytes),
+        ("layers", current.get("layers"), previous.get("layers"), str),
+        (
+            "build time",
+            current.get("timings", {}).get("build"),
+            previous.get("timings", {}).get("build"),
+            format_duration,
+        ),
+    ]
+    changes = [
+        f"{label}: {format_change(before, after, format_value)}"
+        for label, after, before, format_value in measures
+        if after is not None and before is not None
+    ]
+    return [f"compared to previous build  {'  '.join(changes)}"] if changes else []
+
+
+def format_trace_summary(summary):
+    """
+    Format a summary of traced docker API requests.
+    :param summary: list of endpoint totals from ``summarize_trace``
+    :return: list of lines
+    """
+    count = sum(group["count"] for group in summary)
+    latency = sum(group["latency"] for group in summary)
+    sent = sum(group["request_bytes"] for group in summary)
+    received = sum(group["response_bytes"] for group in summary)
+    lines = [
+        f"Docker API: {count} requests  time: {latency:.3f}s  "
+        f"sent: {format_bytes(sent)}  received: {format_bytes(received)}",
+        f"{'count':>6} {'total':>9} {'max':>9} {'received':>10}  endpoint",
+    ]
+    for group in summary:
+        lines.append(
+            f"{group['count']:>6} {group['latency']:>8.3f}s {group['max_latency']:>8.3f}s "
+            f"{format_bytes(group['response_bytes']):>10}  {group['method']} {group['endpoint']}"
+        )
+    return lines
+
+
+def format_wasted_files(wasted, limit=10):
+    """
+    Format a report of files hidden by later layers.
+    :param wasted: list of files from ``wasted_files``
+    :param limit: max number of files to list
+    :return: list of lines
+    """
+    total = sum(entry["size"] for entry in wasted)
+    lines = [f"wasted: {format_bytes(total)}  files: {len(wasted)}"]
+    for entry in wasted[:limit]:
+        layers = ",".join(str(layer) for layer in entry["layers"])
+        lines.append(
+            f"{format_bytes(entry['size']):>10}  {entry['reason']:<10}  {entry['path']}"
+            f"  (layers {layers})"
+        )
+    if len(wasted) > limit:
+        lines.append(f"... {len(wasted) - limit} more")
+    return lines
+
+
+def format_duration(seconds):
+    """Format a duration, e.g. ``1m20s`` or ``4.2s``"""
+    if seconds >= 60:
+        return f"{int(seconds // 60)}m{int(seconds % 60):02d}s"
+    return f"{seconds:.1f}s"
+
+
+def format_advice(path, issues):
+    """
+    Format issues found in a dockerfile.
+    :param path: path to dockerfile
+    :param issues: list of issues from ``advise``
+    :return: list of lines
+    """
+    if not issues:
+        return [f"{path}: no issues"]
+    lines = [f"{path}: {len(issues)} issues"]
+    for issue in issues:
+        instruction = issue["instruction"]
+        cost = f"  ~{format_duration(issue['cost'])} per rebuild" if issue["cost"] else ""
+        lines.append(f"  line {instruction['line']}: {issue['rule']} ({issue['kind']}){cost}")
+        lines.append(
+            f"    {format_layer_command(instruction['instruction'] + ' ' + instruction['arguments'], width=76)}"
+        )
+        lines.append(f"    {issue['message']}")
+    return lines
@@ -0,0 +1,104 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+
+import docker
+import requests
+
+from ixian.config import CONFIG
+from ixian_docker.modules.docker.utils.client import docker_client
+from ixian_docker.modules.docker.utils.trace import trace_client
+
+
+logger = logging.getLogger(__name__)
+
+#: Name of the local docker daemon. Stages without a configured builder build locally.
+LOCAL_BUILDER = "local"
+
+# Global cache of clients for remote builders.
+BUILDER_CLIENTS = {}
+
+
+class UnknownBuilder(Exception):
+    """Exception raised when builder is not configured"""
+
+    pass
+
+
+def builder_client(name):
+    """
+    Get a docker client for a builder. Clients for remote builders are configured by
+    ``DOCKER.BUILDERS``.
+
+    :param name: name of builder
+    :return: docker client
+    """
+    if name == LOCAL_BUILDER:
+        return docker_client()
+
+    try:
+        return BUILDER_CLIENTS[name]
+    except KeyError:
+        pass
+
+    try:
+        options = CONFIG.DOCKER.BUILDERS[name]
+    except KeyError:
+        raise UnknownBuilder(name)
+
+    client = trace_client(docker.DockerClient(**options))
+    BUILDER_CLIENTS[name] = client
+    return client
+
+
+def builder_load(client):
+    """
+    Load on a builder. Builds run in containers so load is measured by running containers.
+
+    :param client: docker client for builder
+    :return: number of running containers or None if the builder is unavailable.
+    """
+    try:
+        return client.info()["ContainersRunning"]
+    except (docker.errors.DockerException, requests.exceptions.RequestException) as exception:
+        logger.warning(f"Builder unavailable: {exception}")
+        return None
+
+
+def select_builder(stage):
+    """
+    Select the builder for a stage. ``DOCKER.STAGE_BUILDERS`` maps stages to a builder or to a
+    pool of builders. The least loaded builder in a pool is selected, unavailable builders are
+    skipped.
+
+    :param stage: name of stage
+    :return: tuple of builder name and docker client
+    """
+    builders = CONFIG.DOCKER.STAGE_BUILDERS.get(stage, LOCAL_BUILDER)
+    if isinstance(builders, str):
+        return builders, builder_client(builders)
+
+    selected = None
+    for name in builders:
+        client = builder_client(name)
+        load = builder_load(client)
+        logger.debug(f"Builder {name} load={load}")
+        if load is not None and (selected is None or load < selected[2]):
+            selected = (name, client, load)
+
+    if selected is None:
+        logger.warning(f"No builders available for {stage}, building locally.")
+        return LOCAL_BUILDER, docker_client()
+    return selected[:2]
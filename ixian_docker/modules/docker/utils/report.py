@@ -0,0 +1,86 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from docker.errors import ImageNotFound
+
+from ixian.config import CONFIG
+from ixian_docker.modules.docker.utils.client import docker_client
+
+
+#: Decisions recorded by ``build_image_if_needed``
+LOCAL_HIT = "local-hit"
+REGISTRY_PULL = "registry-pull"
+BUILD = "build"
+
+
+@contextmanager
+def timed(timings, phase):
+    """
+    Record the time a phase takes. Time is added to the phase if it runs more than once.
+
+    :param timings: dict of phase timings
+    :param phase: name of phase
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0) + time.time() - start
+
+
+def image_summary(name):
+    """
+    Size and layer count of an image.
+    :param name: name of image
+    :return: dict with ``size`` and ``layers``, values are None if the image doesn't exist.
+    """
+    try:
+        attrs = docker_client().images.get(name).attrs
+    except ImageNotFound:
+        return {"size": None, "layers": None}
+    return {"size": attrs.get("Size"), "layers": len(attrs.get("RootFS", {}).get("Layers", []))}
+
+
+def write_build_report(record):
+    """
+    Append a record to the build report, :code:`DOCKER.BUILD_REPORT`. The report is JSON Lines,
+    one record per stage each time it's built or reused.
+
+    :param record: dict to append
+    """
+    path = CONFIG.DOCKER.BUILD_REPORT
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as file:
+        file.write(json.dumps(dict(record, timestamp=time.time()), sort_keys=True) + "\n")
+
+
+def read_build_report(path=None):
+    """
+    Read records from a build report.
+    :param path: path to report, default is :code:`DOCKER.BUILD_REPORT`
+    :return: list of records
+    """
+    path = path or CONFIG.DOCKER.BUILD_REPORT
+    try:
+        with open(path) as file:
+            return [json.loads(line) for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
@@ -0,0 +1,211 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+from ixian.config import CONFIG
+
+
+logger = logging.getLogger(__name__)
+
+# OTLP span status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# OTLP span kind: internal
+SPAN_KIND_INTERNAL = 1
+
+# Global list of finished spans.
+SPANS = []
+
+# All spans in a run share one trace id so they appear in a single trace.
+TRACE_ID = os.urandom(16).hex()
+
+# Stack of active spans in each thread.
+ACTIVE = threading.local()
+
+
+def spans_config():
+    """
+    Span export destinations.
+    :return: tuple of (file, endpoint), either may be None
+    """
+    try:
+        return CONFIG.DOCKER.SPANS_FILE, CONFIG.DOCKER.SPANS_ENDPOINT
+    except AttributeError:
+        return None, None
+
+
+def spans_enabled():
+    """Spans are recorded if :code:`DOCKER.SPANS_FILE` or :code:`DOCKER.SPANS_ENDPOINT` is set."""
+    return any(spans_config())
+
+
+def active_spans():
+    if not hasattr(ACTIVE, "stack"):
+        ACTIVE.stack = []
+    return ACTIVE.stack
+
+
+def set_span_attributes(**attributes):
+    """
+    Add attributes to the innermost active span, e.g. the decision made by a build. Does nothing
+    if there isn't an active span.
+    """
+    stack = active_spans()
+    if stack:
+        stack[-1]["attributes"].update(attributes)
+
+
+def span(name, *arguments):
+    """
+    Decorator that records a span around each call of the decorated function. Spans are only
+    recorded when spans are enabled.
+
+    :Example:
+
+    @span("pull_image", "repository", "tag")
+    def pull_image(repository, tag=None):
+
+    :param name: name of span
+    :param arguments: names of arguments to record as span attributes.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not spans_enabled():
+                return func(*args, **kwargs)
+
+            bound = signature.bind_partial(*args, **kwargs)
+            stack = active_spans()
+            record = {
+                "name": name,
+                "span_id": os.urandom(8).hex(),
+                "parent_span_id": stack[-1]["span_id"] if stack else None,
+                "start": time.time_ns(),
+                "attributes": {
+                    argument: bound.arguments[argument]
+                    for argument in arguments
+                    if bound.arguments.get(argument) is not None
+                },
+                "status": STATUS_OK,
+                "message": None,
+            }
+            stack.append(record)
+            try:
+                return func(*args, **kwargs)
+            except Exception as exception:
+                record["status"] = STATUS_ERROR
+                record["message"] = f"{type(exception).__name__}: {exception}"
+                raise
+            finally:
+                stack.pop()
+                record["end"] = time.time_ns()
+                SPANS.append(record)
+
+        return wrapper
+
+    return decorator
+
+
+def otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_attributes(attributes):
+    return [{"key": key, "value": otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_span(record):
+    span = {
+        "traceId": TRACE_ID,
+        "spanId": record["span_id"],
+        "name": record["name"],
+        "kind": SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": str(record["start"]),
+        "endTimeUnixNano": str(record["end"]),
+        "attributes": otlp_attributes(record["attributes"]),
+        "status": {"code": record["status"]},
+    }
+    if record["parent_span_id"]:
+        span["parentSpanId"] = record["parent_span_id"]
+    if record["message"]:
+        span["status"]["message"] = record["message"]
+    return span
+
+
+def otlp_request(spans=None):
+    """
+    Spans formatted as an OTLP/JSON ``ExportTraceServiceRequest``.
+    :param spans: list of finished spans, default is ``SPANS``
+    :return: dict
+    """
+    if spans is None:
+        spans = SPANS
+    resource = {"service.name": getattr(CONFIG, "PROJECT_NAME", None) or "ixian"}
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": otlp_attributes(resource)},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "ixian_docker"},
+                        "spans": [otlp_span(record) for record in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def export_spans():
+    """
+    Export finished spans. Spans are appended to :code:`DOCKER.SPANS_FILE` as a line of OTLP/JSON
+    and posted to the OTLP/HTTP collector at :code:`DOCKER.SPANS_ENDPOINT`.
+    """
+    if not SPANS:
+        return
+    file, endpoint = spans_config()
+    request = otlp_request()
+    if file:
+        os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+        with open(file, "a") as output:
+            output.write(json.dumps(request) + "\n")
+    if endpoint:
+        try:
+            requests.post(endpoint, json=request, timeout=10).raise_for_status()
+        except requests.RequestException as exception:
+            logger.warning(f"Couldn't export spans to {endpoint}: {exception}")
+    SPANS.clear()
+
+
+atexit.register(export_spans)
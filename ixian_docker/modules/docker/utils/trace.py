@@ -0,0 +1,141 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import re
+import sys
+
+from ixian.config import CONFIG
+from ixian_docker.modules.docker.utils.print import format_trace_summary
+
+
+#: Command line flag that enables tracing, e.g. ``ix --trace-docker build_image``
+TRACE_FLAG = "--trace-docker"
+
+VERSION_PATTERN = re.compile(r"^/v[0-9.]+")
+
+# Paths for a single object, e.g. ``/images/<name>/json``. Names may contain slashes.
+OBJECT_PATTERN = re.compile(
+    r"^/(?P<resource>images|containers|volumes|networks|distribution|exec)/(?P<name>.+?)"
+    r"(?P<action>/(json|history|push|tag|get|start|stop|wait|logs|attach|kill|archive|stats"
+    r"|top|changes|export|rename|pause|unpause|update|restart|resize))?$"
+)
+
+# Paths for a collection, e.g. ``/images/json``. They match OBJECT_PATTERN but aren't an object.
+COLLECTION_ACTIONS = {"json", "create", "prune", "load", "search", "get"}
+
+# Global list of traced requests.
+TRACE = []
+
+
+def trace_enabled():
+    """
+    Tracing is enabled by the :code:`--trace-docker` flag or :code:`DOCKER.TRACE`.
+    """
+    if TRACE_FLAG in sys.argv:
+        return True
+    try:
+        return bool(CONFIG.DOCKER.TRACE)
+    except AttributeError:
+        return False
+
+
+def endpoint(path):
+    """
+    Normalize a request path so requests for different objects are grouped together.
+    e.g. ``/v1.40/images/foo:latest/json`` is ``/images/{name}/json``
+
+    :param path: request path
+    :return: normalized path
+    """
+    path = VERSION_PATTERN.sub("", path.split("?")[0])
+    match = OBJECT_PATTERN.match(path)
+    if not match or match.group("name") in COLLECTION_ACTIONS:
+        return path
+    return f"/{match.group('resource')}/{{name}}{match.group('action') or ''}"
+
+
+def trace_response(response, *args, **kwargs):
+    """
+    requests response hook that records a docker API request.
+
+    Latency is the time until the response headers were received, streamed responses (build, pull,
+    push) take longer to consume. Sizes are from Content-Length and are 0 for chunked payloads.
+    """
+    request = response.request
+    TRACE.append(
+        {
+            "method": request.method,
+            "endpoint": endpoint(request.path_url),
+            "status": response.status_code,
+            "latency": response.elapsed.total_seconds(),
+            "request_bytes": int(request.headers.get("Content-Length") or 0),
+            "response_bytes": int(response.headers.get("Content-Length") or 0),
+        }
+    )
+
+
+def trace_client(client):
+    """
+    Record requests made by a docker client if tracing is enabled. A summary is printed at exit.
+
+    :param client: ``docker.DockerClient`` to trace
+    :return: client
+    """
+    hooks = client.api.hooks["response"]
+    if not trace_enabled() or trace_response in hooks:
+        return client
+    hooks.append(trace_response)
+    return client
+
+
+def summarize_trace(trace=None):
+    """
+    Group traced requests by method and endpoint.
+
+    :param trace: list of traced requests, default is ``TRACE``
+    :return: list of dicts with totals for each endpoint, slowest first.
+    """
+    groups = {}
+    for record in TRACE if trace is None else trace:
+        key = (record["method"], record["endpoint"])
+        group = groups.setdefault(
+            key,
+            {
+                "method": record["method"],
+                "endpoint": record["endpoint"],
+                "count": 0,
+                "latency": 0,
+                "max_latency": 0,
+                "request_bytes": 0,
+                "response_bytes": 0,
+            },
+        )
+        group["count"] += 1
+        group["latency"] += record["latency"]
+        group["max_latency"] = max(group["max_latency"], record["latency"])
+        group["request_bytes"] += record["request_bytes"]
+        group["response_bytes"] += record["response_bytes"]
+    return sorted(groups.values(), key=lambda group: group["latency"], reverse=True)
+
+
+def print_trace_summary():
+    """Print a summary of traced requests, if any were traced."""
+    if not TRACE:
+        return
+    for line in format_trace_summary(summarize_trace()):
+        print(line)
+
+
+atexit.register(print_trace_summary)
@@ -12,38 +12,243 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import logging
+import re
+import time
 
 import docker
-from docker.errors import NotFound as DockerNotFound
 
+from ixian.build import write_file
 from ixian.utils.process import execute
-from ixian.config import CONFIG
+from ixian.config import CONFIG, MissingConfiguration
 from ixian_docker.modules.docker.utils.client import docker_client
+from ixian_docker.modules.docker.utils.labels import PROJECT_LABEL, STAGE_LABEL, HASH_LABEL
 
 
-def delete_volume(image):
-    try:
-        volume = docker_client().volumes.get(image)
-    except docker.errors.NotFound:
-        pass
-    else:
+logger = logging.getLogger(__name__)
+
+# Valid names of docker volumes. Sources of volume mappings that don't match are host paths.
+VOLUME_NAME_PATTERN = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9_.-]+$")
+
+
+def create_volume(name, labels=None):
+    """
+    Create a docker volume managed by ixian. Managed volumes are labeled with the project and are
+    garbage collected by ``evict_volumes``.
+
+    :param name: name of volume
+    :param labels: dict of labels for the volume
+    :return: the volume
+    """
+    logger.debug(f"Creating docker volume: {name}")
+    labels = dict(labels or {}, **{PROJECT_LABEL: CONFIG.PROJECT_NAME})
+    volume = docker_client().volumes.create(name, labels=labels)
+    touch_volume(name)
+    return volume
+
+
+def find_volumes(*names, labels=None):
+    """
+    Find volumes with a single query to docker. Volumes are filtered by name and label.
+
+    :param names: names of volumes to find, all volumes if no names are given.
+    :param labels: dict of labels volumes must have. A label with a value of None matches any
+        value.
+    :return: dict mapping name to volume for the volumes that exist.
+    """
+    filters = {}
+    if names:
+        filters["name"] = list(names)
+    if labels:
+        filters["label"] = [
+            key if value is None else f"{key}={value}" for key, value in labels.items()
+        ]
+    volumes = docker_client().volumes.list(filters=filters)
+
+    # the name filter matches partial names, only exact matches are returned.
+    return {volume.name: volume for volume in volumes if not names or volume.name in names}
+
+
+def volume_exists(name, labels=None):
+    """
+    Check if volume exists.
+    :param name: name of volume
+    :param labels: dict of labels volume must have.
+    :return: True/False
+    """
+    return name in find_volumes(name, labels=labels)
+
+
+def delete_volume(*names):
+    """
+    Delete volumes. Volumes that don't exist are skipped.
+    :param names: names of volumes to delete
+    :return: list of names of deleted volumes
+    """
+    if not names:
+        return []
+    deleted = []
+    for name, volume in find_volumes(*names).items():
         volume.remove(True)
-        logger.debug("Deleted docker image: %s" % image)
+        logger.debug(f"Deleted docker volume: {name}")
+        deleted.append(name)
+    return deleted
 
 
 def delete_all_volumes():
-    raise NotImplementedError
+    """
+    Delete all volumes managed by ixian for this project. Volumes in use are skipped.
+    :return: list of names of deleted volumes
+    """
+    deleted = []
+    for volume in managed_volumes():
+        if remove_volume(volume):
+            deleted.append(volume.name)
+    forget_volumes(deleted)
+    return deleted
+
+
+def compose_volumes():
+    """
+    Names of the docker volumes mounted by ``compose``, from ``DOCKER.NAMED_VOLUMES``. Host paths
+    and volumes whose config isn't available are skipped.
+    :return: list of names
+    """
+    names = []
+    for volume in CONFIG.DOCKER.NAMED_VOLUMES:
+        try:
+            name = CONFIG.format(volume)
+        except (MissingConfiguration, AttributeError):
+            logger.debug(f"Volume isn't configured: {volume}")
+            continue
+        if VOLUME_NAME_PATTERN.match(name) and name not in names:
+            names.append(name)
+    return names
+
+
+def prepare_volumes():
+    """
+    Create the volumes ``compose`` mounts and record that they're used. docker-compose creates
+    missing volumes without labels, they're created here so they're labeled and garbage collected
+    by ``evict_volumes``.
+    :return: list of names of created volumes
+    """
+    names = compose_volumes()
+    if not names:
+        return []
+    existing = find_volumes(*names)
+    created = [name for name in names if name not in existing]
+    for name in created:
+        create_volume(name)
+    touch_volume(*existing)
+    return created
 
 
-def volume_exists(tag):
-    client = docker.from_env()
+def managed_volumes():
+    """
+    List volumes managed by ixian for this project. These are the volumes labeled with the project
+    and the volumes mounted by ``compose``, including ones created before they were labeled.
+    :return: list of volumes
+    """
+    volumes = find_volumes(labels={PROJECT_LABEL: CONFIG.PROJECT_NAME})
+    names = compose_volumes()
+    if names:
+        volumes.update(find_volumes(*names))
+    return list(volumes.values())
+
+
+def remove_volume(volume):
+    """
+    Remove a volume, skipping it if it's in use by a container.
+    :param volume: volume to remove
+    :return: True if removed, otherwise False
+    """
     try:
-        client.images.get(tag)
-    except DockerNotFound:
+        volume.remove()
+    except docker.errors.APIError as exception:
+        logger.debug(f"Could not remove volume {volume.name}: {exception}")
         return False
-    else:
-        return True
+    logger.debug(f"Deleted docker volume: {volume.name}")
+    return True
+
+
+def read_volume_usage():
+    """
+    Read the last time each managed volume was used.
+    :return: dict mapping volume name to timestamp
+    """
+    try:
+        with open(CONFIG.DOCKER.VOLUME_USAGE_FILE) as file:
+            return json.loads(file.read())
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return {}
+
+
+def touch_volume(*names):
+    """
+    Record that volumes were used. Volumes used least recently are evicted first.
+    :param names: names of volumes
+    """
+    if not names:
+        return
+    usage = read_volume_usage()
+    now = time.time()
+    for name in names:
+        usage[name] = now
+    write_file(CONFIG.DOCKER.VOLUME_USAGE_FILE, json.dumps(usage))
+
+
+def forget_volumes(names):
+    """
+    Remove usage records for volumes.
+    :param names: names of volumes
+    """
+    if not names:
+        return
+    usage = read_volume_usage()
+    for name in names:
+        usage.pop(name, None)
+    write_file(CONFIG.DOCKER.VOLUME_USAGE_FILE, json.dumps(usage))
+
+
+def volume_sizes():
+    """
+    Get the size of each volume and the number of containers using it.
+    :return: dict mapping volume name to a (size, ref_count) tuple.
+    """
+    sizes = {}
+    for volume in docker_client().df().get("Volumes") or []:
+        usage = volume.get("UsageData") or {}
+        sizes[volume["Name"]] = (max(usage.get("Size", 0), 0), usage.get("RefCount", 0))
+    return sizes
+
+
+def evict_volumes(budget):
+    """
+    Evict managed volumes until their total size fits within the budget. Volumes are evicted
+    least recently used first. Volumes in use by a container are never evicted.
+
+    :param budget: max bytes of disk used by managed volumes
+    :return: list of (name, size) tuples for evicted volumes
+    """
+    usage = read_volume_usage()
+    sizes = volume_sizes()
+    volumes = managed_volumes()
+    total = sum(sizes.get(volume.name, (0, 0))[0] for volume in volumes)
+
+    evicted = []
+    for volume in sorted(volumes, key=lambda volume: usage.get(volume.name, 0)):
+        if total <= budget:
+            break
+        size, ref_count = sizes.get(volume.name, (0, 0))
+        if ref_count or not remove_volume(volume):
+            continue
+        total -= size
+        evicted.append((volume.name, size))
+
+    forget_volumes([name for name, size in evicted])
+    return evicted
 
 
 # TODO: deprecate this and let docker-py handle formatting volumes
@@ -23,6 +23,8 @@ class NPMModuleConfig(object):
     tasks = "ixian_docker.modules.npm.tasks"
     config = "ixian_docker.modules.npm.config.NPMConfig"
     dockerfile_template = "{NPM.DOCKERFILE_TEMPLATE}"
+    # Volumes mounted by the compose file, ``DOCKER_NPM_VOLUME``.
+    named_volumes = ["{NPM.VOLUME}"]
 
     def __getitem__(self, key):
         try:
@@ -0,0 +1,33 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+from ixian.check.checker import MultiValueChecker
+from ixian.config import CONFIG
+from ixian_docker.modules.npm.utils import package_file_hash
+
+
+class PackageFileHash(MultiValueChecker):
+    """Checker that hashes the normalized contents of package.json and package-lock.json
+
+    Only fields that affect installed packages are hashed. Fields listed in
+    ``NPM.PACKAGE_FILES_IGNORE`` are ignored, as is formatting and key order.
+
+    State is keyed by the path relative to the working directory so that the hash is the same for
+    every checkout of a project. Missing files (e.g. no package-lock.json) hash as None.
+    """
+
+    def state(self):
+        return {os.path.relpath(path, CONFIG.PWD): package_file_hash(path) for path in self.keys}
@@ -41,11 +41,26 @@ class NPMConfig(Config):
     #: Dockerfile for building NPM intermediate image
     DOCKERFILE: str = "{NPM.MODULE_DIR}/Dockerfile"
 
-    #: Files that are required to build this image.
+    #: Package files that determine which packages are installed in this image.
     #:
-    #: These files will be included in the task and image hashes, and are used to detect the need
-    #: for building.
-    IMAGE_FILES: List[str] = ["{PWD}/root/srv/etc/npm/"]
+    #: These files are normalized and hashed to create the task and image hashes. Only changes
+    #: to the packages trigger a build, other files in the npm config directory are ignored. The
+    #: image is reused from the registry whenever a matching image exists there.
+    PACKAGE_FILES: List[str] = [
+        "{PWD}/root/srv/etc/npm/package.json",
+        "{PWD}/root/srv/etc/npm/package-lock.json",
+    ]
+
+    #: Other files that are copied into the image, e.g. ``.npmrc``. These files are hashed as is,
+    #: any change triggers a build. Missing files are skipped.
+    #:
+    #: Before ``PACKAGE_FILES`` this listed the whole npm config directory. Configs that still set
+    #: it to a directory keep working, but every change in the directory triggers a build.
+    IMAGE_FILES: List[str] = ["{PWD}/root/srv/etc/npm/.npmrc"]
+
+    #: Top level fields of ``PACKAGE_FILES`` excluded from the hash. These fields don't change
+    #: which packages are installed.
+    PACKAGE_FILES_IGNORE: List[str] = ["version", "scripts"]
 
     #: Repository to store docker image in
     REPOSITORY: str = "{DOCKER.REPOSITORY}"
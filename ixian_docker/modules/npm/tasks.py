@@ -17,10 +17,11 @@ import logging
 from ixian.config import CONFIG
 from ixian.modules.filesystem.file_hash import FileHash
 from ixian.task import Task
-from ixian_docker.modules.docker.checker import DockerImageExists
+from ixian_docker.modules.docker.checker import All, DockerImageExists
 from ixian_docker.modules.docker.tasks import run
 from ixian_docker.modules.docker.utils.images import build_image_if_needed
 from ixian_docker.modules.docker.utils.volumes import delete_volume
+from ixian_docker.modules.npm.checker import PackageFileHash
 
 logger = logging.getLogger(__name__)
 NPM_DEPENDS = ["build_app_image"]
@@ -44,6 +45,10 @@ class BuildNPMImage(Task):
     locally or in the registry. If ``--force`` is received the image will build even if an image
     already exists.
 
+    The image hash is calculated from ``NPM.PACKAGE_FILES`` and ``NPM.IMAGE_FILES`` rather than
+    the whole npm config directory. Changes that don't affect installed packages (e.g.
+    ``scripts``) reuse the image.
+
     ``--force`` implies skip-cache for docker build.
     """
 
@@ -54,6 +59,7 @@ class BuildNPMImage(Task):
     short_description = "Build NPM image"
     check = [
         FileHash("{NPM.DOCKERFILE}", *CONFIG.resolve("NPM.IMAGE_FILES")),
+        PackageFileHash(*CONFIG.resolve("NPM.PACKAGE_FILES")),
         DockerImageExists("{NPM.IMAGE}"),
     ]
 
@@ -64,7 +70,7 @@ class BuildNPMImage(Task):
             dockerfile=CONFIG.NPM.DOCKERFILE,
             force=self.__task__.force,
             pull=pull,
-            # recheck=self.check.check,
+            recheck=All(*self.check),
             buildargs={
                 "FROM_REPOSITORY": CONFIG.DOCKER.REPOSITORY,
                 "FROM_TAG": CONFIG.DOCKER.BASE_IMAGE_TAG,
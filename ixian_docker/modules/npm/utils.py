@@ -13,35 +13,259 @@
 # limitations under the License.
 
 import json
+import logging
+import os
 import re
+from glob import glob
+
+from ixian.check.checker import hash_object
 from ixian.config import CONFIG
+from ixian.modules.filesystem.file_hash import hash_file
+
+logger = logging.getLogger(__name__)
 
 LOCAL_PACKAGE = re.compile(r"^file:(?P<var>.*)")
 
+#: package.json sections that may reference local packages.
+DEPENDENCY_SECTIONS = ["dependencies", "devDependencies", "optionalDependencies"]
+
+# Global cache of parsed package files. Maps path to a (digest, data) tuple.
+PACKAGE_FILES = {}
+
+# Global cache of resolved local packages. Maps the root package.json to the index, every package
+# directory, the digests of every file that was read while resolving them, and the expansion of
+# every workspace pattern.
+LOCAL_PACKAGE_INDEXES = {}
+
+
+def file_digest(path):
+    """
+    Digest of a file, or None if it doesn't exist.
+    :param path: path to file
+    :return: sha256 hash of file
+    """
+    try:
+        return hash_file(path)
+    except FileNotFoundError:
+        return None
+
+
+def read_package_file(path, digest=None):
+    """
+    Read and parse a json package file (package.json, package-lock.json). Parsed files are cached
+    by digest, files are only parsed again if their contents change.
+
+    :param path: path to file
+    :param digest: digest of file if already known.
+    :return: parsed file or an empty dict if the file doesn't exist.
+    """
+    digest = digest or file_digest(path)
+    if digest is None:
+        return {}
+
+    cached = PACKAGE_FILES.get(path)
+    if cached and cached[0] == digest:
+        return cached[1]
+
+    with open(path) as file:
+        data = json.loads(file.read())
+    PACKAGE_FILES[path] = (digest, data)
+    return data
+
+
+def normalize_package_file(data, ignore=None):
+    """
+    Normalize a parsed package.json or package-lock.json for hashing.
+
+    Fields in ``ignore`` are removed from the top level. package-lock.json repeats the root
+    package's fields in ``packages[""]``, they're removed from there too. Keys are sorted when the
+    result is hashed with ``hash_object``.
+
+    :param data: parsed package file
+    :param ignore: list of fields to remove, default is ``NPM.PACKAGE_FILES_IGNORE``
+    :return: normalized copy of data
+    """
+    if ignore is None:
+        ignore = CONFIG.NPM.PACKAGE_FILES_IGNORE
+    normalized = {key: value for key, value in data.items() if key not in ignore}
+    packages = normalized.get("packages", {})
+    if "" in packages:
+        root = {key: value for key, value in packages[""].items() if key not in ignore}
+        normalized["packages"] = dict(packages, **{"": root})
+    return normalized
+
+
+def package_file_hash(path, ignore=None):
+    """
+    Hash of a package file's normalized contents. Formatting, key order, and ignored fields (e.g.
+    ``version``, ``scripts``) don't change the hash.
+
+    :param path: path to package file
+    :param ignore: list of fields to ignore, default is ``NPM.PACKAGE_FILES_IGNORE``
+    :return: sha256 hash or None if file doesn't exist
+    """
+    digest = file_digest(path)
+    if digest is None:
+        return None
+    return hash_object(normalize_package_file(read_package_file(path, digest), ignore))
+
 
 def get_package_json():
-    with open(CONFIG.NPM.PACKAGE_JSON) as file:
-        return json.loads(file.read())
+    return read_package_file(CONFIG.NPM.PACKAGE_JSON)
+
+
+def workspace_patterns(package_dir, package_json):
+    """
+    Workspace glob patterns declared by package.json. Workspaces may be a list of glob patterns or
+    a dict with the patterns in ``packages``.
+
+    :param package_dir: directory containing package.json
+    :param package_json: parsed package.json
+    :return: list of patterns joined to package_dir
+    """
+    workspaces = package_json.get("workspaces", [])
+    if isinstance(workspaces, dict):
+        workspaces = workspaces.get("packages", [])
+    return [os.path.join(package_dir, pattern) for pattern in workspaces]
+
+
+def lock_file_packages(package_dir, package_lock):
+    """
+    Find local packages recorded in package-lock.json.
+
+    lockfileVersion 2+ records local packages in ``packages`` either as links or as entries keyed
+    by a path outside of ``node_modules``. lockfileVersion 1 records them in ``dependencies``
+    with a ``file:`` version.
+
+    :param package_dir: directory containing package-lock.json
+    :param package_lock: parsed package-lock.json
+    :return: list of package directories
+    """
+    directories = []
+    for key, datum in package_lock.get("packages", {}).items():
+        if datum.get("link"):
+            directories.append(datum["resolved"])
+        elif key and "node_modules" not in key.split("/"):
+            directories.append(key)
+
+    pending = [package_lock.get("dependencies", {})]
+    while pending:
+        for datum in pending.pop().values():
+            match = LOCAL_PACKAGE.match(datum.get("version", ""))
+            if match:
+                [path] = match.groups()
+                directories.append(path)
+            pending.append(datum.get("dependencies", {}))
 
+    return [os.path.normpath(os.path.join(package_dir, path)) for path in directories]
 
-def npm_local_packages():
+
+def package_name(package_dir):
+    """
+    Name of the package in package_dir. Falls back to the directory name if package.json is
+    missing or doesn't declare a name.
+    """
+    package_json = read_package_file(os.path.join(package_dir, "package.json"))
+    return package_json.get("name") or os.path.basename(package_dir)
+
+
+def is_resolved(cached):
+    """
+    Check a cached resolution is still valid. Files read while resolving must be unchanged and
+    workspace patterns must match the same paths, a new workspace directory invalidates it.
     """
-    Get list of local packages
+    files = cached["files"].items()
+    globs = cached["globs"].items()
+    return all(file_digest(path) == digest for path, digest in files) and all(
+        sorted(glob(pattern)) == paths for pattern, paths in globs
+    )
 
-    :return: a tuple of dicts
+
+def resolve_local_packages(package_json=None):
     """
-    local_dependencies = {}
-    local_dev_dependencies = {}
-    package_json = get_package_json()
-    for name, version in package_json.get("dependencies", {}).items():
-        match = LOCAL_PACKAGE.match(version)
-        if match:
-            [local_dependencies[name]] = match.groups()
-    for name, version in package_json.get("devDependencies", {}).items():
-        match = LOCAL_PACKAGE.match(version)
-        if match:
-            [local_dev_dependencies[name]] = match.groups()
-    return local_dependencies, local_dev_dependencies
+    Resolve all local packages reachable from package.json.
+
+    Local packages are resolved transitively. Each package's ``file:`` dependencies, workspaces,
+    and package-lock.json are searched for more local packages.
+
+    The resolution is cached. It's reused as long as none of the files read to build it have
+    changed and workspace patterns match the same directories.
+
+    :param package_json: path to package.json, default is ``NPM.PACKAGE_JSON``
+    :return: dict with ``packages``, mapping package names to absolute paths, and
+     ``directories``, every local package directory.
+    """
+    package_json = os.path.abspath(package_json or CONFIG.NPM.PACKAGE_JSON)
+    cached = LOCAL_PACKAGE_INDEXES.get(package_json)
+    if cached and is_resolved(cached):
+        return cached
+
+    files = {}
+    globs = {}
+
+    def read(path):
+        digest = file_digest(path)
+        files[path] = digest
+        return read_package_file(path, digest)
+
+    root_dir = os.path.dirname(package_json)
+    packages = {}
+    directories = []
+    seen = {root_dir}
+    pending = [root_dir]
+    while pending:
+        package_dir = pending.pop(0)
+        package_data = read(os.path.join(package_dir, "package.json"))
+        lock_data = read(os.path.join(package_dir, "package-lock.json"))
+
+        local_dirs = []
+        for section in DEPENDENCY_SECTIONS:
+            for name, version in package_data.get(section, {}).items():
+                match = LOCAL_PACKAGE.match(version)
+                if match:
+                    [path] = match.groups()
+                    local_dirs.append(os.path.normpath(os.path.join(package_dir, path)))
+        for pattern in workspace_patterns(package_dir, package_data):
+            globs[pattern] = sorted(glob(pattern))
+            for path in globs[pattern]:
+                # read even if missing so adding package.json later invalidates the cache
+                manifest = os.path.join(path, "package.json")
+                read(manifest)
+                if files[manifest] is not None:
+                    local_dirs.append(os.path.normpath(path))
+        local_dirs.extend(lock_file_packages(package_dir, lock_data))
+
+        for local_dir in local_dirs:
+            if local_dir in seen:
+                continue
+            seen.add(local_dir)
+            read(os.path.join(local_dir, "package.json"))
+            directories.append(local_dir)
+            name = package_name(local_dir)
+            if name in packages:
+                logger.warning(
+                    f"Local package {name} found in {packages[name]} and {local_dir}, "
+                    f"using {packages[name]}"
+                )
+            else:
+                packages[name] = local_dir
+            pending.append(local_dir)
+
+    resolved = {"files": files, "globs": globs, "packages": packages, "directories": directories}
+    LOCAL_PACKAGE_INDEXES[package_json] = resolved
+    return resolved
+
+
+def npm_local_package_index(package_json=None):
+    """
+    Index of local packages reachable from package.json, see ``resolve_local_packages``.
+    Packages are indexed by name, if several directories have the same name the first found is
+    used.
+
+    :param package_json: path to package.json, default is ``NPM.PACKAGE_JSON``
+    :return: dict mapping package names to absolute paths.
+    """
+    return resolve_local_packages(package_json)["packages"]
 
 
 def npm_local_package_mount_flags():
@@ -52,15 +276,13 @@ def npm_local_package_mount_flags():
     NPM only installs local packages with symlinks, so the library must also
     be mounted when used (e.g. when building with webpack)
 
+    Local packages are resolved transitively by `resolve_local_packages`. Each path is mounted
+    once even if multiple packages depend on it. Directories with the same package name are all
+    mounted.
+
     :return: a list of mount flags to pass to `docker.build_library`
     """
 
     # mount volumes in same directory as host so package.json works there too.
-    volumes = []
-    dependencies, dev_dependencies = npm_local_packages()
-    for name, local_path in dependencies.items():
-        volumes.append("{path}:{path}".format(path=local_path))
-    for name, local_path in dev_dependencies.items():
-        volumes.append("{path}:{path}".format(path=local_path))
-
-    return volumes
+    paths = sorted(set(resolve_local_packages()["directories"]))
+    return ["{path}:{path}".format(path=path) for path in paths]
@@ -12,14 +12,30 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
 import os
+from typing import List
 
 from ixian.check.checker import hash_object
 from ixian.config import Config, CONFIG
-from ixian.modules.filesystem.file_hash import FileHash
+from ixian.modules.filesystem.file_hash import FileHash, hash_path
 from ixian.utils.decorators import classproperty
 
 
+logger = logging.getLogger(__name__)
+
+
+def host_path(path: str) -> str:
+    """
+    Convert a path within ``PYTHON.ETC`` to the path on the host computer.
+    """
+    path = CONFIG.format(path)
+    etc = CONFIG.PYTHON.ETC
+    if path.startswith(etc):
+        path = CONFIG.PYTHON.HOST_ETC + path[len(etc) :]
+    return path
+
+
 class PythonConfig(Config):
     @property
     def MODULE_DIR(cls) -> str:
@@ -44,13 +60,114 @@ class PythonConfig(Config):
 
     DOCKERFILE = "{PYTHON.MODULE_DIR}/Dockerfile.lib.jinja"
     RENDERED_DOCKERFILE = "{BUILDER}/Dockerfile.python"
-    IMAGE_FILES = ["{PYTHON.ETC}/"]
+    IMAGE_FILES = ["{PYTHON.HOST_ETC}/"]
     REQUIREMENTS_FILES = ["{PYTHON.ETC}/requirements.txt"]
 
+    #: Pip constraints files. Constraints apply to every requirements file. They pin versions of
+    #: packages shared by multiple requirements files so they resolve the same way.
+    CONSTRAINTS_FILES = []
+
+    @property
+    def HOST_REQUIREMENTS_FILES(self) -> List[str]:
+        """
+        Paths to ``REQUIREMENTS_FILES`` on the host computer.
+        """
+        return [host_path(file) for file in CONFIG.PYTHON.REQUIREMENTS_FILES]
+
+    @property
+    def HOST_CONSTRAINTS_FILES(self) -> List[str]:
+        """
+        Paths to ``CONSTRAINTS_FILES`` on the host computer.
+        """
+        return [host_path(file) for file in CONFIG.PYTHON.CONSTRAINTS_FILES]
+
+    @property
+    def PIP_INSTALL_ARGS(self) -> str:
+        """
+        Requirements and constraints args for pip. All requirements files are installed by a single
+        pip command so they're resolved together and installed in a single layer.
+        """
+        args = [f"-r {CONFIG.format(file)}" for file in CONFIG.PYTHON.REQUIREMENTS_FILES]
+        args.extend(f"-c {CONFIG.format(file)}" for file in CONFIG.PYTHON.CONSTRAINTS_FILES)
+        return " ".join(args)
+
     REPOSITORY = "{DOCKER.REPOSITORY}"
     IMAGE_TAG = "python-{TASKS.BUILD_PYTHON_IMAGE.HASH}"
     IMAGE = "{PYTHON.REPOSITORY}:{PYTHON.IMAGE_TAG}"
 
+    # Wheelhouse
+    @property
+    def ABI(self) -> str:
+        """
+        ABI tag of the python interpreter, derived from ``VERSION``. e.g. ``cp38``
+        """
+        major, minor = CONFIG.PYTHON.VERSION.split(".")[:2]
+        return f"cp{major}{minor}"
+
+    #: Dockerfile template for the wheelhouse image.
+    WHEELHOUSE_DOCKERFILE = "{PYTHON.MODULE_DIR}/Dockerfile.wheelhouse.jinja"
+    #: The path to the dockerfile rendered from ``PYTHON.WHEELHOUSE_DOCKERFILE``
+    WHEELHOUSE_RENDERED_DOCKERFILE = "{BUILDER}/Dockerfile.wheelhouse"
+    #: Directory within the wheelhouse image where wheels are stored.
+    WHEELHOUSE_DIR = "{DOCKER.ENV_DIR}/wheelhouse"
+    #: Root pip installs packages under in the install stage, with ``pip install --root``. Files
+    #: are installed at the interpreter's own paths under it and copied to ``/`` in the image, so
+    #: packages land in the interpreter's prefix whether that's a system python, pyenv or venv.
+    INSTALL_ROOT = "/tmp/python-install"
+    #: Names of the packages installed under ``INSTALL_ROOT``. Versions of them already in the
+    #: base image are uninstalled before the installed files are copied.
+    INSTALLED_PACKAGES_FILE = "/tmp/python-installed.txt"
+
+    #: C library of the base image, ``glibc`` or ``musl`` (e.g. alpine). Compiled wheels only
+    #: work with the C library they were built against.
+    LIBC = "glibc"
+
+    #: Platforms wheels are built for, e.g. ``["linux/amd64"]``. Default is the target of the
+    #: build, ``DOCKER.PLATFORMS`` or this machine's platform for native builds. Set it when the
+    #: wheelhouse is built by a remote builder with another architecture.
+    WHEELHOUSE_PLATFORMS: List[str] = None
+
+    @property
+    def WHEELHOUSE_PLATFORM(self) -> str:
+        """
+        Platforms wheels are built for and ``LIBC``, e.g. ``linux-amd64-glibc``.
+        """
+        from ixian_docker.modules.docker.utils.platforms import native_platform
+
+        platforms = (
+            CONFIG.PYTHON.WHEELHOUSE_PLATFORMS or CONFIG.DOCKER.PLATFORMS or [native_platform()]
+        )
+        platform = ",".join(sorted(platform.replace("/", "-") for platform in platforms))
+        return f"{platform}-{CONFIG.PYTHON.LIBC}"
+
+    @property
+    def WHEELHOUSE_HASH(self) -> str:
+        """
+        Hash of the wheelhouse inputs: ``REQUIREMENTS_FILES``, ``CONSTRAINTS_FILES``, the
+        wheelhouse dockerfile and ``WHEELHOUSE_PLATFORM``. Missing files hash as None, so the
+        hash changes when they're created.
+
+        The base image isn't included. Wheels only depend on the requirements, the python ABI and
+        the platform, so the wheelhouse is reused when the base image changes.
+        """
+        paths = CONFIG.PYTHON.HOST_REQUIREMENTS_FILES + CONFIG.PYTHON.HOST_CONSTRAINTS_FILES
+        state = {}
+        for path in paths:
+            if os.path.exists(path):
+                state[path] = hash_path(path)
+            else:
+                logger.warning(f"Python requirements file doesn't exist: {path}")
+                state[path] = None
+        state["dockerfile"] = hash_path(CONFIG.PYTHON.WHEELHOUSE_DOCKERFILE)
+        state["platform"] = CONFIG.PYTHON.WHEELHOUSE_PLATFORM
+        return hash_object(state)
+
+    #: Tag for the wheelhouse image. Images are shared by python versions with the same ABI and
+    #: by base images with the same platform.
+    WHEELHOUSE_IMAGE_TAG = "wheelhouse-{PYTHON.ABI}-{PYTHON.WHEELHOUSE_HASH}"
+    #: Full name of the wheelhouse image. Includes repository and tag.
+    WHEELHOUSE_IMAGE = "{PYTHON.REPOSITORY}:{PYTHON.WHEELHOUSE_IMAGE_TAG}"
+
     APT_PACKAGES = [
         "make",
         "build-essential",
@@ -12,17 +12,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
+
 from ixian.config import CONFIG
 from ixian.modules.filesystem.file_hash import FileHash
 from ixian.task import Task, VirtualTarget
 from ixian.utils.process import execute
 from ixian_docker.modules.docker.checker import (
+    All,
     DockerVolumeExists,
     DockerImageExists,
 )
 from ixian_docker.modules.docker.tasks import run
 from ixian_docker.modules.docker.utils.dockerfile import get_dockerfile
-from ixian_docker.modules.docker.utils.images import build_image_if_needed
+from ixian_docker.modules.docker.utils.images import build_image_if_needed, image_layers
+from ixian_docker.modules.docker.utils.print import format_build_comparison, format_layer_report
+from ixian_docker.modules.docker.utils.report import BUILD, read_build_report
+
+logger = logging.getLogger(__name__)
 
 PYTHON_DEPENDS = ["build_base_image"]
 
@@ -31,11 +38,66 @@ def python_local_package_mount_flags():
     return []
 
 
+class BuildWheelhouseImage(Task):
+    """
+    Build the python wheelhouse image.
+
+    This is an intermediate image built using ``DOCKER.BASE_IMAGE`` as it's base. It contains a
+    wheel for every package in ``PYTHON.REQUIREMENTS_FILES`` stored in ``PYTHON.WHEELHOUSE_DIR``.
+    ``build_python_image`` installs packages from these wheels without compiling or downloading
+    them again.
+
+    The image is tagged with ``PYTHON.ABI`` and a hash of the requirements files. Changes to the
+    base image don't trigger a build, the wheelhouse is reused by any python image with a
+    matching ABI.
+
+    This task will reuse existing images if possible. It will only build if there is no image
+    available locally or in the registry. If ``--force`` is received the image will build even if
+    an image already exists.
+    """
+
+    name = "build_wheelhouse_image"
+    depends = ["build_base_image"]
+    category = "build"
+    short_description = "Build Python wheelhouse image"
+    check = [DockerImageExists("{PYTHON.WHEELHOUSE_IMAGE}")]
+
+    def execute(self, pull=True):
+        dockerfile = get_dockerfile(
+            CONFIG.PYTHON.WHEELHOUSE_DOCKERFILE, CONFIG.PYTHON.WHEELHOUSE_RENDERED_DOCKERFILE
+        )
+        build_image_if_needed(
+            repository=CONFIG.PYTHON.REPOSITORY,
+            tag=CONFIG.PYTHON.WHEELHOUSE_IMAGE_TAG,
+            stage="wheelhouse",
+            dockerfile=dockerfile,
+            force=self.__task__.force,
+            pull=pull,
+            recheck=All(*self.check),
+            buildargs={
+                "FROM_REPOSITORY": CONFIG.DOCKER.REPOSITORY,
+                "FROM_TAG": CONFIG.DOCKER.BASE_IMAGE_TAG,
+            },
+        )
+
+
 class BuildPythonImage(Task):
+    """
+    Build the python image.
+
+    This is an intermediate image built using ``DOCKER.BASE_IMAGE`` as it's base. Packages from
+    ``PYTHON.REQUIREMENTS_FILES`` are installed from the wheelhouse image with
+    ``--no-index --find-links``. All requirements files are installed by a single pip command,
+    constrained by ``PYTHON.CONSTRAINTS_FILES``, so dependencies are resolved once and installed
+    in a single layer.
+
+    When the image is built, a report of its layer sizes and build time is logged. The size, layer
+    count and build time are compared with the previous build from the build report.
+    """
 
     name = "build_python_image"
     parent = ["build_image", "compose_runtime"]
-    depends = ["build_base_image"]
+    depends = ["build_base_image", "build_wheelhouse_image"]
     category = "build"
     short_description = "Build Python image"
     check = [
@@ -45,18 +107,43 @@ class BuildPythonImage(Task):
 
     def execute(self, pull=True):
         dockerfile = get_dockerfile(CONFIG.PYTHON.DOCKERFILE, CONFIG.PYTHON.RENDERED_DOCKERFILE)
-        build_image_if_needed(
+        built = build_image_if_needed(
             repository=CONFIG.PYTHON.REPOSITORY,
             tag=CONFIG.PYTHON.IMAGE_TAG,
             dockerfile=dockerfile,
             force=self.__task__.force,
             pull=pull,
-            # recheck=self.check.check,
+            recheck=All(*self.check),
             buildargs={
                 "FROM_REPOSITORY": CONFIG.DOCKER.REPOSITORY,
                 "FROM_TAG": CONFIG.DOCKER.BASE_IMAGE_TAG,
+                "WHEELHOUSE_IMAGE": CONFIG.PYTHON.WHEELHOUSE_IMAGE,
             },
         )
+        if built:
+            log_build_report(CONFIG.PYTHON.IMAGE, "python")
+
+
+def log_build_report(image, stage):
+    """
+    Log the layers of a stage image that was just built, and compare it with the previous build of
+    the stage. Build times and sizes are read from the build report, ``DOCKER.BUILD_REPORT``.
+
+    :param image: image that was built
+    :param stage: stage of the image
+    """
+    builds = [
+        record
+        for record in read_build_report()
+        if record.get("stage") == stage and record.get("decision") == BUILD
+    ]
+    current = builds[-1] if builds else {}
+    build_time = current.get("timings", {}).get("build")
+    for line in format_layer_report(image, image_layers(image), build_time):
+        logger.info(line)
+    if len(builds) > 1:
+        for line in format_build_comparison(current, builds[-2]):
+            logger.info(line)
 
 
 class CreatePyEnv(Task):
@@ -23,6 +23,7 @@ class PythonModuleConfig(object):
     tasks = "ixian_docker.modules.python2.tasks"
     config = "ixian_docker.modules.python2.config.PythonConfig"
     dockerfile_template = "{PYTHON.MODULE_DIR}/Dockerfile.template"
+    dockerfile_dependencies_template = "{PYTHON.MODULE_DIR}/Dockerfile.dependencies.template"
 
     def __getitem__(self, key):
         try:
@@ -12,14 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import docker
-
 from ixian.config import CONFIG
 from ixian.modules.filesystem.file_hash import FileHash
 from ixian.task import Task, VirtualTarget
 from ixian_docker.modules.docker.checker import DockerVolumeExists
 from ixian_docker.modules.docker.tasks import run
-from ixian_docker.modules.docker.utils import docker_client
+from ixian_docker.modules.docker.utils.volumes import delete_volume
 from ixian.runner import ERROR_TASK
 
 PYTHON_DEPENDS = ["build_app_image"]
@@ -37,12 +35,8 @@ def clean_pipenv():
     """
     Remove pipenv volume
     """
-    try:
-        volume = docker_client().volumes.get(CONFIG.PYTHON.VIRTUAL_ENV_VOLUME)
-    except docker.errors.NotFound:
+    if not delete_volume(CONFIG.PYTHON.VIRTUAL_ENV_VOLUME):
         return ERROR_TASK
-    else:
-        volume.remove(True)
 
 
 class Pipenv(Task):
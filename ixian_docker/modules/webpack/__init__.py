@@ -18,4 +18,6 @@ OPTIONS = {
     "config": "ixian_docker.modules.webpack.config.WebpackConfig",
     "dockerfile_template": "{WEBPACK.MODULE_DIR}/Dockerfile.template",
     "dev_volumes": ["{WEBPACK.COMPILED_STATIC_VOLUME}:{WEBPACK.COMPILED_STATIC_DIR}",],
+    # Volumes mounted by the compose file.
+    "named_volumes": ["{WEBPACK.CACHE_LOADER_VOLUME}"],
 }
@@ -16,7 +16,7 @@ import os
 
 from ixian.check.checker import hash_object
 from ixian.config import Config, CONFIG
-from ixian.modules.filesystem.file_hash import FileHash
+from ixian.modules.filesystem.file_hash import FileHash, hash_path
 from ixian.utils.decorators import classproperty
 
 
@@ -32,8 +32,24 @@ class WebpackConfig(Config):
     COMPILED_STATIC_DIR = "{DOCKER.APP_DIR}/compiled_static"
 
     # Volumes used in development
-    #: Docker volume for compiled static for use with ``compose``.
-    COMPILED_STATIC_VOLUME = "{PROJECT_NAME}.compiled_static"
+    #: Prefix for compiled static volumes. ``webpack_volume`` creates a volume for each
+    #: ``WEBPACK.SOURCE_HASH``.
+    COMPILED_STATIC_VOLUME_PREFIX = "{PROJECT_NAME}.compiled_static"
+    #: File recording the compiled static volume selected by ``webpack_volume``.
+    COMPILED_STATIC_VOLUME_FILE = "{BUILDER}/webpack.compiled_static_volume"
+
+    @property
+    def COMPILED_STATIC_VOLUME(self) -> str:
+        """
+        Docker volume for compiled static for use with ``compose``. This is the volume selected by
+        ``webpack_volume`` or ``WEBPACK.COMPILED_STATIC_VOLUME_PREFIX`` if it hasn't run.
+        """
+        try:
+            with open(CONFIG.WEBPACK.COMPILED_STATIC_VOLUME_FILE) as file:
+                return file.read().strip()
+        except FileNotFoundError:
+            return CONFIG.WEBPACK.COMPILED_STATIC_VOLUME_PREFIX
+
     #: Docker volume for webpack cache for use with ``compose``.
     CACHE_LOADER_VOLUME = "{PROJECT_NAME}.cache_loader"
 
@@ -64,7 +80,7 @@ class WebpackConfig(Config):
     #: These files will be included in the task and image hashes, and are used to detect the need
     #: for building. This is generally the inputs to the image, and includes configuration and
     #: source files.
-    IMAGE_FILES = ["{PWD}/root/srv/etc/webpack/"]
+    IMAGE_FILES = ["{PWD}/{WEBPACK.HOST_ETC}/"]
     #: Arguments passed to ``build_image``
     BUILD_ARGS = {
         "ETC": "{WEBPACK.ETC}",
@@ -79,6 +95,38 @@ class WebpackConfig(Config):
     #: Full name of image to build. Includes repository and tag.
     IMAGE = "{WEBPACK.REPOSITORY}:{WEBPACK.IMAGE_TAG}"
 
+    # Build cache. The webpack cache (cache-loader or webpack 5's filesystem cache) is persisted
+    # between builds in a cache image. The cache image is keyed by the webpack config digest so
+    # only builds with the same config share a cache.
+    #: Directory in container where webpack writes it's cache.
+    CACHE_DIR = "{NPM.NODE_MODULES_DIR}/.cache"
+    #: Tag identifying the webpack cache image.
+    CACHE_IMAGE_TAG = "webpack-cache-{WEBPACK.CONFIG_HASH}"
+    #: Full name of the webpack cache image. Includes repository and tag.
+    CACHE_IMAGE = "{WEBPACK.REPOSITORY}:{WEBPACK.CACHE_IMAGE_TAG}"
+    #: Push the cache image to the registry after it's exported. Enable this where builds should
+    #: share a cache across hosts, e.g. CI.
+    CACHE_PUSH = False
+
+    @property
+    def CONFIG_HASH(self) -> str:
+        """
+        Hash of the webpack config, ``WEBPACK.IMAGE_FILES``. Paths are relative to the project so
+        the hash is the same on every host.
+        """
+        paths = FileHash(*CONFIG.WEBPACK.IMAGE_FILES).keys
+        return hash_object({os.path.relpath(path, CONFIG.PWD): hash_path(path) for path in paths})
+
+    @property
+    def SOURCE_HASH(self) -> str:
+        """
+        Hash of ``WEBPACK.SOURCE_DIRS`` and the webpack config. Identifies the compiled output of
+        webpack.
+        """
+        paths = FileHash(*(f"{{PWD}}/{path}" for path in CONFIG.WEBPACK.SOURCE_DIRS)).keys
+        sources = {os.path.relpath(path, CONFIG.PWD): hash_path(path) for path in paths}
+        return hash_object({"config": CONFIG.WEBPACK.CONFIG_HASH, "sources": sources})
+
     #: Path to webpack executable
     BIN = "{NPM.BIN}/webpack"
 
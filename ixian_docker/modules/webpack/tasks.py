@@ -12,19 +12,39 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
+import os
+
 from ixian.task import Task
 from ixian.config import CONFIG
+from ixian.exceptions import ExecuteFailed
 from ixian.modules.filesystem.file_hash import FileHash
-from ixian_docker.modules.docker.checker import DockerImageExists
+from ixian_docker.modules.docker.checker import All, DockerImageExists
 from ixian_docker.modules.docker.tasks import run
 from ixian_docker.modules.docker.utils.dockerfile import get_dockerfile
 from ixian_docker.modules.docker.utils.images import build_image_if_needed
-from ixian_docker.modules.docker.utils.volumes import delete_volume
+from ixian_docker.modules.docker.utils.volumes import delete_volume, volume_exists
+from ixian_docker.modules.webpack.utils import (
+    SOURCE_HASH_LABEL,
+    compiled_static_volume,
+    copy_compiled_static,
+    create_compiled_static_volume,
+    export_cache_image,
+    get_cache_image,
+    image_source_hash,
+    set_compiled_static_volume,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class BuildWebpackImage(Task):
     """
     Build image with javascript, css, etc. compiled by Webpack.
+
+    The webpack cache is restored from ``WEBPACK.CACHE_IMAGE`` before compiling and exported back
+    to it after the image is built. Builds after a small change to sources only recompile the
+    affected chunks. The cache image is only fetched when the image is built.
     """
 
     name = "build_webpack_image"
@@ -50,32 +70,63 @@ class BuildWebpackImage(Task):
         return checks
 
     def execute(self, pull=True):
-        dockerfile = get_dockerfile(CONFIG.WEBPACK.DOCKERFILE, CONFIG.WEBPACK.RENDERED_DOCKERFILE)
-        build_image_if_needed(
+        def render_dockerfile(cache_image=None):
+            return get_dockerfile(
+                CONFIG.WEBPACK.DOCKERFILE,
+                CONFIG.WEBPACK.RENDERED_DOCKERFILE,
+                context={"CACHE_IMAGE": cache_image},
+            )
+
+        def use_cache_image():
+            cache_image = get_cache_image()
+            if cache_image:
+                render_dockerfile(cache_image)
+
+        force = self.__task__.force
+        # The webpack cache only speeds up the build. The cache key is computed from the
+        # dockerfile rendered without it, the cache image is added once a build is needed.
+        dockerfile = render_dockerfile()
+        buildargs = {
+            "FROM_REPOSITORY": CONFIG.DOCKER.REPOSITORY,
+            "FROM_TAG": CONFIG.NPM.IMAGE_TAG,
+        }
+        built = build_image_if_needed(
             repository=CONFIG.WEBPACK.REPOSITORY,
             tag=CONFIG.WEBPACK.IMAGE_TAG,
             dockerfile=dockerfile,
-            force=self.__task__.force,
+            force=force,
             pull=pull,
-            # recheck=self.check.check,
-            buildargs={
-                "FROM_REPOSITORY": CONFIG.DOCKER.REPOSITORY,
-                "FROM_TAG": CONFIG.NPM.IMAGE_TAG,
-            },
+            recheck=All(*self.check),
+            buildargs=buildargs,
+            before_build=None if force else use_cache_image,
+            labels={SOURCE_HASH_LABEL: CONFIG.WEBPACK.SOURCE_HASH},
         )
+        if built:
+            export_cache_image(dockerfile, buildargs=buildargs)
 
 
 def clean_webpack_volume():
-    delete_volume(CONFIG.WEBPACK.COMPILED_STATIC_VOLUME)
-    delete_volume(CONFIG.WEBPACK.CACHE_LOADER_VOLUME)
+    delete_volume(CONFIG.WEBPACK.COMPILED_STATIC_VOLUME, CONFIG.WEBPACK.CACHE_LOADER_VOLUME)
+    if os.path.exists(CONFIG.WEBPACK.COMPILED_STATIC_VOLUME_FILE):
+        os.remove(CONFIG.WEBPACK.COMPILED_STATIC_VOLUME_FILE)
 
 
 class WebpackVolume(Task):
     """
     Builds development volume with webpack
 
-    This task runs the webpack compiler. It runs using `compose` to run within
-    the context of the app image.
+    Compiled static is stored in a volume for each ``WEBPACK.SOURCE_HASH``. The volume for the
+    current sources is selected as ``WEBPACK.COMPILED_STATIC_VOLUME`` and mounted by ``compose``.
+
+    - If a volume exists for the hash it's selected as is.
+    - If ``WEBPACK.IMAGE`` was compiled from the same sources, its compiled static is copied into
+      a new volume.
+    - Otherwise webpack is run using `compose` to compile into a new volume.
+
+    If copying or compiling fails, or is interrupted, the new volume is deleted so a partial volume
+    is never selected.
+
+    Switching between branches reuses the volumes compiled for each of them.
     """
 
     name = "webpack_volume"
@@ -85,21 +136,30 @@ class WebpackVolume(Task):
     short_description = "Build webpack development volume"
 
     def execute(self):
-        # 1. get hash of source
-        image_exists = False
-        volume_exists = False
-
-        if image_exists:
-            pass
-            # - Mount Image
-            # - Copy files from mount
-        elif volume_exists:
-            pass
-            # setup volume as current
-        else:
-            pass
-            # create directory
-            # build with webpack
+        source_hash = CONFIG.WEBPACK.SOURCE_HASH
+        volume = compiled_static_volume(source_hash)
+        if volume_exists(volume):
+            logger.info(f"Compiled static volume exists: {volume}")
+            set_compiled_static_volume(volume)
+            return
+
+        previous_volume = CONFIG.WEBPACK.COMPILED_STATIC_VOLUME
+        create_compiled_static_volume(source_hash)
+        try:
+            if image_source_hash(CONFIG.WEBPACK.IMAGE) == source_hash:
+                copy_compiled_static(CONFIG.WEBPACK.IMAGE, volume)
+            else:
+                # compose mounts the selected volume, select it before running webpack.
+                set_compiled_static_volume(volume)
+                if run("./node_modules/.bin/webpack", *CONFIG.WEBPACK.ARGS):
+                    raise ExecuteFailed("Webpack failed, compiled static volume was not created.")
+        except BaseException:
+            # The volume is labeled with the source hash. If it's left partially populated later
+            # runs would select it as is.
+            set_compiled_static_volume(previous_volume)
+            delete_volume(volume)
+            raise
+        set_compiled_static_volume(volume)
 
 
 class Webpack(Task):
@@ -0,0 +1,142 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+
+from docker.errors import NotFound as DockerNotFound
+
+from ixian.build import write_file
+from ixian.config import CONFIG
+from ixian_docker.modules.docker.utils.client import UnknownRegistry, docker_client
+from ixian_docker.modules.docker.utils.images import (
+    build_image,
+    image_exists,
+    image_exists_in_registry,
+    pull_image,
+    push_image,
+)
+from ixian_docker.modules.docker.utils.labels import HASH_LABEL, STAGE_LABEL
+from ixian_docker.modules.docker.utils.volumes import create_volume, touch_volume
+
+logger = logging.getLogger(__name__)
+
+#: Build target for the stage that exports the webpack cache.
+CACHE_EXPORT_TARGET = "cache_export"
+
+#: Image label recording ``WEBPACK.SOURCE_HASH`` of the sources an image was compiled from.
+SOURCE_HASH_LABEL = "ixian.webpack.source_hash"
+
+#: Stage label for compiled static volumes.
+VOLUME_STAGE = "webpack"
+
+
+def get_cache_image():
+    """
+    Find the webpack cache image. The image is pulled if it only exists in the registry.
+
+    :return: name of cache image or None if there is no cache image.
+    """
+    image = CONFIG.WEBPACK.CACHE_IMAGE
+    if image_exists(image):
+        return image
+
+    repository = CONFIG.WEBPACK.REPOSITORY
+    tag = CONFIG.WEBPACK.CACHE_IMAGE_TAG
+    try:
+        if image_exists_in_registry(repository, tag):
+            pull_image(repository, tag)
+            return image
+    except UnknownRegistry as exception:
+        logger.warning(
+            f"Registry '{str(exception)}' is not configured, couldn't check for webpack cache."
+        )
+    except DockerNotFound:
+        logger.debug("Webpack cache image could not be pulled: NotFound")
+
+    logger.debug("No webpack cache image, building without cache.")
+    return None
+
+
+def export_cache_image(dockerfile, **kwargs):
+    """
+    Export the webpack cache from a webpack build to the cache image. The build stage is reused
+    from the docker build cache so only the cache stage is built.
+
+    The cache image is pushed if ``WEBPACK.CACHE_PUSH`` is enabled.
+
+    :param dockerfile: dockerfile used to build the webpack image
+    :param kwargs: kwargs used to build the webpack image
+    """
+    build_image(dockerfile, CONFIG.WEBPACK.CACHE_IMAGE, target=CACHE_EXPORT_TARGET, **kwargs)
+    if CONFIG.WEBPACK.CACHE_PUSH:
+        push_image(CONFIG.WEBPACK.REPOSITORY, CONFIG.WEBPACK.CACHE_IMAGE_TAG)
+
+
+def compiled_static_volume(source_hash):
+    """
+    Name of the compiled static volume for a source hash.
+    :param source_hash: ``WEBPACK.SOURCE_HASH``
+    :return: name of volume
+    """
+    return f"{CONFIG.WEBPACK.COMPILED_STATIC_VOLUME_PREFIX}.{source_hash[:16]}"
+
+
+def create_compiled_static_volume(source_hash):
+    """
+    Create the compiled static volume for a source hash.
+    :param source_hash: ``WEBPACK.SOURCE_HASH``
+    :return: the volume
+    """
+    labels = {STAGE_LABEL: VOLUME_STAGE, HASH_LABEL: source_hash}
+    return create_volume(compiled_static_volume(source_hash), labels=labels)
+
+
+def set_compiled_static_volume(name):
+    """
+    Select the compiled static volume mounted by ``compose``.
+    :param name: name of volume
+    """
+    logger.debug(f"Using compiled static volume: {name}")
+    write_file(CONFIG.WEBPACK.COMPILED_STATIC_VOLUME_FILE, name)
+    touch_volume(name)
+
+
+def image_source_hash(image):
+    """
+    Get the source hash a webpack image was compiled from.
+    :param image: name of image
+    :return: ``WEBPACK.SOURCE_HASH`` of the image or None if image doesn't exist or isn't labeled.
+    """
+    if not image_exists(image):
+        return None
+    labels = docker_client().images.get(image).labels or {}
+    return labels.get(SOURCE_HASH_LABEL)
+
+
+def copy_compiled_static(image, volume):
+    """
+    Copy compiled static from an image into a volume. Files are copied by a container running the
+    image, nothing is compiled.
+
+    :param image: name of image
+    :param volume: name of volume
+    """
+    target = "/compiled_static_volume"
+    logger.info(f"Copying compiled static from {image} to {volume}")
+    docker_client().containers.run(
+        image,
+        entrypoint=["cp", "-a", f"{CONFIG.WEBPACK.COMPILED_STATIC_DIR}/.", target],
+        volumes={volume: {"bind": target, "mode": "rw"}},
+        remove=True,
+    )
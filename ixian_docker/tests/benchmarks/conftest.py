@@ -0,0 +1,224 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess
+import time
+import uuid
+from unittest import mock
+
+import docker
+import pytest
+
+from ixian.config import CONFIG
+from ixian.module import load_module
+from ixian_docker.modules.docker.utils import client as client_module
+from ixian_docker.modules.docker.utils.client import DockerClient
+
+# Benchmarks only run when this is set. They start containers on the host daemon and take minutes.
+ENABLED = bool(os.environ.get("IXIAN_BENCHMARK"))
+
+# Address the host daemon publishes container ports on.
+DOCKER_ADDRESS = os.environ.get("IXIAN_BENCHMARK_DOCKER_ADDRESS", "127.0.0.1")
+
+REGISTRY_IMAGE = "registry:2"
+DIND_IMAGE = "docker:dind"
+BASE_IMAGE = "busybox:latest"
+
+# Hostname of the registry on the benchmark network, as seen by the dind daemon.
+REGISTRY = "registry:5000"
+
+DAEMON_TIMEOUT = 60
+
+# buildkit config for the buildx builder, the registry stand-in is plain http.
+BUILDKIT_CONFIG = f"""
+[registry."{REGISTRY}"]
+  http = true
+  insecure = true
+"""
+
+
+class LocalRegistryClient(DockerClient):
+    """Client for the registry:2 stand-in, it runs without authentication."""
+
+    def login(self, client=None):
+        pass
+
+    def cli_login(self):
+        pass
+
+
+class RoundTrips:
+    """
+    Counts docker API requests with a requests response hook. Every client created by
+    ``docker_client()`` while the counter is installed is hooked.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def hook(self, response, *args, **kwargs):
+        self.count += 1
+
+    def reset(self):
+        count, self.count = self.count, 0
+        return count
+
+    def from_env(self, from_env):
+        def wrapped(*args, **kwargs):
+            client = from_env(*args, **kwargs)
+            client.api.hooks["response"].append(self.hook)
+            return client
+
+        return wrapped
+
+
+def wait_for_daemon(base_url):
+    client = docker.DockerClient(base_url=base_url)
+    deadline = time.time() + DAEMON_TIMEOUT
+    while True:
+        try:
+            client.ping()
+            return client
+        except Exception:
+            if time.time() > deadline:
+                raise
+            time.sleep(1)
+
+
+def published_port(container, port):
+    container.reload()
+    return container.attrs["NetworkSettings"]["Ports"][port][0]["HostPort"]
+
+
+@pytest.fixture(scope="session")
+def host_docker():
+    return docker.from_env()
+
+
+@pytest.fixture(scope="session")
+def benchmark_network(host_docker):
+    network = host_docker.networks.create(f"ixian-benchmark-{uuid.uuid4().hex[:8]}")
+    yield network
+    network.remove()
+
+
+@pytest.fixture(scope="session")
+def registry(host_docker, benchmark_network):
+    """
+    registry:2 container. Yields the container so network stats can be read from it.
+    """
+    container = host_docker.containers.run(
+        REGISTRY_IMAGE, detach=True, environment={"REGISTRY_STORAGE_DELETE_ENABLED": "true"},
+    )
+    benchmark_network.connect(container, aliases=["registry"])
+    yield container
+    container.remove(force=True, v=True)
+
+
+@pytest.fixture(scope="session")
+def dind(host_docker, benchmark_network, registry):
+    """
+    Throwaway docker daemon, builds are run here so they start from an empty image cache. The base
+    image is copied from the host so it isn't pulled from docker hub by each scenario.
+    """
+    container = host_docker.containers.run(
+        DIND_IMAGE,
+        # experimental features are required for squashed builds.
+        command=[
+            "--host=tcp://0.0.0.0:2375",
+            f"--insecure-registry={REGISTRY}",
+            "--experimental",
+        ],
+        detach=True,
+        privileged=True,
+        environment={"DOCKER_TLS_CERTDIR": ""},
+        ports={"2375/tcp": None},
+    )
+    benchmark_network.connect(container)
+    base_url = f"tcp://{DOCKER_ADDRESS}:{published_port(container, '2375/tcp')}"
+    client = wait_for_daemon(base_url)
+
+    try:
+        base_image = host_docker.images.get(BASE_IMAGE)
+    except docker.errors.ImageNotFound:
+        base_image = host_docker.images.pull(BASE_IMAGE)
+    client.images.load(b"".join(base_image.save()))
+
+    yield base_url
+    container.remove(force=True, v=True)
+
+
+@pytest.fixture(scope="session")
+def buildx_builder(dind, tmp_path_factory):
+    """
+    buildx builder on the dind daemon, used for compressed layers. The docker driver can't push
+    them so the builder uses the docker-container driver. It runs in the daemon's network so it
+    can reach the registry stand-in. Requires the buildx plugin on the host.
+    """
+    config = tmp_path_factory.mktemp("buildkit") / "buildkitd.toml"
+    config.write_text(BUILDKIT_CONFIG)
+    name = f"ixian-benchmark-{uuid.uuid4().hex[:8]}"
+    environment = dict(os.environ, DOCKER_HOST=dind)
+    subprocess.check_call(
+        [
+            "docker",
+            "buildx",
+            "create",
+            "--name",
+            name,
+            "--driver",
+            "docker-container",
+            "--driver-opt",
+            "network=host",
+            "--config",
+            str(config),
+            "--bootstrap",
+        ],
+        env=environment,
+    )
+    yield name
+    subprocess.call(["docker", "buildx", "rm", name], env=environment)
+
+
+@pytest.fixture(scope="session")
+def benchmark_config():
+    if not hasattr(CONFIG, "DOCKER"):
+        load_module("ixian_docker.modules.docker")
+    with mock.patch.object(CONFIG, "PROJECT_NAME", "ixian_benchmark", create=True):
+        yield CONFIG
+
+
+@pytest.fixture
+def round_trips(dind, benchmark_config):
+    """
+    Points ``docker_client()`` at the dind daemon and the registry at the stand-in. Yields a
+    ``RoundTrips`` counter for requests made to the dind daemon.
+    """
+    counter = RoundTrips()
+    registries = {REGISTRY: {"client": LocalRegistryClient}}
+    with mock.patch.dict(os.environ, {"DOCKER_HOST": dind}), mock.patch.object(
+        docker, "from_env", counter.from_env(docker.from_env)
+    ), mock.patch.object(
+        benchmark_config.DOCKER, "REGISTRIES", registries, create=True
+    ), mock.patch.dict(
+        client_module.DOCKER_REGISTRIES, clear=True
+    ):
+        yield counter
+
+
+@pytest.fixture
+def repository():
+    """Unique repository in the stand-in registry, it starts out empty."""
+    return f"{REGISTRY}/benchmark-{uuid.uuid4().hex[:8]}"
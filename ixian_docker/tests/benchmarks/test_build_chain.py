@@ -0,0 +1,276 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+End-to-end build benchmarks.
+
+The stage chain (base -> python/npm -> webpack -> runtime) is built on a throwaway dind daemon
+with a registry:2 stand-in. Each scenario records wall time, bytes transferred to and from the
+registry, and round trips to the daemon. Results are written as JSON so they can be compared
+across commits::
+
+    IXIAN_BENCHMARK=1 pytest ixian_docker/tests/benchmarks
+
+Results are written to ``IXIAN_BENCHMARK_RESULTS``, default is
+``.builder/benchmarks/<commit>.json``.
+"""
+
+import json
+import os
+import subprocess
+import time
+from unittest import mock
+
+import pytest
+
+from ixian.check.checker import hash_object
+from ixian_docker.modules.docker.utils.client import docker_client
+from ixian_docker.modules.docker.utils.images import build_image_if_needed, push_image
+from ixian_docker.modules.docker.utils.platforms import COMPRESSIONS
+from ixian_docker.modules.docker.utils.report import image_summary
+from ixian_docker.tests.benchmarks.conftest import ENABLED
+
+pytestmark = pytest.mark.skipif(not ENABLED, reason="IXIAN_BENCHMARK is not set")
+
+STAGES_DIR = os.path.join(os.path.dirname(__file__), "stages")
+
+# Size of the layer each stage adds.
+LAYER_MB = int(os.environ.get("IXIAN_BENCHMARK_LAYER_MB", 8))
+
+#: Stages in build order, with the build args mapping to the images of their parent stages.
+STAGES = [
+    ("base", {}),
+    ("python", {"BASE_IMAGE": "base"}),
+    ("npm", {"BASE_IMAGE": "base"}),
+    ("webpack", {"NPM_IMAGE": "npm"}),
+    ("runtime", {"PYTHON_IMAGE": "python", "WEBPACK_IMAGE": "webpack"}),
+]
+
+
+def stage_dockerfile(stage):
+    return f"Dockerfile.{stage}"
+
+
+def stage_tags():
+    """
+    Tag for each stage, ``<stage>-<hash>``. The hash covers the stage's dockerfile and the hashes
+    of its parents, the same way task hashes chain.
+    """
+    tags = {}
+    for stage, parents in STAGES:
+        with open(os.path.join(STAGES_DIR, stage_dockerfile(stage))) as file:
+            dockerfile = file.read()
+        parent_tags = {arg: tags[parent] for arg, parent in parents.items()}
+        tags[stage] = f"{stage}-{hash_object([dockerfile, parent_tags, LAYER_MB])}"
+    return tags
+
+
+def build_chain(repository, stages=None, **kwargs):
+    """
+    Build every stage with ``build_image_if_needed``.
+
+    :param stages: stages to build, default is every stage. Parents must already exist.
+    :return: list of stages that were built.
+    """
+    tags = stage_tags()
+    built = []
+    for stage, parents in STAGES:
+        if stages is not None and stage not in stages:
+            continue
+        buildargs = {arg: f"{repository}:{tags[parent]}" for arg, parent in parents.items()}
+        buildargs["LAYER_MB"] = str(LAYER_MB)
+        if build_image_if_needed(
+            repository,
+            tags[stage],
+            dockerfile=stage_dockerfile(stage),
+            context=STAGES_DIR,
+            stage=stage,
+            buildargs=buildargs,
+            **kwargs,
+        ):
+            built.append(stage)
+    return built
+
+
+def push_chain(repository, stages=None):
+    for stage, tag in stage_tags().items():
+        if stages is None or stage in stages:
+            push_image(repository, tag, silent=True)
+
+
+def delete_chain(repository, stages=None):
+    """Remove the stage images from the daemon, the registry keeps its copies."""
+    client = docker_client()
+    for stage, tag in stage_tags().items():
+        if stages is None or stage in stages:
+            client.images.remove(f"{repository}:{tag}", force=True)
+    client.images.prune()
+
+
+def chain_layers(repository):
+    """Number of layers in each stage image."""
+    tags = stage_tags()
+    return {stage: image_summary(f"{repository}:{tags[stage]}")["layers"] for stage in tags}
+
+
+def registry_bytes(registry):
+    """
+    Bytes received and sent by the registry container.
+    :return: tuple of (received, sent)
+    """
+    networks = registry.stats(stream=False).get("networks", {})
+    received = sum(network["rx_bytes"] for network in networks.values())
+    sent = sum(network["tx_bytes"] for network in networks.values())
+    return received, sent
+
+
+def registry_storage(registry):
+    """Bytes stored by the registry container."""
+    exit_code, output = registry.exec_run(["du", "-sk", "/var/lib/registry"])
+    return int(output.split()[0]) * 1024 if exit_code == 0 else None
+
+
+def measure(func, registry, round_trips):
+    """
+    Run a scenario and measure it.
+    :return: dict of measurements
+    """
+    round_trips.reset()
+    received, sent = registry_bytes(registry)
+    start = time.time()
+    built = func()
+    wall_time = time.time() - start
+    after_received, after_sent = registry_bytes(registry)
+    return {
+        "wall_time": wall_time,
+        "built": built or [],
+        "bytes_pushed": after_received - received,
+        "bytes_pulled": after_sent - sent,
+        "round_trips": round_trips.reset(),
+    }
+
+
+def commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(__file__),
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(scenarios, config):
+    """
+    Write scenario results. Results from other tests in the same run are kept, each test adds its
+    scenarios to the file for the commit.
+    """
+    revision = commit()
+    path = os.environ.get("IXIAN_BENCHMARK_RESULTS") or os.path.join(
+        config.BUILDER, "benchmarks", f"{revision}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    try:
+        with open(path) as file:
+            results = json.load(file)
+    except (FileNotFoundError, ValueError):
+        results = {}
+    if results.get("commit") != revision or results.get("layer_mb") != LAYER_MB:
+        results = {"scenarios": {}}
+    results.update(commit=revision, timestamp=time.time(), layer_mb=LAYER_MB)
+    results["scenarios"].update(scenarios)
+    with open(path, "w") as file:
+        json.dump(results, file, indent=4, sort_keys=True)
+    return path
+
+
+def test_build_chain(registry, round_trips, repository, benchmark_config):
+    stages = [stage for stage, parents in STAGES]
+    scenarios = {}
+
+    # cold: nothing local or in the registry, every stage is built and then pushed.
+    scenarios["cold"] = measure(lambda: build_chain(repository), registry, round_trips)
+    scenarios["push"] = measure(lambda: push_chain(repository), registry, round_trips)
+    assert scenarios["cold"]["built"] == stages
+
+    # warm-local: every image is local, nothing is built or pulled.
+    scenarios["warm_local"] = measure(lambda: build_chain(repository), registry, round_trips)
+    assert scenarios["warm_local"]["built"] == []
+
+    # warm-registry: images are only in the registry, every stage is pulled.
+    delete_chain(repository)
+    scenarios["warm_registry"] = measure(lambda: build_chain(repository), registry, round_trips)
+    assert scenarios["warm_registry"]["built"] == []
+    assert scenarios["warm_registry"]["bytes_pulled"] > 0
+    scenarios["warm_registry"]["layers"] = chain_layers(repository)
+
+    # squashed: python and npm are squashed into one layer each. The chain is built into a fresh
+    # repository, pushed, and then pulled to compare with warm_registry.
+    squashed = f"{repository}-squashed"
+    with mock.patch.object(benchmark_config.DOCKER, "SQUASH_STAGES", ["python", "npm"]):
+        scenarios["squashed_cold"] = measure(lambda: build_chain(squashed), registry, round_trips)
+    push_chain(squashed)
+    delete_chain(squashed)
+    scenarios["squashed_warm_registry"] = measure(
+        lambda: build_chain(squashed), registry, round_trips
+    )
+    assert scenarios["squashed_warm_registry"]["built"] == []
+    scenarios["squashed_warm_registry"]["layers"] = chain_layers(squashed)
+
+    write_results(scenarios, benchmark_config)
+
+
+#: Stages pushed with each compression, the stages with the most layers.
+COMPRESSED_STAGES = ["python", "npm"]
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_layer_compression(
+    compression, registry, round_trips, repository, benchmark_config, buildx_builder
+):
+    """
+    Build, push, and pull the python and npm stages with each layer compression. Every
+    compression is built by buildx so push times are comparable.
+    """
+    # the base stage is pushed first, the buildx builder builds from the registry.
+    build_chain(repository, stages=["base"])
+    push_chain(repository, stages=["base"])
+
+    scenarios = {}
+    storage = registry_storage(registry)
+    with mock.patch.object(
+        benchmark_config.DOCKER,
+        "STAGE_COMPRESSION",
+        {stage: compression for stage in COMPRESSED_STAGES},
+    ), mock.patch.object(benchmark_config.DOCKER, "BUILDX_BUILDER", buildx_builder):
+        # build_push: built and pushed by buildx, and then pulled.
+        build_push = measure(
+            lambda: build_chain(repository, stages=COMPRESSED_STAGES), registry, round_trips
+        )
+        assert build_push["built"] == COMPRESSED_STAGES
+        if storage is not None:
+            build_push["registry_storage"] = registry_storage(registry) - storage
+
+        # pull: the images are only in the registry.
+        delete_chain(repository, stages=COMPRESSED_STAGES)
+        pull = measure(
+            lambda: build_chain(repository, stages=COMPRESSED_STAGES), registry, round_trips
+        )
+        assert pull["built"] == []
+
+    scenarios[f"{compression}_build_push"] = build_push
+    scenarios[f"{compression}_pull"] = pull
+    write_results(scenarios, benchmark_config)
@@ -0,0 +1,42 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ixian.check.checker import Checker
+
+
+class FakeChecker(Checker):
+    """
+    Checker with a fixed state. The state may be a callable, it's called for the current state.
+    """
+
+    def __init__(self, value, contribute_to_task_state=True, name="fake"):
+        self.value = value
+        self.contribute_to_task_state = contribute_to_task_state
+        self.name = name
+        self.saved = False
+
+    def state(self):
+        return self.value() if callable(self.value) else self.value
+
+    def check(self):
+        return bool(self.state())
+
+    def save(self):
+        self.saved = True
+
+    def filename(self):
+        return self.name
+
+    def clone(self):
+        return FakeChecker(self.value, self.contribute_to_task_state, self.name)
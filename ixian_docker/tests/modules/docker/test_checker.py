@@ -12,11 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from unittest import mock
+
 import pytest
 
 from ixian_docker.tests.conftest import TEST_IMAGE_TWO_NAME
-from ixian_docker.modules.docker.checker import DockerImageExists
+from ixian_docker.modules.docker.checker import All, DockerImageExists, DockerVolumeExists
 from ixian_docker.modules.docker.utils.images import image_exists
+from ixian_docker.tests.mocks.checker import FakeChecker
 from ixian_docker.tests.mocks.client import TEST_IMAGE_NAME
 
 
@@ -142,4 +145,78 @@ class TestDockerImageExists:
 
 
 class TestDockerVolumeExists:
-    pass
+    @mock.patch("ixian_docker.modules.docker.utils.volumes.docker_client")
+    def test_state(self, docker_client):
+        volume = mock.Mock(id="project.npm")
+        volume.name = "project.npm"
+        docker_client.return_value.volumes.list.return_value = [volume]
+
+        checker = DockerVolumeExists("project.npm", "project.bower")
+        assert checker.state() == {"project.npm": "project.npm", "project.bower": None}
+        # all volumes are found with a single query
+        docker_client.return_value.volumes.list.assert_called_once_with(
+            filters={"name": ["project.npm", "project.bower"]}
+        )
+
+
+class TestAll:
+    def test_check(self):
+        assert All(FakeChecker("a"), FakeChecker("b")).check()
+        assert not All(FakeChecker("a"), FakeChecker(None)).check()
+
+    def test_requires_checkers(self):
+        with pytest.raises(AssertionError):
+            All()
+
+    def test_state(self):
+        """
+        State only includes checkers that contribute to task state.
+        """
+        checker = All(FakeChecker("a"), FakeChecker("b", False))
+        assert checker.state() == ["a"]
+
+    def test_recheck(self):
+        file_hash = FakeChecker("a")
+        image = FakeChecker(None, False)
+        checker = All(file_hash, image)
+        checker.snapshot()
+        assert not checker.recheck()
+
+        # image exists after pulling
+        image.value = "image_id"
+        assert checker.recheck()
+        assert checker()
+
+        # inputs changed since the snapshot
+        file_hash.value = "b"
+        assert not checker.recheck()
+
+    def test_lazy_state(self):
+        """
+        State isn't computed until a snapshot is taken.
+        """
+        file_hash = FakeChecker("a")
+        with mock.patch.object(file_hash, "state", wraps=file_hash.state) as state:
+            checker = All(file_hash, FakeChecker("image_id", False))
+            state.assert_not_called()
+            assert checker.recheck()
+            state.assert_not_called()
+            checker.snapshot()
+            state.assert_called_once_with()
+
+    def test_save(self):
+        checkers = [FakeChecker("a"), FakeChecker("b", False)]
+        All(*checkers).save()
+        assert all(checker.saved for checker in checkers)
+
+    def test_filename(self):
+        checker = All(FakeChecker("a", name="one"), FakeChecker("b", name="two"))
+        assert checker.filename() != All(FakeChecker("a", name="one")).filename()
+        assert checker.filename() == checker.clone().filename()
+
+    def test_clone(self):
+        checker = All(FakeChecker("a"), FakeChecker("b", False))
+        clone = checker.clone()
+        assert clone is not checker
+        assert clone.state() == checker.state()
+        assert [c.contribute_to_task_state for c in clone.checkers] == [True, False]
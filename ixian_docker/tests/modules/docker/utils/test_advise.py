@@ -0,0 +1,146 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ixian_docker.modules.docker.utils.advise import (
+    advise,
+    parse_dockerfile,
+    rebuild_cost,
+    stage_build_time,
+)
+
+DOCKERFILE = """
+FROM ubuntu:18.04 AS build
+# comment
+RUN echo $APP_DIR
+RUN apt-get update && \\
+    # install packages
+    apt-get install -y git
+ADD . /srv
+RUN pip install -r /srv/requirements.txt
+RUN make
+
+FROM ubuntu:18.04
+COPY --from=build /srv /srv
+RUN apt-get install -y curl
+"""
+
+
+def issue_rules(issues):
+    return [(issue["rule"], issue["instruction"]["line"]) for issue in issues]
+
+
+class TestParseDockerfile:
+    def test_parse(self):
+        instructions = parse_dockerfile(DOCKERFILE)
+        assert [(item["line"], item["instruction"], item["block"]) for item in instructions] == [
+            (2, "FROM", 0),
+            (4, "RUN", 0),
+            (5, "RUN", 0),
+            (8, "ADD", 0),
+            (9, "RUN", 0),
+            (10, "RUN", 0),
+            (12, "FROM", 1),
+            (13, "COPY", 1),
+            (14, "RUN", 1),
+        ]
+
+    def test_continuation(self):
+        """
+        Continued lines are joined, comments within them are skipped.
+        """
+        [from_, echo, apt, *rest] = parse_dockerfile(DOCKERFILE)
+        assert apt["arguments"] == "apt-get update && apt-get install -y git"
+
+
+class TestAdvise:
+    def test_rules(self):
+        assert sorted(issue_rules(advise(DOCKERFILE))) == [
+            ("apt-lists-not-removed", 5),
+            ("apt-update-split", 14),
+            ("context-copy-before-install", 8),
+            ("debug-layer", 4),
+        ]
+
+    def test_clean(self):
+        dockerfile = """
+        FROM ubuntu:18.04
+        RUN apt-get update && apt-get install -y git && rm -rf /var/lib/apt/lists/*
+        COPY requirements.txt /srv/
+        RUN pip install -r /srv/requirements.txt
+        COPY . /srv
+        RUN echo done && make
+        """
+        assert advise(dockerfile) == []
+
+    def test_echo_writes_file(self):
+        """
+        echoes redirected to a file write to the image, they aren't debug layers.
+        """
+        dockerfile = """
+        FROM ubuntu:18.04
+        RUN echo "deb http://example.com/ubuntu bionic main" > /etc/apt/sources.list
+        RUN echo "export A=1" >> /etc/profile
+        RUN echo "nameserver 1.1.1.1" | tee /etc/resolv.conf
+        RUN echo done; echo "key" 2> /dev/null
+        RUN echo $APP_DIR && echo done
+        """
+        assert issue_rules(advise(dockerfile)) == [("debug-layer", 7)]
+
+    def test_copy_in_later_block(self):
+        """
+        Copies only invalidate installs in the same FROM block.
+        """
+        dockerfile = """
+        FROM ubuntu:18.04
+        COPY . /srv
+        FROM ubuntu:18.04
+        RUN pip install django
+        """
+        assert advise(dockerfile) == []
+
+    def test_cost(self):
+        """
+        Cache issues are ranked by estimated rebuild cost, size issues have no cost.
+        """
+        records = [
+            {"stage": "python", "decision": "build", "timings": {"build": 60}},
+            {"stage": "python", "decision": "build", "timings": {"build": 100}},
+            {"stage": "python", "decision": "local-hit", "timings": {}},
+        ]
+        issues = advise(DOCKERFILE, "python", records)
+        assert [(issue["rule"], issue["cost"]) for issue in issues] == [
+            # 3 of the 5 RUNs are at or after the ADD
+            ("context-copy-before-install", 48),
+            ("apt-update-split", 16),
+            ("debug-layer", None),
+            ("apt-lists-not-removed", None),
+        ]
+
+    def test_no_timings(self):
+        issues = advise(DOCKERFILE, "python", [])
+        assert all(issue["cost"] is None for issue in issues)
+
+
+class TestRebuildCost:
+    def test_stage_build_time(self):
+        records = [
+            {"stage": "npm", "decision": "build", "timings": {"build": 10}},
+            {"stage": "python", "decision": "build", "timings": {"build": 30}},
+        ]
+        assert stage_build_time(records, "python") == 30
+        assert stage_build_time(records, "webpack") is None
+
+    def test_no_runs(self):
+        instructions = parse_dockerfile("FROM ubuntu\nCOPY . /srv\n")
+        assert rebuild_cost(instructions, instructions[1], 60) is None
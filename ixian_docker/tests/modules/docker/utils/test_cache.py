@@ -0,0 +1,170 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+import docker
+import pytest
+
+from ixian_docker.modules.docker.utils import cache, digests
+from ixian_docker.modules.docker.utils.cache import (
+    dockerfile_cache_key,
+    dockerfile_parents,
+    image_repository,
+    pin_buildargs,
+    resolve_parent,
+    stage_cache_key,
+)
+from ixian_docker.modules.docker.utils.labels import CACHE_KEY_LABEL
+
+DOCKERFILE = """
+ARG FROM_REPOSITORY
+ARG FROM_TAG
+ARG WHEELHOUSE_IMAGE
+ARG NODE=node:12
+FROM ${WHEELHOUSE_IMAGE} AS wheelhouse
+FROM $NODE as node
+FROM ${FROM_REPOSITORY}:${FROM_TAG} AS install
+COPY --from=wheelhouse /srv/wheelhouse /srv/wheelhouse
+COPY --from=0 /a /a
+COPY --from=${FROM_REPOSITORY}:static /static /static
+FROM scratch AS export
+FROM install
+"""
+
+BUILDARGS = {
+    "FROM_REPOSITORY": "repo",
+    "FROM_TAG": "base-123",
+    "WHEELHOUSE_IMAGE": "repo:wheelhouse-123",
+}
+
+
+@pytest.fixture
+def mock_images():
+    """
+    Images that exist locally, maps name to cache key. Images without a key weren't built by
+    ixian. Other images resolve to a digest in the registry, ``mock_images.registry``.
+    """
+    images = {"repo:base-123": "base-key", "repo:wheelhouse-123": "wheelhouse-key"}
+    registry = {"node:12": "sha256:node", "repo:static": "sha256:static"}
+    repo_digests = {}
+
+    def get(name):
+        if name not in images:
+            raise docker.errors.NotFound(name)
+        labels = {CACHE_KEY_LABEL: images[name]} if images[name] else {}
+        return mock.Mock(labels=labels, attrs={"RepoDigests": repo_digests.get(name, [])})
+
+    with mock.patch.object(cache, "docker_client") as docker_client, mock.patch.object(
+        digests, "resolve_digest", side_effect=registry.get
+    ):
+        docker_client.return_value.images.get.side_effect = get
+        mock_images = mock.Mock(images=images, registry=registry, repo_digests=repo_digests)
+        yield mock_images
+
+
+class TestStageCacheKey:
+    def test_dockerfile_parents(self):
+        assert dockerfile_parents(DOCKERFILE, BUILDARGS) == [
+            "node:12",
+            "repo:base-123",
+            "repo:static",
+            "repo:wheelhouse-123",
+        ]
+
+    def test_cache_key(self, mock_images, tmp_path):
+        dockerfile = tmp_path / "Dockerfile"
+        dockerfile.write_text(DOCKERFILE)
+        key = stage_cache_key(str(dockerfile), buildargs=BUILDARGS)
+        assert key == dockerfile_cache_key(DOCKERFILE, BUILDARGS)
+
+        # parent image built from other inputs
+        mock_images.images["repo:base-123"] = "base-key2"
+        assert dockerfile_cache_key(DOCKERFILE, BUILDARGS) != key
+        mock_images.images["repo:base-123"] = "base-key"
+
+        # external parent's tag moved
+        mock_images.registry["node:12"] = "sha256:node2"
+        assert dockerfile_cache_key(DOCKERFILE, BUILDARGS) != key
+        mock_images.registry["node:12"] = "sha256:node"
+
+        # build args change
+        assert dockerfile_cache_key(DOCKERFILE, dict(BUILDARGS, FROM_TAG="base-456")) != key
+
+        # dockerfile changes
+        assert dockerfile_cache_key(DOCKERFILE + "RUN true\n", BUILDARGS) != key
+
+    def test_parent_not_local(self, mock_images):
+        """
+        External parents are keyed by their registry digest, the key is the same whether or not
+        they've been pulled.
+        """
+        key = dockerfile_cache_key(DOCKERFILE, BUILDARGS)
+        mock_images.images["node:12"] = None
+        mock_images.images["repo:static"] = None
+        assert dockerfile_cache_key(DOCKERFILE, BUILDARGS) == key
+
+    def test_parent_unresolved(self, mock_images):
+        """
+        Parents that can't be resolved are left out of the key.
+        """
+        del mock_images.registry["node:12"]
+        key = dockerfile_cache_key(DOCKERFILE, BUILDARGS)
+        mock_images.images["node:12"] = None
+        assert dockerfile_cache_key(DOCKERFILE, BUILDARGS) == key
+
+
+class TestResolveParent:
+    def test_stage(self, mock_images):
+        """
+        Stages are pinned to the digest they were pushed or pulled with.
+        """
+        assert resolve_parent("repo:base-123") == ("base-key", None)
+        mock_images.repo_digests["repo:base-123"] = ["other@sha256:other", "repo@sha256:base"]
+        assert resolve_parent("repo:base-123") == ("base-key", "sha256:base")
+
+    def test_external(self, mock_images):
+        assert resolve_parent("node:12") == ("sha256:node", "sha256:node")
+        assert resolve_parent("node:10") == (None, None)
+
+    def test_pinned(self, mock_images):
+        assert resolve_parent("node:12@sha256:pinned") == ("sha256:pinned", None)
+
+    def test_image_repository(self):
+        assert image_repository("registry:5000/project:tag") == "registry:5000/project"
+        assert image_repository("registry:5000/project") == "registry:5000/project"
+        assert image_repository("project") == "project"
+
+
+class TestPinBuildargs:
+    def test_pin(self, mock_images):
+        mock_images.repo_digests["repo:base-123"] = ["repo@sha256:base"]
+        assert pin_buildargs(DOCKERFILE, BUILDARGS) == {
+            "FROM_REPOSITORY": "repo",
+            "FROM_TAG": "base-123@sha256:base",
+            # only built locally
+            "WHEELHOUSE_IMAGE": "repo:wheelhouse-123",
+            # ARG defaults are pinned too
+            "NODE": "node:12@sha256:node",
+        }
+
+    def test_written_out(self, mock_images):
+        """
+        Images written out in FROM can't be pinned with build args.
+        """
+        assert pin_buildargs("FROM node:12\n") == {}
+
+    def test_already_pinned(self, mock_images):
+        buildargs = {"NODE": "node:12@sha256:pinned"}
+        assert pin_buildargs(DOCKERFILE, buildargs)["NODE"] == "node:12@sha256:pinned"
@@ -12,18 +12,58 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from datetime import datetime, timezone
 from unittest import mock
 
 import pytest
 import docker
+import requests
 
+from ixian.exceptions import ExecuteFailed
 from ixian_docker.modules.docker.utils.client import (
     DockerClient,
+    ECRDockerClient,
+    MANIFEST_TYPES,
     docker_client,
     UnknownRegistry,
 )
 
 
+def mock_response(status_code=200, headers=None, json=None, links=None):
+    return mock.Mock(
+        status_code=status_code,
+        ok=status_code < 400,
+        headers=headers or {},
+        links=links or {},
+        json=mock.Mock(return_value=json),
+    )
+
+
+@pytest.fixture
+def mock_registry():
+    """
+    Registry API that responds with ``request.routes[(method, path)]``. Requests are challenged
+    for a bearer token until one is requested from the token server.
+    """
+    routes = {}
+    challenge = (
+        'Bearer realm="https://auth.example.com/token",'
+        'service="registry.example.com",scope="repository:path/project:pull,delete"'
+    )
+
+    def respond(session, method, url, **kwargs):
+        if session.headers.get("Authorization") != "Bearer TOKEN":
+            return mock_response(401, headers={"WWW-Authenticate": challenge})
+        return routes.get((method, url.split("/v2", 1)[1]), mock_response(404))
+
+    with mock.patch.object(
+        requests.Session, "request", autospec=True, side_effect=respond
+    ) as request, mock.patch("ixian_docker.modules.docker.utils.client.requests.get") as get_token:
+        request.routes = routes
+        get_token.return_value = mock_response(json={"token": "TOKEN"})
+        yield request, get_token
+
+
 def test_get_client():
     """Sanity check"""
     assert isinstance(docker_client(), docker.DockerClient)
@@ -71,6 +111,121 @@ class TestDockerClient:
         with pytest.raises(KeyError):
             client.login()
 
+    @mock.patch("ixian_docker.modules.docker.utils.client.subprocess.run")
+    def test_cli_login(self, run):
+        run.return_value.returncode = 0
+        client = DockerClient("registry.example.com", username="user", password="pass")
+        client.cli_login()
+        [[[command], options]] = run.call_args_list
+        assert command == [
+            "docker",
+            "login",
+            "--username",
+            "user",
+            "--password-stdin",
+            "registry.example.com",
+        ]
+        assert options["input"] == "pass"
+
+    @mock.patch("ixian_docker.modules.docker.utils.client.subprocess.run")
+    def test_cli_login_fails(self, run):
+        run.return_value.returncode = 1
+        run.return_value.stdout = "unauthorized\n"
+        client = DockerClient("registry.example.com", username="user", password="pass")
+        with pytest.raises(ExecuteFailed, match="unauthorized"):
+            client.cli_login()
+
+    def test_delete_tags(self, mock_registry):
+        request, get_token = mock_registry
+        digests = {"a": "sha256:a", "b": "sha256:shared", "c": "sha256:shared", "d": "sha256:d"}
+        for tag, digest in digests.items():
+            request.routes[("HEAD", f"/path/project/manifests/{tag}")] = mock_response(
+                headers={"Docker-Content-Digest": digest}
+            )
+        request.routes[("DELETE", "/path/project/manifests/sha256:a")] = mock_response(202)
+        request.routes[("DELETE", "/path/project/manifests/sha256:d")] = mock_response(202)
+
+        client = DockerClient("registry.example.com", username="user", password="pass")
+        deleted = client.delete_tags(
+            "registry.example.com/path/project", ["a", "b", "d", "missing"], keep=["c"]
+        )
+
+        # b shares a manifest with c which is kept.
+        assert deleted == ["a", "d"]
+        get_token.assert_called_once_with(
+            "https://auth.example.com/token",
+            params={
+                "service": "registry.example.com",
+                "scope": "repository:path/project:pull,delete",
+            },
+            auth=("user", "pass"),
+        )
+        head = [call for call in request.call_args_list if call[0][1] == "HEAD"]
+        assert head[0][1]["headers"] == {"Accept": ", ".join(MANIFEST_TYPES)}
+
+    def test_delete_tags_refused(self, mock_registry):
+        request, get_token = mock_registry
+        request.routes[("HEAD", "/path/project/manifests/a")] = mock_response(
+            headers={"Docker-Content-Digest": "sha256:a"}
+        )
+        request.routes[("DELETE", "/path/project/manifests/sha256:a")] = mock_response(405)
+        client = DockerClient("registry.example.com")
+        assert client.delete_tags("registry.example.com/path/project", ["a"]) == []
+
+    @pytest.mark.parametrize(
+        "registry,options,api_url,name",
+        [
+            ("registry.example.com", {}, "https://registry.example.com/v2", "path/project"),
+            ("registry:5000", {"insecure": True}, "http://registry:5000/v2", "path/project"),
+            ("docker.io", {}, "https://registry-1.docker.io/v2", "path/project"),
+            ("docker.io", {}, "https://registry-1.docker.io/v2", "library/project"),
+            (
+                "registry.example.com",
+                {"api_url": "https://api.example.com/v2"},
+                "https://api.example.com/v2",
+                "path/project",
+            ),
+        ],
+    )
+    def test_api_url(self, registry, options, api_url, name):
+        client = DockerClient(registry, **options)
+        assert client.api_url == api_url
+        assert client.repository_name(f"{registry}/{name.split('library/')[-1]}") == name
+
+    def test_list_tags(self, mock_registry):
+        request, get_token = mock_registry
+        request.routes[("GET", "/path/project/tags/list")] = mock_response(
+            json={"tags": ["a", "b"]},
+            links={"next": {"url": "/v2/path/project/tags/list?last=b"}},
+        )
+        request.routes[("GET", "/path/project/tags/list?last=b")] = mock_response(
+            json={"tags": ["c"]}
+        )
+        client = DockerClient("registry.example.com")
+        assert client.list_tags("registry.example.com/path/project") == ["a", "b", "c"]
+
+    def test_tags_created(self, mock_registry):
+        request, get_token = mock_registry
+        request.routes[("GET", "/path/project/manifests/single")] = mock_response(
+            json={"config": {"digest": "sha256:config"}}
+        )
+        # multi-platform images are created at the time of their first manifest
+        request.routes[("GET", "/path/project/manifests/multi")] = mock_response(
+            json={"manifests": [{"digest": "sha256:amd64"}]}
+        )
+        request.routes[("GET", "/path/project/manifests/sha256:amd64")] = mock_response(
+            json={"config": {"digest": "sha256:config"}}
+        )
+        request.routes[("GET", "/path/project/blobs/sha256:config")] = mock_response(
+            json={"created": "2020-01-02T03:04:05.123456789Z"}
+        )
+        client = DockerClient("registry.example.com")
+        created = client.tags_created(
+            "registry.example.com/path/project", ["single", "multi", "missing"]
+        )
+        timestamp = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc).timestamp()
+        assert created == {"single": timestamp, "multi": timestamp}
+
 
 class TestECRDockerClient:
     def test_for_registry(self, mock_docker_environment, mock_ecr):
@@ -96,3 +251,51 @@ class TestECRDockerClient:
             "",
             registry="https://FAKE_REGISTRY.dkr.ecr.us-west-2.amazonaws.com",
         )
+
+    @mock.patch("ixian_docker.modules.docker.utils.client.subprocess.run")
+    def test_cli_login(self, run, mock_docker_environment, mock_ecr):
+        run.return_value.returncode = 0
+        client = DockerClient.for_registry("MOCK_ECR_REGISTRY")
+        client.cli_login()
+        [[[command], options]] = run.call_args_list
+        assert command[-1] == "https://FAKE_REGISTRY.dkr.ecr.us-west-2.amazonaws.com"
+        assert command[3] == "AWS"
+        assert options["input"] == "FAKE_AUTH_TOKEN"
+
+    def test_delete_tags(self):
+        tags = [f"tag{i}" for i in range(150)]
+        client = ECRDockerClient("FAKE_REGISTRY.dkr.ecr.us-west-2.amazonaws.com")
+        with mock.patch.object(
+            ECRDockerClient, "ecr_client", new_callable=mock.PropertyMock
+        ) as ecr_client:
+            ecr_client.return_value.batch_delete_image.side_effect = lambda **kwargs: {
+                "imageIds": kwargs["imageIds"]
+            }
+            deleted = client.delete_tags(
+                "FAKE_REGISTRY.dkr.ecr.us-west-2.amazonaws.com/project", tags
+            )
+
+        # tags are deleted in batches
+        assert deleted == tags
+        batch_delete_image = ecr_client.return_value.batch_delete_image
+        assert batch_delete_image.call_count == 2
+        batch_delete_image.assert_called_with(
+            repositoryName="project", imageIds=[{"imageTag": tag} for tag in tags[100:]]
+        )
+
+    def test_tags_created(self):
+        pushed = datetime(2020, 1, 2, tzinfo=timezone.utc)
+        client = ECRDockerClient("FAKE_REGISTRY.dkr.ecr.us-west-2.amazonaws.com")
+        with mock.patch.object(
+            ECRDockerClient, "ecr_client", new_callable=mock.PropertyMock
+        ) as ecr_client:
+            ecr_client.return_value.describe_images.return_value = {
+                "imageDetails": [{"imageTags": ["a", "b"], "imagePushedAt": pushed}]
+            }
+            created = client.tags_created(
+                "FAKE_REGISTRY.dkr.ecr.us-west-2.amazonaws.com/project", ["a", "b"]
+            )
+        assert created == {"a": pushed.timestamp(), "b": pushed.timestamp()}
+        ecr_client.return_value.describe_images.assert_called_once_with(
+            repositoryName="project", imageIds=[{"imageTag": "a"}, {"imageTag": "b"}]
+        )
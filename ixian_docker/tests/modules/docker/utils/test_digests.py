@@ -0,0 +1,108 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+import docker
+import pytest
+
+from ixian_docker.modules.docker.utils import digests
+from ixian_docker.modules.docker.utils.client import DockerClient
+from ixian_docker.modules.docker.utils.digests import pin, read_digest_cache, resolve_digest
+from ixian_docker.modules.docker.utils.dockerfile import build_dockerfile
+
+DIGEST = f"sha256:{'a' * 64}"
+IMAGE = "ubuntu:18.04"
+
+
+@pytest.fixture
+def mock_registry(tmp_path):
+    """Registry that resolves every image to DIGEST. No registries are configured."""
+    with mock.patch.object(digests, "CONFIG") as config, mock.patch.object(
+        digests, "docker_client"
+    ) as docker_client, mock.patch.object(
+        DockerClient, "for_registry", side_effect=digests.UnknownRegistry("docker.io")
+    ):
+        config.DOCKER.DIGEST_CACHE = str(tmp_path / "digests.json")
+        config.DOCKER.DIGEST_TTL = 60
+        get_registry_data = docker_client.return_value.images.get_registry_data
+        get_registry_data.return_value.id = DIGEST
+        yield get_registry_data
+
+
+class TestResolveDigest:
+    def test_resolve(self, mock_registry):
+        with mock.patch.object(digests.time, "time", return_value=100):
+            assert resolve_digest(IMAGE) == DIGEST
+        mock_registry.assert_called_once_with(IMAGE)
+        assert read_digest_cache() == {IMAGE: {"digest": DIGEST, "resolved": 100}}
+
+    def test_cached(self, mock_registry):
+        """
+        Digests are reused until the TTL expires.
+        """
+        with mock.patch.object(digests.time, "time", return_value=100):
+            resolve_digest(IMAGE)
+        with mock.patch.object(digests.time, "time", return_value=159):
+            assert resolve_digest(IMAGE) == DIGEST
+        assert mock_registry.call_count == 1
+
+        mock_registry.return_value.id = "sha256:new"
+        with mock.patch.object(digests.time, "time", return_value=160):
+            assert resolve_digest(IMAGE) == "sha256:new"
+        assert mock_registry.call_count == 2
+
+    def test_registry_unavailable(self, mock_registry):
+        mock_registry.side_effect = docker.errors.APIError("unavailable")
+        assert resolve_digest(IMAGE) is None
+        assert read_digest_cache() == {}
+
+    def test_expired_digest_used(self, mock_registry):
+        """
+        An expired digest is used if the registry can't be reached.
+        """
+        with mock.patch.object(digests.time, "time", return_value=100):
+            resolve_digest(IMAGE)
+        mock_registry.side_effect = docker.errors.APIError("unavailable")
+        with mock.patch.object(digests.time, "time", return_value=1000):
+            assert resolve_digest(IMAGE) == DIGEST
+
+    def test_configured_registry(self, mock_registry):
+        """
+        Configured registries are logged into and queried with their client.
+        """
+        registry_client = mock.Mock()
+        registry_client.client.images.get_registry_data.return_value.id = DIGEST
+        with mock.patch.object(DockerClient, "for_registry", return_value=registry_client):
+            assert resolve_digest("registry.example.com/project:base") == DIGEST
+        registry_client.login.assert_called_once_with()
+        mock_registry.assert_not_called()
+
+
+class TestPin:
+    def test_pin(self, mock_registry):
+        assert pin(IMAGE) == f"{IMAGE}@{DIGEST}"
+
+    def test_already_pinned(self, mock_registry):
+        assert pin(f"{IMAGE}@{DIGEST}") == f"{IMAGE}@{DIGEST}"
+        mock_registry.assert_not_called()
+
+    def test_unresolved(self, mock_registry):
+        mock_registry.side_effect = docker.errors.APIError("unavailable")
+        assert pin(IMAGE) == IMAGE
+
+    def test_template(self, mock_registry, tmp_path):
+        template = tmp_path / "Dockerfile.jinja"
+        template.write_text('FROM {{ pin("ubuntu:18.04") }}\n')
+        assert build_dockerfile(str(template)) == f"FROM {IMAGE}@{DIGEST}"
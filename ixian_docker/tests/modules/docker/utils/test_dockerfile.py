@@ -0,0 +1,120 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from importlib import import_module
+from unittest import mock
+
+import pytest
+
+from ixian.config import CONFIG
+from ixian.module import load_module
+from ixian_docker.modules.docker.utils import dockerfile
+from ixian_docker.modules.docker.utils.dockerfile import build_dockerfile, dockerfile_modules
+
+BASE_TEMPLATE = """\
+{% for module in modules if module.dependencies_template %}{% include module.dependencies_template %}
+{% endfor %}ADD . /src
+{% for module in modules if module.template %}{% include module.template %}
+{% endfor %}"""
+
+
+@pytest.fixture
+def mock_modules(tmp_path):
+    """Two modules, one with both snippets and one with only an application snippet."""
+    (tmp_path / "base.template").write_text(BASE_TEMPLATE)
+    for module in ["one", "two"]:
+        (tmp_path / module).mkdir()
+        (tmp_path / module / "app.template").write_text(f"RUN {module} setup")
+    (tmp_path / "one" / "dependencies.template").write_text("RUN one install")
+    modules = {
+        "ONE": {
+            "name": "ONE",
+            "dockerfile_template": str(tmp_path / "one" / "app.template"),
+            "dockerfile_dependencies_template": str(tmp_path / "one" / "dependencies.template"),
+        },
+        "TWO": {"name": "TWO", "dockerfile_template": str(tmp_path / "two" / "app.template")},
+    }
+    with mock.patch.object(dockerfile, "MODULES", modules):
+        yield str(tmp_path / "base.template")
+
+
+@pytest.fixture
+def project_modules():
+    """
+    Modules loaded the way a project loads them. npm and bower configure snippets with config keys
+    that don't exist.
+    """
+    with mock.patch.dict(dockerfile.MODULES, clear=True):
+        for name in ["docker", "npm", "bower"]:
+            module_path = f"ixian_docker.modules.{name}"
+            if not hasattr(CONFIG, name.upper()):
+                load_module(module_path)
+            options = import_module(module_path).OPTIONS
+            dockerfile.MODULES[options["name"]] = options
+        yield
+
+
+class TestBuildDockerfile:
+    def test_phases(self, mock_modules):
+        """
+        Dependency snippets are rendered before the project source, application snippets after.
+        """
+        assert build_dockerfile(mock_modules).splitlines() == [
+            "RUN one install",
+            "ADD . /src",
+            "RUN one setup",
+            "RUN two setup",
+        ]
+
+    def test_missing_snippet(self, mock_modules, tmp_path):
+        """
+        Snippets that don't exist are skipped.
+        """
+        (tmp_path / "two" / "app.template").unlink()
+        assert build_dockerfile(mock_modules).splitlines() == [
+            "RUN one install",
+            "ADD . /src",
+            "RUN one setup",
+        ]
+
+    def test_modules(self, mock_modules):
+        directories, modules = dockerfile_modules()
+        assert modules == [
+            {
+                "name": "ONE",
+                "dependencies_template": "ONE.dependencies_template/dependencies.template",
+                "template": "ONE.template/app.template",
+            },
+            {
+                "name": "TWO",
+                "dependencies_template": None,
+                "template": "TWO.template/app.template",
+            },
+        ]
+        assert sorted(directories) == [
+            "ONE.dependencies_template",
+            "ONE.template",
+            "TWO.template",
+        ]
+
+    def test_unconfigured_snippets(self, project_modules):
+        """
+        Snippets configured with a missing config key are skipped.
+        """
+        directories, modules = dockerfile_modules()
+        assert {module["name"]: module["template"] for module in modules} == {
+            "DOCKER": None,
+            "NPM": None,
+            "BOWER": None,
+        }
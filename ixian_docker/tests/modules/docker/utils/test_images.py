@@ -12,13 +12,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import queue
+import threading
 from unittest import mock
 
+import pytest
 from docker.errors import NotFound as DockerNotFound
 
+from ixian.exceptions import ExecuteFailed
 from ixian.utils.filesystem import pwd
+from ixian_docker.modules.docker.checker import All
+from ixian_docker.modules.docker.utils.client import DockerClient, UnknownRegistry
+from ixian_docker.modules.docker.utils.cache import stage_cache_key
+from ixian_docker.modules.docker.utils.labels import CACHE_KEY_LABEL
+from ixian_docker.modules.docker.utils.remote_builders import LOCAL_BUILDER
+from ixian_docker.modules.docker.utils.report import BUILD, REGISTRY_PULL
 from ixian_docker.tests.conftest import TEST_IMAGE_NAME, build_test_image
+from ixian_docker.modules.docker.utils import cache, digests, images, logs
 from ixian_docker.modules.docker.utils.images import (
+    BuildError,
+    read_build_stream,
     image_exists,
     push_image,
     pull_image,
@@ -27,8 +40,14 @@ from ixian_docker.modules.docker.utils.images import (
     parse_registry,
     build_image_if_needed,
     build_image,
+    prune_images,
+    select_images_to_prune,
+    stage_images,
 )
 from ixian_docker.tests import event_streams
+from ixian_docker.tests.mocks.checker import FakeChecker
+
+IMAGES = "ixian_docker.modules.docker.utils.images"
 
 
 class TestImageExists:
@@ -86,6 +105,115 @@ class TestBuildImage:
             assert not image_exists(tag)
 
 
+def mock_build_client(messages):
+    """
+    Client whose build streams ``messages``. The build response is passed to response hooks the
+    same way requests does.
+    """
+    client = mock.Mock()
+    client.api.hooks = {"response": []}
+    response = mock.Mock()
+
+    def build(**kwargs):
+        for hook in list(client.api.hooks["response"]):
+            hook(response)
+        return messages
+
+    client.api.build.side_effect = build
+    client.response = response
+    return client
+
+
+class TestBuildStream:
+    @pytest.fixture(autouse=True)
+    def mock_config(self, tmp_path):
+        with mock.patch.object(images, "CONFIG") as config, mock.patch.object(
+            logs, "CONFIG"
+        ) as logs_config:
+            config.PROJECT_NAME = "project"
+            logs_config.DOCKER.LOG_DIR = str(tmp_path)
+            logs_config.DOCKER.LOG_BUFFER_SIZE = 1024
+            logs_config.DOCKER.LOG_TAIL = 0
+            yield tmp_path
+
+    def test_build(self, mock_config):
+        """
+        Build output is written to the stage's log.
+        """
+        client = mock_build_client(
+            iter([b'{"stream":"Step 1/2"}\r\n{"stream":"Step', b' 2/2"}\r\n'])
+        )
+        build_image("Dockerfile", f"image:python-{'0' * 64}", context="/srv", client=client)
+        assert (mock_config / "python.log").read_text() == "Step 1/2\nStep 2/2\n"
+        client.api.build.assert_called_once_with(
+            path="/srv",
+            dockerfile="Dockerfile",
+            tag=f"image:python-{'0' * 64}",
+            labels={"ixian.project": "project"},
+            forcerm=True,
+        )
+        client.response.close.assert_not_called()
+        assert client.api.hooks["response"] == []
+
+    def test_error(self, mock_config):
+        """
+        The first error raises BuildError and cancels the build without waiting for the stream
+        to end.
+        """
+        finished = threading.Event()
+
+        def stream():
+            yield b'{"errorDetail":{"message":"returned a non-zero code: 1"}}\r\n'
+            finished.wait(10)
+            yield b'{"stream":"never logged"}\r\n'
+
+        client = mock_build_client(stream())
+        try:
+            with pytest.raises(BuildError, match="non-zero code") as exception:
+                build_image("Dockerfile", "image:tag", context="/srv", client=client)
+        finally:
+            finished.set()
+        assert exception.value.image == "image:tag"
+        assert exception.value.message == "returned a non-zero code: 1"
+        client.response.close.assert_called_once_with()
+        assert (mock_config / "tag.log").read_text() == "returned a non-zero code: 1\n"
+
+    def test_interrupt(self):
+        """
+        Interrupting the build closes the connection so the daemon cancels it.
+        """
+        client = mock_build_client(iter([b'{"stream":"Step 1/2"}\r\n']))
+        with mock.patch.object(images, "log_build_stream", side_effect=KeyboardInterrupt):
+            with pytest.raises(KeyboardInterrupt):
+                build_image("Dockerfile", "image:tag", context="/srv", client=client)
+        client.response.close.assert_called_once_with()
+
+    def test_stream_error(self):
+        def stream():
+            yield b'{"stream":"Step 1/2"}\r\n'
+            raise ConnectionError("connection reset")
+
+        client = mock_build_client(stream())
+        with pytest.raises(ConnectionError):
+            build_image("Dockerfile", "image:tag", context="/srv", client=client)
+
+    def test_cancelled_reader(self):
+        """
+        The reader stops when the build is cancelled, even if the queue is full.
+        """
+        messages = queue.Queue(maxsize=1)
+        cancelled = threading.Event()
+        reader = threading.Thread(
+            target=read_build_stream, args=(iter([b"1", b"2", b"3"]), messages, cancelled)
+        )
+        with mock.patch.object(images, "BUILD_QUEUE_TIMEOUT", 0.01):
+            reader.start()
+            assert messages.get(timeout=1) == b"1"
+            cancelled.set()
+            reader.join(1)
+        assert not reader.is_alive()
+
+
 class TestDeleteImage:
     def test_delete_image(self, test_image):
         assert image_exists(TEST_IMAGE_NAME)
@@ -235,11 +363,29 @@ class TestBuildImageIfNeeded:
             path="/opt/ixian_docker",
         )
 
-    def test_recheck_fails(self):
+    @mock.patch(f"{IMAGES}.write_build_report", mock.Mock())
+    @mock.patch(f"{IMAGES}.image_summary", mock.Mock(return_value={}))
+    @mock.patch(f"{IMAGES}.select_builder", return_value=(LOCAL_BUILDER, None))
+    @mock.patch(f"{IMAGES}.build_image")
+    @mock.patch(f"{IMAGES}.pull_image")
+    @mock.patch(f"{IMAGES}.image_cache_key", return_value="key")
+    @mock.patch(f"{IMAGES}.image_exists_in_registry", return_value=True)
+    @mock.patch(f"{IMAGES}.image_exists", return_value=False)
+    def test_recheck_fails(self, image_exists, in_registry, cache_key, pull, build, builder):
         """
         After pulling a re-check is run. If it fails the image is built.
         """
-        raise NotImplementedError
+        recheck = mock.Mock(return_value=False)
+        assert build_image_if_needed(TEST_IMAGE_NAME, recheck=recheck, cache_key="key")
+        pull.assert_called_once_with(TEST_IMAGE_NAME, None)
+        recheck.assert_called_once_with()
+        build.assert_called_once()
+
+        # build is skipped if the re-check passes
+        build.reset_mock()
+        recheck.return_value = True
+        assert not build_image_if_needed(TEST_IMAGE_NAME, recheck=recheck, cache_key="key")
+        build.assert_not_called()
 
     def test_custom_tag(self, mock_docker_environment):
         tag = f"{TEST_IMAGE_NAME}:custom_tag"
@@ -256,6 +402,411 @@ class TestBuildImageIfNeeded:
         )
 
 
+class TestRecheckAfterPull:
+    """
+    When every stage image is in the registry the pulled images short-circuit all builds.
+    """
+
+    # stage and its parent, the base image is external and isn't local on either machine.
+    STAGES = {
+        "base": None,
+        "wheelhouse": "base",
+        "python": "base",
+        "npm": "base",
+        "webpack": "npm",
+        "runtime": "python",
+    }
+    REPOSITORY = "registry.test/project"
+
+    def tag(self, stage):
+        return f"{stage}-{'0' * 64}"
+
+    def build_kwargs(self, stage, context):
+        parent = self.STAGES[stage]
+        if parent is None:
+            text = "FROM ubuntu:18.04\n"
+            buildargs = None
+        else:
+            text = "ARG FROM_REPOSITORY\nARG FROM_TAG\nFROM ${FROM_REPOSITORY}:${FROM_TAG}\n"
+            buildargs = {"FROM_REPOSITORY": self.REPOSITORY, "FROM_TAG": self.tag(parent)}
+        (context / f"Dockerfile.{stage}").write_text(f"{text}RUN {stage}\n")
+        return dict(dockerfile=f"Dockerfile.{stage}", context=str(context), buildargs=buildargs)
+
+    @pytest.fixture
+    def registry(self, tmp_path):
+        """
+        Stand-in registry. Pulling copies an image, and its cache key, to the local images. The
+        registry's images are keyed as if they were built and pushed by another machine.
+        """
+        local = {}
+        remote = {}
+
+        def get(name):
+            if name not in local:
+                raise DockerNotFound(name)
+            return mock.Mock(labels={CACHE_KEY_LABEL: local[name]}, attrs={"RepoDigests": []})
+
+        def pull(repository, tag):
+            name = f"{repository}:{tag}"
+            local[name] = remote[name]
+
+        with mock.patch.object(cache, "docker_client") as docker_client, mock.patch.object(
+            digests, "resolve_digest", side_effect={"ubuntu:18.04": "sha256:ubuntu"}.get
+        ), mock.patch.multiple(
+            IMAGES,
+            image_exists=lambda name: name in local,
+            image_exists_in_registry=lambda repository, tag: f"{repository}:{tag}" in remote,
+            pull_image=mock.DEFAULT,
+            build_image=mock.DEFAULT,
+            select_builder=mock.Mock(return_value=(LOCAL_BUILDER, None)),
+            image_summary=mock.Mock(return_value={"size": 1024, "layers": 2}),
+            write_build_report=mock.DEFAULT,
+        ) as mocks:
+            docker_client.return_value.images.get.side_effect = get
+            for stage in self.STAGES:
+                kwargs = self.build_kwargs(stage, tmp_path)
+                local[f"{self.REPOSITORY}:{self.tag(stage)}"] = stage_cache_key(
+                    kwargs["dockerfile"], kwargs["context"], kwargs["buildargs"]
+                )
+            remote.update(local)
+            local.clear()
+
+            mocks["pull_image"].side_effect = pull
+            yield local, remote, mocks, tmp_path
+
+    def test_no_builds(self, registry):
+        local, remote, mocks, context = registry
+        before_build = mock.Mock()
+        for stage in self.STAGES:
+            name = f"{self.REPOSITORY}:{self.tag(stage)}"
+            # image checker only passes once the image has been pulled
+            checker = All(FakeChecker("file-hash"), FakeChecker(lambda: name in local, False))
+            assert not checker.check()
+            built = build_image_if_needed(
+                self.REPOSITORY,
+                self.tag(stage),
+                recheck=checker,
+                before_build=before_build,
+                **self.build_kwargs(stage, context),
+            )
+            assert not built
+            assert checker.check()
+
+        assert local == remote
+        assert mocks["pull_image"].call_count == len(self.STAGES)
+        mocks["build_image"].assert_not_called()
+        before_build.assert_not_called()
+
+        # each stage is recorded in the build report
+        records = [call[0][0] for call in mocks["write_build_report"].call_args_list]
+        assert [record["stage"] for record in records] == list(self.STAGES)
+        assert {record["decision"] for record in records} == {REGISTRY_PULL}
+        assert [record["cache_key"] for record in records] == list(remote.values())
+        assert {"registry", "pull", "recheck", "total"} <= set(records[0]["timings"])
+
+    def test_changed_inputs(self, registry):
+        """
+        Pulled image is discarded if the inputs changed while pulling.
+        """
+        local, remote, mocks, context = registry
+        name = f"{self.REPOSITORY}:{self.tag('base')}"
+        file_hash = ["before"]
+        checker = All(FakeChecker(lambda: file_hash[0]), FakeChecker(lambda: name in local, False))
+
+        def pull(repository, tag):
+            local[name] = remote[name]
+            file_hash[0] = "after"
+
+        mocks["pull_image"].side_effect = pull
+        before_build = mock.Mock()
+        assert build_image_if_needed(
+            self.REPOSITORY,
+            self.tag("base"),
+            recheck=checker,
+            before_build=before_build,
+            **self.build_kwargs("base", context),
+        )
+        before_build.assert_called_once_with()
+        mocks["build_image"].assert_called_once()
+        [[[record], _]] = mocks["write_build_report"].call_args_list
+        assert record["decision"] == BUILD
+        assert record["builder"] == LOCAL_BUILDER
+        assert record["size"] == 1024
+
+
+class TestMultiPlatform:
+    REPOSITORY = "registry.test/project"
+    TAG = f"python-{'0' * 64}"
+
+    @pytest.fixture
+    def mocks(self):
+        with mock.patch.multiple(
+            IMAGES,
+            CONFIG=mock.DEFAULT,
+            image_exists=mock.Mock(return_value=False),
+            image_exists_in_registry=mock.Mock(return_value=False),
+            build_platforms=mock.DEFAULT,
+            build_image=mock.DEFAULT,
+            cli_login=mock.DEFAULT,
+            pull_image=mock.DEFAULT,
+            select_builder=mock.DEFAULT,
+            image_summary=mock.Mock(return_value={}),
+            write_build_report=mock.DEFAULT,
+        ) as mocks:
+            mocks["CONFIG"].DOCKER.PLATFORMS = ["linux/amd64", "linux/arm64"]
+            mocks["CONFIG"].DOCKER.STAGE_COMPRESSION = {}
+            yield mocks
+
+    def test_build_platforms(self, mocks):
+        """
+        Each platform is built by buildx and the native image is pulled.
+        """
+        assert build_image_if_needed(
+            self.REPOSITORY, self.TAG, cache_key="key", buildargs={"A": "1"}
+        )
+        mocks["build_platforms"].assert_called_once_with(
+            "Dockerfile",
+            self.REPOSITORY,
+            self.TAG,
+            ["linux/amd64", "linux/arm64"],
+            None,
+            buildargs={"A": "1"},
+            labels={CACHE_KEY_LABEL: "key"},
+        )
+        mocks["pull_image"].assert_called_once_with(self.REPOSITORY, self.TAG)
+        mocks["cli_login"].assert_called_once_with(self.REPOSITORY)
+        mocks["build_image"].assert_not_called()
+        mocks["select_builder"].assert_not_called()
+
+    def test_pinned_parents(self, mocks):
+        """
+        Parents are pinned with build args, the cache key is computed before pinning.
+        """
+        with mock.patch(f"{IMAGES}.pin_buildargs", return_value={"A": "a@sha256:a"}) as pin:
+            build_image_if_needed(self.REPOSITORY, self.TAG, cache_key="key", buildargs={"A": "a"})
+        assert pin.call_args[0][1] == {"A": "a"}
+        assert mocks["build_platforms"].call_args[1]["buildargs"] == {"A": "a@sha256:a"}
+
+
+class TestCompression:
+    REPOSITORY = "registry.test/project"
+    TAG = f"python-{'0' * 64}"
+
+    @pytest.fixture
+    def mocks(self):
+        with mock.patch.multiple(
+            IMAGES,
+            CONFIG=mock.DEFAULT,
+            image_exists=mock.Mock(return_value=False),
+            image_exists_in_registry=mock.Mock(return_value=False),
+            build_buildx=mock.DEFAULT,
+            build_platforms=mock.DEFAULT,
+            build_image=mock.DEFAULT,
+            cli_login=mock.DEFAULT,
+            pull_image=mock.DEFAULT,
+            select_builder=mock.DEFAULT,
+            image_summary=mock.Mock(return_value={}),
+            write_build_report=mock.DEFAULT,
+        ) as mocks:
+            mocks["CONFIG"].DOCKER.PLATFORMS = []
+            mocks["CONFIG"].DOCKER.SQUASH_STAGES = ["python"]
+            mocks["CONFIG"].DOCKER.STAGE_COMPRESSION = {"python": "zstd"}
+            mocks["pull_image"].return_value = 100
+            yield mocks
+
+    def test_compressed_stage(self, mocks, caplog):
+        """
+        Compressed stages are built and pushed by buildx and then pulled. They aren't squashed.
+        """
+        assert build_image_if_needed(self.REPOSITORY, self.TAG, cache_key="key")
+        assert "doesn't support squashing" in caplog.text
+        mocks["build_buildx"].assert_called_once_with(
+            "Dockerfile",
+            f"{self.REPOSITORY}:{self.TAG}",
+            None,
+            labels={CACHE_KEY_LABEL: "key"},
+            compression="zstd",
+        )
+        mocks["pull_image"].assert_called_once_with(self.REPOSITORY, self.TAG)
+        mocks["cli_login"].assert_called_once_with(self.REPOSITORY)
+        mocks["build_image"].assert_not_called()
+        mocks["select_builder"].assert_not_called()
+        report = mocks["write_build_report"].call_args[0][0]
+        assert report["compression"] == "zstd"
+        assert report["bytes_pulled"] == 100
+
+    def test_compressed_platforms(self, mocks):
+        mocks["CONFIG"].DOCKER.PLATFORMS = ["linux/amd64", "linux/arm64"]
+        build_image_if_needed(self.REPOSITORY, self.TAG, cache_key="key")
+        assert mocks["build_platforms"].call_args[1]["compression"] == "zstd"
+        mocks["build_buildx"].assert_not_called()
+
+    def test_stage_not_compressed(self, mocks):
+        mocks["CONFIG"].DOCKER.STAGE_COMPRESSION = {"npm": "zstd"}
+        mocks["CONFIG"].DOCKER.SQUASH_STAGES = []
+        mocks["select_builder"].return_value = (LOCAL_BUILDER, mock.Mock())
+        build_image_if_needed(self.REPOSITORY, self.TAG, cache_key="key")
+        mocks["build_buildx"].assert_not_called()
+        mocks["cli_login"].assert_not_called()
+        assert "compression" not in mocks["build_image"].call_args[1]
+
+
+class TestSquash:
+    REPOSITORY = "registry.test/project"
+    TAG = f"python-{'0' * 64}"
+
+    @pytest.fixture
+    def mocks(self):
+        client = mock.Mock()
+        client.info.return_value = {"ExperimentalBuild": True}
+        with mock.patch.multiple(
+            IMAGES,
+            CONFIG=mock.DEFAULT,
+            image_exists=mock.Mock(return_value=False),
+            image_exists_in_registry=mock.Mock(return_value=False),
+            build_image=mock.DEFAULT,
+            select_builder=mock.Mock(return_value=(LOCAL_BUILDER, client)),
+            image_summary=mock.Mock(return_value={}),
+            write_build_report=mock.DEFAULT,
+        ) as mocks:
+            mocks["CONFIG"].DOCKER.PLATFORMS = []
+            mocks["CONFIG"].DOCKER.SQUASH_STAGES = ["python"]
+            mocks["CONFIG"].DOCKER.STAGE_COMPRESSION = {}
+            mocks["client"] = client
+            yield mocks
+
+    def test_squash(self, mocks):
+        assert build_image_if_needed(self.REPOSITORY, self.TAG, cache_key="key")
+        mocks["build_image"].assert_called_once_with(
+            "Dockerfile",
+            f"{self.REPOSITORY}:{self.TAG}",
+            context=None,
+            labels={CACHE_KEY_LABEL: "key"},
+            squash=True,
+        )
+        assert mocks["write_build_report"].call_args[0][0]["squash"] is True
+
+    def test_stage_not_squashed(self, mocks):
+        mocks["CONFIG"].DOCKER.SQUASH_STAGES = ["npm"]
+        build_image_if_needed(self.REPOSITORY, self.TAG, cache_key="key")
+        assert "squash" not in mocks["build_image"].call_args[1]
+
+    def test_squash_not_supported(self, mocks):
+        """
+        Stages are built without squashing if the daemon doesn't have experimental features.
+        """
+        mocks["client"].info.return_value = {"ExperimentalBuild": False}
+        assert build_image_if_needed(self.REPOSITORY, self.TAG, cache_key="key")
+        assert "squash" not in mocks["build_image"].call_args[1]
+
+
+class TestRemoteBuilder:
+    """
+    Remote builders pull parents from the registry, parents only built locally are pushed first.
+    """
+
+    REPOSITORY = "registry.test/project"
+    TAG = f"python-{'0' * 64}"
+    BASE_TAG = f"base-{'0' * 64}"
+    DOCKERFILE = """
+ARG FROM_REPOSITORY
+ARG FROM_TAG
+FROM ${FROM_REPOSITORY}:${FROM_TAG}
+COPY --from=private.test/tools:1 /bin/tool /bin/tool
+COPY --from=ubuntu:18.04 /etc/os-release /etc/os-release
+"""
+
+    @pytest.fixture
+    def mocks(self, tmp_path):
+        (tmp_path / "Dockerfile").write_text(self.DOCKERFILE)
+        client = mock.Mock()
+        registries = {
+            "registry.test": mock.Mock(registry="registry.test"),
+            "private.test": mock.Mock(registry="private.test"),
+        }
+
+        def for_registry(registry):
+            try:
+                return registries[registry]
+            except KeyError:
+                raise UnknownRegistry(registry)
+
+        with mock.patch.object(
+            DockerClient, "for_registry", side_effect=for_registry
+        ), mock.patch.multiple(
+            IMAGES,
+            CONFIG=mock.DEFAULT,
+            image_exists=mock.DEFAULT,
+            image_exists_in_registry=mock.DEFAULT,
+            pin_buildargs=mock.Mock(side_effect=lambda text, buildargs: buildargs),
+            build_image=mock.DEFAULT,
+            push_image=mock.DEFAULT,
+            pull_image=mock.DEFAULT,
+            select_builder=mock.Mock(return_value=("remote", client)),
+            image_summary=mock.Mock(return_value={}),
+            write_build_report=mock.DEFAULT,
+        ) as mocks:
+            mocks["CONFIG"].DOCKER.PLATFORMS = []
+            mocks["CONFIG"].DOCKER.SQUASH_STAGES = []
+            mocks["CONFIG"].DOCKER.STAGE_COMPRESSION = {}
+            # the base stage was only built locally, tools is in a private registry.
+            mocks["image_exists"].side_effect = lambda name: name.endswith(self.BASE_TAG)
+            mocks["image_exists_in_registry"].side_effect = (
+                lambda repository, tag: repository == "private.test/tools"
+            )
+            mocks.update(client=client, registries=registries, context=str(tmp_path))
+            yield mocks
+
+    def build(self, mocks, tag=BASE_TAG):
+        return build_image_if_needed(
+            self.REPOSITORY,
+            self.TAG,
+            context=mocks["context"],
+            cache_key="key",
+            buildargs={"FROM_REPOSITORY": self.REPOSITORY, "FROM_TAG": tag},
+        )
+
+    def test_push_parents(self, mocks):
+        client = mocks["client"]
+        assert self.build(mocks)
+
+        # builder is logged in once to each configured registry
+        for registry_client in mocks["registries"].values():
+            registry_client.login.assert_called_once_with(client)
+        assert mocks["push_image"].call_args_list == [
+            mock.call(self.REPOSITORY, self.BASE_TAG),
+            mock.call(self.REPOSITORY, self.TAG, client=client),
+        ]
+        assert mocks["build_image"].call_args[1]["client"] is client
+        mocks["pull_image"].assert_called_once_with(self.REPOSITORY, self.TAG)
+        assert mocks["write_build_report"].call_args[0][0]["builder"] == "remote"
+
+    def test_parent_in_registry(self, mocks):
+        mocks["image_exists_in_registry"].side_effect = lambda repository, tag: tag != self.TAG
+        assert self.build(mocks)
+        mocks["push_image"].assert_called_once_with(
+            self.REPOSITORY, self.TAG, client=mocks["client"]
+        )
+
+    def test_pinned_parent(self, mocks):
+        """
+        Parents pinned to a digest were pushed or pulled with it, they're in the registry.
+        """
+        assert self.build(mocks, f"{self.BASE_TAG}@sha256:base")
+        assert mock.call(self.REPOSITORY, self.BASE_TAG) not in (
+            mocks["image_exists_in_registry"].call_args_list
+        )
+        mocks["push_image"].assert_called_once_with(
+            self.REPOSITORY, self.TAG, client=mocks["client"]
+        )
+
+    def test_missing_parent(self, mocks):
+        mocks["image_exists"].side_effect = lambda name: False
+        with pytest.raises(ExecuteFailed, match=f"{self.REPOSITORY}:{self.BASE_TAG}"):
+            self.build(mocks)
+        mocks["build_image"].assert_not_called()
+
+
 class TestParseRegistry:
     def test_parse_repository(self):
         assert parse_registry("foo.bar.com/test/image") == "foo.bar.com"
@@ -266,6 +817,13 @@ class TestParseRegistry:
         assert parse_registry("foo.bar.com") == "foo.bar.com"
         assert parse_registry("192.168.1.1") == "192.168.1.1"
 
+    def test_parse_port(self):
+        assert parse_registry("registry:5000/test/image") == "registry:5000"
+        assert parse_registry("foo.bar.com:5000/test_image") == "foo.bar.com:5000"
+        assert parse_registry("192.168.1.1:5000/test_image") == "192.168.1.1:5000"
+        assert parse_registry("localhost/test_image") == "localhost"
+        assert parse_registry("localhost:5000/test_image") == "localhost:5000"
+
     def test_parse_no_registry(self):
         """
         If there is no hostname in the image name then the default repository is used.
@@ -277,6 +835,15 @@ class TestParseRegistry:
         assert parse_registry("imagenamewithouthostname/foo") == "docker.io"
         assert parse_registry("imagenamewithouthostname") == "docker.io"
 
+    def test_parse_tag(self):
+        """
+        A tag isn't mistaken for a port.
+        """
+        assert parse_registry("ubuntu:18.04") == "docker.io"
+        assert parse_registry("ubuntu:1804") == "docker.io"
+        assert parse_registry("localhost") == "docker.io"
+        assert parse_registry("registry:port/image") == "docker.io"
+
 
 class TestImageExistsInRegistry:
     """
@@ -409,3 +976,161 @@ class TestPull:
         Test a push with an error while silent=True
         """
         raise NotImplementedError
+
+
+def stage_tag(stage, index):
+    return f"{stage}-{index:064x}"
+
+
+class TestPruneImages:
+    """
+    Tests for pruning stage images
+    """
+
+    REPOSITORY = "registry.example.com/project"
+
+    @pytest.fixture
+    def mock_client(self):
+        repository = self.REPOSITORY
+        images = (
+            [
+                {
+                    "Id": f"python{i}",
+                    "Created": i,
+                    "Size": 100 * (i + 1),
+                    "RepoTags": [f"{repository}:{stage_tag('python', i)}"],
+                }
+                for i in range(4)
+            ]
+            + [
+                {
+                    "Id": f"npm{i}",
+                    "Created": i,
+                    "Size": 100,
+                    "RepoTags": [f"{repository}:{stage_tag('npm', i)}"],
+                }
+                for i in range(2)
+            ]
+            + [
+                # tags that aren't stage images or are in another repository are ignored
+                {"Id": "latest", "Created": 0, "Size": 0, "RepoTags": [f"{repository}:latest"]},
+                {
+                    "Id": "other",
+                    "Created": 0,
+                    "Size": 0,
+                    "RepoTags": [f"other:{stage_tag('python', 0)}"],
+                },
+            ]
+        )
+        with mock.patch("ixian_docker.modules.docker.utils.images.docker_client") as docker_client:
+            client = docker_client.return_value
+            client.api.images.return_value = images
+            client.api.containers.return_value = [{"ImageID": "python0"}]
+            client.api.remove_image.side_effect = lambda name: [
+                {"Untagged": name},
+                {"Deleted": f"python{name[-1]}"},
+            ]
+            yield client
+
+    @pytest.fixture
+    def mock_registry(self):
+        """
+        Registry with the same stage images as the local images, ``created`` is the last digit.
+        """
+        with mock.patch.object(DockerClient, "for_registry") as for_registry:
+            registry_client = for_registry.return_value
+            registry_client.list_tags.return_value = [stage_tag("python", i) for i in range(4)] + [
+                stage_tag("npm", i) for i in range(2)
+            ]
+            registry_client.tags_created.side_effect = lambda repository, tags: {
+                tag: int(tag[-1]) for tag in tags
+            }
+            yield for_registry
+
+    def test_stage_images(self, mock_client):
+        stages = stage_images(self.REPOSITORY)
+        assert sorted(stages) == ["npm", "python"]
+        assert [tag for tag, *_ in stages["python"]] == [
+            stage_tag("python", i) for i in [3, 2, 1, 0]
+        ]
+
+    def test_select_images_to_prune(self, mock_client):
+        stages = stage_images(self.REPOSITORY)
+        assert select_images_to_prune(stages, 2) == [
+            stage_tag("python", 1),
+            stage_tag("python", 0),
+        ]
+        # images in use are kept
+        assert select_images_to_prune(stages, 1, {"python0"}) == [
+            stage_tag("python", 2),
+            stage_tag("python", 1),
+            stage_tag("npm", 0),
+        ]
+
+    def test_prune_images(self, mock_client):
+        pruned, reclaimed = prune_images(self.REPOSITORY, 2)
+        assert pruned == [stage_tag("python", 1)]
+        # size of the deleted image
+        assert reclaimed == 200
+        mock_client.api.remove_image.assert_called_once_with(
+            f"{self.REPOSITORY}:{stage_tag('python', 1)}"
+        )
+        mock_client.df.assert_not_called()
+
+    def test_prune_images_untagged(self, mock_client):
+        """
+        Images that are only untagged don't count toward the space reclaimed.
+        """
+        mock_client.api.remove_image.side_effect = lambda name: [{"Untagged": name}]
+        pruned, reclaimed = prune_images(self.REPOSITORY, 2)
+        assert pruned == [stage_tag("python", 1)]
+        assert reclaimed == 0
+
+    def test_prune_images_registry(self, mock_client, mock_registry):
+        for_registry = mock_registry
+        prune_images(self.REPOSITORY, 2, registry=True)
+        for_registry.assert_called_once_with("registry.example.com")
+        for_registry.return_value.delete_tags.assert_called_once_with(
+            self.REPOSITORY,
+            [stage_tag("python", 1)],
+            # python0 is in use by a container
+            keep=[stage_tag("python", i) for i in [3, 2, 0]]
+            + [stage_tag("npm", i) for i in [1, 0]],
+        )
+
+    def test_prune_images_registry_platforms(self, mock_client, mock_registry):
+        """
+        Per-platform tags are deleted from the registry with the tag they were built for.
+        """
+        for_registry = mock_registry
+        with mock.patch(f"{IMAGES}.CONFIG") as config:
+            config.DOCKER.PLATFORMS = ["linux/amd64", "linux/arm64"]
+            prune_images(self.REPOSITORY, 2, registry=True)
+        tag = stage_tag("python", 1)
+        [[[repository, deleted], options]] = for_registry.return_value.delete_tags.call_args_list
+        assert deleted == [tag, f"{tag}-amd64", f"{tag}-arm64"]
+        assert f"{stage_tag('npm', 0)}-arm64" in options["keep"]
+
+    def test_prune_images_registry_only(self, mock_client, mock_registry):
+        """
+        Tags beyond the most recent of each stage in the registry are deleted even if they were
+        never pulled locally. Tags kept locally are kept.
+        """
+        registry_client = mock_registry.return_value
+        registry_tags = [stage_tag("python", i) for i in [0, 1, 4, 5, 6]]
+        registry_client.list_tags.return_value = registry_tags + ["latest"]
+        prune_images(self.REPOSITORY, 2, registry=True)
+        registry_client.tags_created.assert_called_once_with(self.REPOSITORY, registry_tags)
+        [[[repository, deleted], options]] = registry_client.delete_tags.call_args_list
+        # python0 is kept locally, python1 was pruned locally.
+        assert deleted == [stage_tag("python", 4), stage_tag("python", 1)]
+
+    def test_prune_images_registry_recent(self, mock_client, mock_registry):
+        """
+        Tags pruned locally are kept in the registry while they're among its most recent.
+        """
+        registry_client = mock_registry.return_value
+        registry_client.list_tags.return_value = [stage_tag("python", i) for i in [0, 1]]
+        pruned, reclaimed = prune_images(self.REPOSITORY, 2, registry=True)
+        assert pruned == [stage_tag("python", 1)]
+        registry_client.delete_tags.assert_not_called()
@@ -0,0 +1,120 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import tarfile
+from unittest import mock
+
+from ixian_docker.modules.docker.utils import layers
+from ixian_docker.modules.docker.utils.layers import image_layer_files, read_layer, wasted_files
+
+
+def make_tar(files):
+    """
+    Create a tar in memory.
+    :param files: dict mapping name to bytes, or None for a directory
+    :return: bytes
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            if data is None:
+                info.type = tarfile.DIRTYPE
+                archive.addfile(info)
+            else:
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+# apt lists downloaded in one layer and removed in the next, and a file overwritten.
+LAYERS = [
+    {
+        "var/": None,
+        "var/lib/apt/lists/": None,
+        "var/lib/apt/lists/archive_Packages": b"x" * 1000,
+        "var/lib/apt/lists/archive_Release": b"x" * 10,
+        "usr/bin/tool": b"x" * 100,
+        "etc/config": b"x" * 5,
+    },
+    {"var/lib/apt/.wh.lists": b"", "usr/bin/tool": b"y" * 120},
+    {"etc/.wh..wh..opq": b"", "etc/other": b"z"},
+]
+
+
+class TestLayerFiles:
+    def test_read_layer(self):
+        files, deleted, opaque = read_layer(io.BytesIO(make_tar(LAYERS[0])))
+        assert files == {
+            "/var/lib/apt/lists/archive_Packages": 1000,
+            "/var/lib/apt/lists/archive_Release": 10,
+            "/usr/bin/tool": 100,
+            "/etc/config": 5,
+        }
+        assert deleted == [] and opaque == []
+
+        files, deleted, opaque = read_layer(io.BytesIO(make_tar(LAYERS[1])))
+        assert deleted == ["/var/lib/apt/lists"]
+
+        files, deleted, opaque = read_layer(io.BytesIO(make_tar(LAYERS[2])))
+        assert opaque == ["/etc"]
+        assert files == {"/etc/other": 1}
+
+    def test_image_layer_files(self):
+        """
+        Layers are read from ``docker save`` output, in the order of the manifest.
+        """
+        saved = make_tar(
+            {
+                "abc/layer.tar": make_tar(LAYERS[1]),
+                "def/layer.tar": make_tar(LAYERS[0]),
+                "manifest.json": json.dumps(
+                    [{"Layers": ["def/layer.tar", "abc/layer.tar"]}]
+                ).encode(),
+            }
+        )
+        with mock.patch.object(layers, "docker_client") as docker_client:
+            image = docker_client.return_value.images.get.return_value
+            image.save.return_value = iter([saved[:1000], saved[1000:]])
+            result = image_layer_files("image:tag")
+        assert [files for files, *_ in result] == [
+            read_layer(io.BytesIO(make_tar(LAYERS[0])))[0],
+            read_layer(io.BytesIO(make_tar(LAYERS[1])))[0],
+        ]
+
+
+class TestWastedFiles:
+    def test_wasted_files(self):
+        image_layers = [read_layer(io.BytesIO(make_tar(layer))) for layer in LAYERS]
+        assert wasted_files(image_layers) == [
+            {
+                "path": "/var/lib/apt/lists/archive_Packages",
+                "size": 1000,
+                "layers": [0],
+                "reason": "deleted",
+            },
+            {"path": "/usr/bin/tool", "size": 100, "layers": [0], "reason": "duplicated"},
+            {
+                "path": "/var/lib/apt/lists/archive_Release",
+                "size": 10,
+                "layers": [0],
+                "reason": "deleted",
+            },
+            {"path": "/etc/config", "size": 5, "layers": [0], "reason": "deleted"},
+        ]
+
+    def test_no_waste(self):
+        assert wasted_files([({"/a": 1}, [], []), ({"/b": 2}, ["/c"], [])]) == []
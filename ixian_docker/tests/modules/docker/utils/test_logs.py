@@ -0,0 +1,118 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import logging
+from unittest import mock
+
+import pytest
+
+from ixian_docker.modules.docker.utils import logs
+from ixian_docker.modules.docker.utils.logs import RingBuffer, StageLog, log_name
+
+
+@pytest.fixture
+def mock_config(tmp_path):
+    with mock.patch.object(logs, "CONFIG") as config:
+        config.DOCKER.LOG_DIR = str(tmp_path / "logs")
+        config.DOCKER.LOG_BUFFER_SIZE = 10
+        config.DOCKER.LOG_TAIL = 2
+        yield config
+
+
+class TestLogName:
+    def test_log_name(self):
+        assert log_name(f"registry.example.com/project:python-{'0' * 64}") == "python"
+        assert log_name(f"project:python-{'0' * 64}-arm64") == "python-arm64"
+        assert log_name("localhost:5000/project") == "project"
+        assert log_name("image") == "image"
+
+
+class TestRingBuffer:
+    def test_bounded(self):
+        """
+        Oldest lines are dropped once the buffer is over its size.
+        """
+        buffer = RingBuffer(10)
+        for line in ["aaaa", "bbbb", "cccc", "dd"]:
+            buffer.append(line)
+        assert buffer.tail() == ["bbbb", "cccc", "dd"]
+        assert buffer.used == 10
+        assert buffer.tail(2) == ["cccc", "dd"]
+        assert buffer.tail(0) == []
+
+    def test_large_line(self):
+        """
+        The last line is always kept, even if it's larger than the buffer.
+        """
+        buffer = RingBuffer(10)
+        buffer.append("a")
+        buffer.append("b" * 20)
+        assert buffer.tail() == ["b" * 20]
+
+
+class TestStageLog:
+    LINES = ["Step 1/2 : FROM base", "installing", "Step 2/2 : RUN make", "done"]
+
+    def test_log_file(self, mock_config, tmp_path):
+        """
+        Every line is written to the log file, only the tail is kept in memory.
+        """
+        with StageLog("python", stream=io.StringIO()) as log:
+            for line in self.LINES:
+                log.write(line)
+            log.write(None)
+        assert (tmp_path / "logs" / "python.log").read_text() == "\n".join(self.LINES) + "\n"
+        assert log.buffer.tail() == ["done"]
+
+    def test_steps(self, mock_config, caplog):
+        """
+        Only build steps are printed when the tail isn't drawn. Output isn't logged, loggers may
+        print to the terminal.
+        """
+        stream = io.StringIO()
+        with caplog.at_level(logging.DEBUG):
+            with StageLog("python", interactive=False, stream=stream) as log:
+                for line in self.LINES:
+                    log.write(line)
+        assert caplog.records == []
+        assert stream.getvalue() == (
+            "[python] Step 1/2 : FROM base\n[python] Step 2/2 : RUN make\n"
+        )
+
+    def test_rolling_tail(self, mock_config):
+        """
+        The tail is redrawn in place and cleared when the log is closed.
+        """
+        mock_config.DOCKER.LOG_BUFFER_SIZE = 1024
+        stream = io.StringIO()
+        with mock.patch.object(logs, "REDRAW_INTERVAL", 0):
+            with StageLog("npm", interactive=True, stream=stream) as log:
+                for line in ["one", "two", "three"]:
+                    log.write(line)
+        up = logs.CURSOR_UP
+        assert stream.getvalue() == (
+            "[npm] one\n"
+            f"{up.format(1)}{logs.CLEAR}[npm] one\n[npm] two\n"
+            f"{up.format(2)}{logs.CLEAR}[npm] two\n[npm] three\n"
+            f"{up.format(2)}{logs.CLEAR}"
+        )
+
+    def test_report_failure(self, mock_config):
+        with StageLog("python", interactive=False, stream=io.StringIO()) as log:
+            log.write("aaaa")
+            log.write("error")
+            with mock.patch.object(logs.logger, "error") as error:
+                log.report_failure()
+        assert [args[0] for args, kwargs in error.call_args_list][1:] == ["aaaa", "error"]
@@ -0,0 +1,183 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+import pytest
+
+from ixian.exceptions import ExecuteFailed
+from ixian_docker.modules.docker.utils import platforms
+from ixian_docker.modules.docker.utils.labels import PROJECT_LABEL
+from ixian_docker.modules.docker.utils.platforms import (
+    build_buildx,
+    build_platforms,
+    buildx_command,
+    native_platform,
+    output_args,
+    platform_arch,
+    platform_tag,
+)
+
+REPOSITORY = "registry.example.com/project"
+PLATFORMS = ["linux/amd64", "linux/arm64"]
+
+
+@pytest.fixture
+def mock_config():
+    with mock.patch.object(platforms, "CONFIG") as config:
+        config.PROJECT_NAME = "project"
+        config.DOCKER.BUILDX_BUILDER = None
+        yield config
+
+
+@pytest.fixture
+def mock_buildx(mock_config):
+    with mock.patch.object(
+        platforms, "run_buildx", return_value=0
+    ) as run_buildx, mock.patch.object(platforms.subprocess, "call", return_value=0) as call:
+        yield run_buildx, call
+
+
+class TestPlatformTag:
+    def test_platform_arch(self):
+        assert platform_arch("linux/amd64") == "amd64"
+        assert platform_arch("linux/arm/v7") == "arm-v7"
+
+    def test_platform_tag(self):
+        assert platform_tag("python-abc", "linux/arm64") == "python-abc-arm64"
+
+    @pytest.mark.parametrize(
+        "machine,expected",
+        [("x86_64", "linux/amd64"), ("arm64", "linux/arm64"), ("armv7l", "linux/arm/v7")],
+    )
+    def test_native_platform(self, machine, expected):
+        with mock.patch.object(platforms.platform, "machine", return_value=machine):
+            assert native_platform() == expected
+
+
+class TestBuildxCommand:
+    def test_command(self, mock_config):
+        mock_config.DOCKER.BUILDX_BUILDER = "multiarch"
+        command = buildx_command(
+            "Dockerfile.python",
+            f"{REPOSITORY}:python-abc-arm64",
+            "linux/arm64",
+            "/srv/project",
+            buildargs={"BASE_IMAGE": "base"},
+            labels={"ixian.cache_key": "key"},
+            target="build",
+            forcerm=True,
+        )
+        assert command == [
+            "docker",
+            "buildx",
+            "build",
+            "--platform",
+            "linux/arm64",
+            "--push",
+            "-t",
+            f"{REPOSITORY}:python-abc-arm64",
+            "--builder",
+            "multiarch",
+            "-f",
+            "/srv/project/Dockerfile.python",
+            "--target",
+            "build",
+            "--build-arg",
+            "BASE_IMAGE=base",
+            "--label",
+            "ixian.cache_key=key",
+            "/srv/project",
+        ]
+
+
+class TestOutputArgs:
+    IMAGE = f"{REPOSITORY}:python-abc"
+
+    def test_default(self):
+        assert output_args(self.IMAGE) == ["--push", "-t", self.IMAGE]
+
+    def test_gzip(self):
+        assert output_args(self.IMAGE, "gzip") == [
+            "--output",
+            f"type=image,name={self.IMAGE},push=true,compression=gzip,force-compression=true",
+        ]
+
+    @pytest.mark.parametrize("compression", ["zstd", "estargz"])
+    def test_oci_compression(self, compression):
+        assert output_args(self.IMAGE, compression) == [
+            "--output",
+            f"type=image,name={self.IMAGE},push=true,compression={compression},"
+            "force-compression=true,oci-mediatypes=true",
+        ]
+
+    def test_unknown(self):
+        with pytest.raises(ExecuteFailed, match="lz4"):
+            output_args(self.IMAGE, "lz4")
+
+    def test_native_command(self, mock_config):
+        command = buildx_command("Dockerfile", self.IMAGE, None, "/srv", compression="zstd")
+        assert command[:4] == ["docker", "buildx", "build", "--output"]
+        assert "--platform" not in command
+
+
+class TestBuildBuildx:
+    def test_build(self, mock_buildx):
+        run_buildx, call = mock_buildx
+        build_buildx("Dockerfile", f"{REPOSITORY}:python-abc", "/srv", compression="estargz")
+        [(command, platform, name)] = [args for args, kwargs in run_buildx.call_args_list]
+        assert platform is None
+        assert name == "python-abc"
+        assert "compression=estargz" in command[4]
+        assert f"{PROJECT_LABEL}=project" in command
+
+    def test_build_fails(self, mock_buildx):
+        run_buildx, call = mock_buildx
+        run_buildx.return_value = 1
+        with pytest.raises(ExecuteFailed):
+            build_buildx("Dockerfile", f"{REPOSITORY}:python-abc", "/srv", compression="zstd")
+
+
+class TestBuildPlatforms:
+    def test_build(self, mock_buildx):
+        run_buildx, call = mock_buildx
+        images = build_platforms("Dockerfile", REPOSITORY, "python-abc", PLATFORMS, "/srv")
+        assert images == [f"{REPOSITORY}:python-abc-amd64", f"{REPOSITORY}:python-abc-arm64"]
+
+        # each platform is built, labeled with the project
+        assert [args[1] for args, kwargs in run_buildx.call_args_list] == PLATFORMS
+        assert [args[2] for args, kwargs in run_buildx.call_args_list] == [
+            "python-abc-amd64",
+            "python-abc-arm64",
+        ]
+        for args, kwargs in run_buildx.call_args_list:
+            assert f"{PROJECT_LABEL}=project" in args[0]
+
+        # manifest list is created from the platform images
+        call.assert_called_once_with(
+            ["docker", "buildx", "imagetools", "create", "-t", f"{REPOSITORY}:python-abc"] + images
+        )
+
+    def test_platform_fails(self, mock_buildx):
+        run_buildx, call = mock_buildx
+        run_buildx.side_effect = lambda command, platform, name: int(platform == "linux/arm64")
+        with pytest.raises(ExecuteFailed, match="linux/arm64"):
+            build_platforms("Dockerfile", REPOSITORY, "python-abc", PLATFORMS, "/srv")
+        call.assert_not_called()
+
+    def test_manifest_fails(self, mock_buildx):
+        run_buildx, call = mock_buildx
+        call.return_value = 1
+        with pytest.raises(ExecuteFailed):
+            build_platforms("Dockerfile", REPOSITORY, "python-abc", PLATFORMS, "/srv")
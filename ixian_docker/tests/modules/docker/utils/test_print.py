@@ -0,0 +1,139 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ixian_docker.modules.docker.utils.print import (
+    format_layer_command,
+    format_advice,
+    format_build_comparison,
+    format_duration,
+    format_layer_report,
+    format_wasted_files,
+    print_docker_transfer_events,
+)
+from ixian_docker.tests import event_streams
+
+
+class TestLayerReport:
+    LAYERS = [
+        {
+            "id": "sha256:abc",
+            "created_by": "/bin/sh -c pip install --no-index -r requirements.txt",
+            "size": 3 * 2 ** 20,
+        },
+        {"id": "<missing>", "created_by": "/bin/sh -c #(nop) WORKDIR /srv", "size": 0},
+        {"id": "<missing>", "created_by": "/bin/sh -c #(nop) ADD file:123 in /", "size": 2048},
+    ]
+
+    def test_format_layer_command(self):
+        assert format_layer_command('/bin/sh -c #(nop)  CMD ["bash"]') == 'CMD ["bash"]'
+        assert format_layer_command("/bin/sh -c apt-get update") == "RUN apt-get update"
+        assert format_layer_command("/bin/sh -c " + "x" * 100, width=10) == "RUN xxx..."
+
+    def test_format_layer_report(self):
+        assert format_layer_report("image:tag", self.LAYERS, build_time=12.34) == [
+            "image:tag",
+            "size: 3.00MB  layers: 3  build time: 12.3s",
+            "    3.00MB  RUN pip install --no-index -r requirements.txt",
+            "        0B  WORKDIR /srv",
+            "    2.00kB  ADD file:123 in /",
+        ]
+
+    def test_format_layer_report_no_build(self):
+        assert format_layer_report("image:tag", [])[:2] == ["image:tag", "size: 0B  layers: 0"]
+
+
+class TestBuildComparison:
+    PREVIOUS = {"size": 10 * 2 ** 20, "layers": 6, "timings": {"build": 130.0}}
+    CURRENT = {"size": 8 * 2 ** 20, "layers": 3, "timings": {"build": 65.0}}
+
+    def test_format(self):
+        assert format_build_comparison(self.CURRENT, self.PREVIOUS) == [
+            "compared to previous build  size: 10.00MB -> 8.00MB (-2.00MB)  "
+            "layers: 6 -> 3 (-3)  build time: 2m10s -> 1m05s (-1m05s)"
+        ]
+
+    def test_increase(self):
+        assert format_build_comparison(self.PREVIOUS, self.CURRENT)[0].endswith(
+            "build time: 1m05s -> 2m10s (+1m05s)"
+        )
+
+    def test_missing(self):
+        """
+        Measures missing from either build are skipped.
+        """
+        assert format_build_comparison({"layers": 3}, self.PREVIOUS) == [
+            "compared to previous build  layers: 6 -> 3 (-3)"
+        ]
+        assert format_build_comparison({}, self.PREVIOUS) == []
+
+
+class TestTransferEvents:
+    def test_pull_bytes(self, capsys):
+        assert print_docker_transfer_events(event_streams.PULL_SUCCESSFUL) == 2787134
+
+    def test_already_present(self, capsys):
+        assert print_docker_transfer_events(event_streams.PULL_ALREADY_PRESENT) == 0
+
+
+class TestWastedFiles:
+    WASTED = [
+        {"path": "/var/lib/apt/lists/a", "size": 2048, "layers": [1], "reason": "deleted"},
+        {"path": "/usr/bin/tool", "size": 100, "layers": [0, 2], "reason": "duplicated"},
+    ]
+
+    def test_format(self):
+        assert format_wasted_files(self.WASTED) == [
+            "wasted: 2.10kB  files: 2",
+            "    2.00kB  deleted     /var/lib/apt/lists/a  (layers 1)",
+            "      100B  duplicated  /usr/bin/tool  (layers 0,2)",
+        ]
+
+    def test_limit(self):
+        assert format_wasted_files(self.WASTED, limit=1)[-1] == "... 1 more"
+
+
+class TestAdvice:
+    def test_format_duration(self):
+        assert format_duration(4.23) == "4.2s"
+        assert format_duration(80) == "1m20s"
+
+    def test_format(self):
+        issues = [
+            {
+                "rule": "context-copy-before-install",
+                "kind": "cache",
+                "instruction": {"line": 8, "instruction": "ADD", "arguments": ". /srv"},
+                "message": "Build context is copied before dependencies are installed.",
+                "cost": 90,
+            },
+            {
+                "rule": "debug-layer",
+                "kind": "size",
+                "instruction": {"line": 4, "instruction": "RUN", "arguments": "echo hi"},
+                "message": "RUN only echoes.",
+                "cost": None,
+            },
+        ]
+        assert format_advice("Dockerfile", issues) == [
+            "Dockerfile: 2 issues",
+            "  line 8: context-copy-before-install (cache)  ~1m30s per rebuild",
+            "    ADD . /srv",
+            "    Build context is copied before dependencies are installed.",
+            "  line 4: debug-layer (size)",
+            "    RUN echo hi",
+            "    RUN only echoes.",
+        ]
+
+    def test_no_issues(self):
+        assert format_advice("Dockerfile", []) == ["Dockerfile: no issues"]
@@ -0,0 +1,82 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from unittest import mock
+
+import docker
+import pytest
+
+from ixian_docker.modules.docker.utils import remote_builders
+from ixian_docker.modules.docker.utils.remote_builders import (
+    LOCAL_BUILDER,
+    UnknownBuilder,
+    builder_client,
+    select_builder,
+)
+
+# Set to the DOCKER_HOST of a second docker daemon to test building with it as a remote builder.
+# e.g. a second local dockerd: tcp://127.0.0.1:2375
+REMOTE_DOCKER_HOST = os.environ.get("IXIAN_TEST_REMOTE_DOCKER_HOST")
+
+
+@pytest.fixture
+def mock_builders():
+    loads = {"one": 3, "two": 1, "three": None}
+    clients = {name: mock.Mock(builder_name=name) for name in loads}
+
+    with mock.patch.object(remote_builders, "CONFIG") as config, mock.patch.object(
+        remote_builders, "builder_client", side_effect=clients.get
+    ), mock.patch.object(
+        remote_builders, "builder_load", side_effect=lambda client: loads[client.builder_name]
+    ):
+        config.DOCKER.STAGE_BUILDERS = {
+            "pool": ["one", "two", "three"],
+            "unavailable": ["three"],
+            "single": "one",
+        }
+        yield clients
+
+
+class TestSelectBuilder:
+    def test_local(self, mock_builders):
+        builder, client = select_builder("python")
+        assert builder == LOCAL_BUILDER
+
+    def test_single(self, mock_builders):
+        assert select_builder("single") == ("one", mock_builders["one"])
+
+    def test_least_loaded(self, mock_builders):
+        assert select_builder("pool") == ("two", mock_builders["two"])
+
+    def test_pool_unavailable(self, mock_builders):
+        builder, client = select_builder("unavailable")
+        assert builder == LOCAL_BUILDER
+
+    def test_unknown_builder(self):
+        with mock.patch.object(remote_builders, "CONFIG") as config:
+            config.DOCKER.BUILDERS = {}
+            with pytest.raises(UnknownBuilder):
+                builder_client("missing")
+
+
+@pytest.mark.skipif(not REMOTE_DOCKER_HOST, reason="IXIAN_TEST_REMOTE_DOCKER_HOST is not set")
+class TestRemoteBuilder:
+    def test_builder_load(self):
+        with mock.patch.object(remote_builders, "CONFIG") as config:
+            config.DOCKER.BUILDERS = {"remote": {"base_url": REMOTE_DOCKER_HOST}}
+            remote_builders.BUILDER_CLIENTS.pop("remote", None)
+            client = builder_client("remote")
+        assert isinstance(client, docker.DockerClient)
+        assert remote_builders.builder_load(client) is not None
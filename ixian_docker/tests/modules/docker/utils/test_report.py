@@ -0,0 +1,68 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+import pytest
+from docker.errors import ImageNotFound
+
+from ixian_docker.modules.docker.utils import report
+from ixian_docker.modules.docker.utils.report import (
+    LOCAL_HIT,
+    image_summary,
+    read_build_report,
+    timed,
+    write_build_report,
+)
+
+
+@pytest.fixture
+def mock_report(tmp_path):
+    path = str(tmp_path / "builder" / "build_report.jsonl")
+    with mock.patch.object(report, "CONFIG") as config:
+        config.DOCKER.BUILD_REPORT = path
+        yield config
+
+
+class TestBuildReport:
+    def test_timed(self):
+        timings = {}
+        with mock.patch.object(report.time, "time", side_effect=[1, 3, 10, 11]):
+            with timed(timings, "pull"):
+                pass
+            # time is added if the phase runs again
+            with timed(timings, "pull"):
+                pass
+        assert timings == {"pull": 3}
+
+    def test_write(self, mock_report):
+        write_build_report({"stage": "python", "decision": LOCAL_HIT})
+        write_build_report({"stage": "npm", "decision": LOCAL_HIT})
+        records = read_build_report()
+        assert [record["stage"] for record in records] == ["python", "npm"]
+        assert all("timestamp" in record for record in records)
+
+    def test_disabled(self, mock_report):
+        mock_report.DOCKER.BUILD_REPORT = None
+        write_build_report({"stage": "python"})
+        assert read_build_report("/nonexistent/build_report.jsonl") == []
+
+    @mock.patch.object(report, "docker_client")
+    def test_image_summary(self, docker_client):
+        image = docker_client.return_value.images.get.return_value
+        image.attrs = {"Size": 1024, "RootFS": {"Layers": ["sha256:a", "sha256:b"]}}
+        assert image_summary("image:tag") == {"size": 1024, "layers": 2}
+
+        docker_client.return_value.images.get.side_effect = ImageNotFound("missing")
+        assert image_summary("image:tag") == {"size": None, "layers": None}
@@ -0,0 +1,118 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from unittest import mock
+
+import pytest
+
+from ixian_docker.modules.docker.utils import spans
+from ixian_docker.modules.docker.utils.spans import (
+    STATUS_ERROR,
+    STATUS_OK,
+    export_spans,
+    otlp_request,
+    set_span_attributes,
+    span,
+)
+
+
+@span("outer", "name")
+def outer(name, fail=False):
+    set_span_attributes(decision="built")
+    return inner(fail)
+
+
+@span("inner")
+def inner(fail):
+    if fail:
+        raise ValueError("failed")
+    return "result"
+
+
+@pytest.fixture
+def mock_spans(tmp_path):
+    path = str(tmp_path / "spans.jsonl")
+    with mock.patch.object(spans, "SPANS", []) as records, mock.patch.object(
+        spans, "spans_config", return_value=(path, None)
+    ) as config:
+        yield records, config, path
+
+
+class TestSpan:
+    def test_disabled(self):
+        with mock.patch.object(spans, "SPANS", []) as records, mock.patch.object(
+            spans, "spans_config", return_value=(None, None)
+        ):
+            assert outer("image") == "result"
+        assert records == []
+
+    def test_nested(self, mock_spans):
+        records, config, path = mock_spans
+        assert outer("image") == "result"
+
+        # spans are recorded when they finish
+        inner_span, outer_span = records
+        assert inner_span["name"] == "inner"
+        assert inner_span["parent_span_id"] == outer_span["span_id"]
+        assert outer_span["parent_span_id"] is None
+        assert outer_span["attributes"] == {"name": "image", "decision": "built"}
+        assert outer_span["start"] <= inner_span["start"] <= inner_span["end"] <= outer_span["end"]
+
+    def test_error(self, mock_spans):
+        records, config, path = mock_spans
+        with pytest.raises(ValueError):
+            outer("image", fail=True)
+        assert [record["status"] for record in records] == [STATUS_ERROR, STATUS_ERROR]
+        assert records[0]["message"] == "ValueError: failed"
+        assert spans.active_spans() == []
+
+
+class TestExport:
+    def test_otlp(self, mock_spans):
+        records, config, path = mock_spans
+        outer("image")
+        request = otlp_request()
+        [resource_spans] = request["resourceSpans"]
+        [scope_spans] = resource_spans["scopeSpans"]
+        inner_span, outer_span = scope_spans["spans"]
+        assert inner_span["parentSpanId"] == outer_span["spanId"]
+        assert "parentSpanId" not in outer_span
+        assert outer_span["traceId"] == inner_span["traceId"]
+        assert outer_span["status"] == {"code": STATUS_OK}
+        assert outer_span["attributes"] == [
+            {"key": "name", "value": {"stringValue": "image"}},
+            {"key": "decision", "value": {"stringValue": "built"}},
+        ]
+
+    def test_file(self, mock_spans):
+        records, config, path = mock_spans
+        outer("image")
+        export_spans()
+        outer("image")
+        export_spans()
+        with open(path) as file:
+            lines = [json.loads(line) for line in file]
+        # a line is appended for each export
+        assert len(lines) == 2
+        assert records == []
+
+    def test_endpoint(self, mock_spans):
+        records, config, path = mock_spans
+        config.return_value = (None, "http://collector:4318/v1/traces")
+        outer("image")
+        request = otlp_request()
+        with mock.patch.object(spans.requests, "post") as post:
+            export_spans()
+        post.assert_called_once_with("http://collector:4318/v1/traces", json=request, timeout=10)
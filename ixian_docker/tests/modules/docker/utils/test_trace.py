@@ -0,0 +1,105 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+from unittest import mock
+
+import pytest
+
+from ixian_docker.modules.docker.utils import trace
+from ixian_docker.modules.docker.utils.print import format_trace_summary
+from ixian_docker.modules.docker.utils.trace import (
+    TRACE_FLAG,
+    endpoint,
+    summarize_trace,
+    trace_client,
+    trace_response,
+)
+
+
+def mock_response(method, path, latency, request_bytes=None, response_bytes=None):
+    response = mock.Mock(status_code=200, headers={})
+    response.elapsed = datetime.timedelta(seconds=latency)
+    response.request = mock.Mock(method=method, path_url=path, headers={})
+    if request_bytes is not None:
+        response.request.headers["Content-Length"] = str(request_bytes)
+    if response_bytes is not None:
+        response.headers["Content-Length"] = str(response_bytes)
+    return response
+
+
+@pytest.fixture
+def mock_trace():
+    with mock.patch.object(trace, "TRACE", []) as records:
+        yield records
+
+
+class TestEndpoint:
+    def test_object(self):
+        assert endpoint("/v1.40/images/foo:latest/json") == "/images/{name}/json"
+        assert endpoint("/v1.40/images/registry.com/a/foo:latest/json") == "/images/{name}/json"
+        assert (
+            endpoint("/v1.40/distribution/registry.com/foo:1/json") == "/distribution/{name}/json"
+        )
+        assert endpoint("/v1.40/images/registry.com/foo/push?tag=1") == "/images/{name}/push"
+        assert endpoint("/v1.40/images/foo:latest") == "/images/{name}"
+
+    def test_collection(self):
+        assert endpoint("/v1.40/images/json?all=1") == "/images/json"
+        assert endpoint("/v1.40/images/create?fromImage=foo") == "/images/create"
+        assert endpoint("/v1.40/build") == "/build"
+
+
+class TestTraceClient:
+    def test_disabled(self):
+        client = mock.Mock()
+        client.api.hooks = {"response": []}
+        with mock.patch.object(trace, "trace_enabled", return_value=False):
+            assert trace_client(client) is client
+        assert client.api.hooks["response"] == []
+
+    def test_flag(self):
+        client = mock.Mock()
+        client.api.hooks = {"response": []}
+        with mock.patch.object(trace.sys, "argv", ["ix", TRACE_FLAG, "build_image"]):
+            trace_client(client)
+            # hook is only installed once
+            trace_client(client)
+        assert client.api.hooks["response"] == [trace_response]
+
+
+class TestSummary:
+    def test_summarize(self, mock_trace):
+        trace_response(mock_response("GET", "/v1.40/images/a:1/json", 0.1, response_bytes=100))
+        trace_response(mock_response("GET", "/v1.40/images/b:1/json", 0.3, response_bytes=50))
+        trace_response(mock_response("POST", "/v1.40/build?t=a", 2.0, request_bytes=1000))
+
+        summary = summarize_trace()
+        assert [(group["method"], group["endpoint"]) for group in summary] == [
+            ("POST", "/build"),
+            ("GET", "/images/{name}/json"),
+        ]
+        assert summary[1]["count"] == 2
+        assert summary[1]["latency"] == pytest.approx(0.4)
+        assert summary[1]["max_latency"] == 0.3
+        assert summary[1]["response_bytes"] == 150
+        assert summary[0]["request_bytes"] == 1000
+
+    def test_format(self, mock_trace):
+        trace_response(mock_response("GET", "/v1.40/images/a:1/json", 0.25, response_bytes=100))
+        assert format_trace_summary(summarize_trace()) == [
+            "Docker API: 1 requests  time: 0.250s  sent: 0B  received: 100B",
+            " count     total       max   received  endpoint",
+            "     1    0.250s    0.250s       100B  GET /images/{name}/json",
+        ]
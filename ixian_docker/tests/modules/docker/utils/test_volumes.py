@@ -0,0 +1,180 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+import docker
+import pytest
+
+from ixian_docker.modules.docker.utils import volumes
+
+
+def mock_volume(name):
+    volume = mock.Mock()
+    volume.name = name
+    return volume
+
+
+@pytest.fixture
+def mock_volume_store(tmp_path):
+    """
+    Volume store with three managed volumes, used least recently first: old, mid, new.
+    """
+    with mock.patch.object(volumes, "CONFIG") as config, mock.patch.object(
+        volumes, "docker_client"
+    ) as docker_client:
+        config.PROJECT_NAME = "project"
+        config.DOCKER.VOLUME_USAGE_FILE = str(tmp_path / "volumes.json")
+        config.DOCKER.NAMED_VOLUMES = []
+        config.format.side_effect = lambda value: value.format(
+            PROJECT_NAME="project", PWD="/project"
+        )
+        client = docker_client.return_value
+        client.volumes.list.return_value = [mock_volume(name) for name in ["new", "old", "mid"]]
+        client.df.return_value = {
+            "Volumes": [
+                {"Name": "old", "UsageData": {"Size": 300, "RefCount": 0}},
+                {"Name": "mid", "UsageData": {"Size": 200, "RefCount": 0}},
+                {"Name": "new", "UsageData": {"Size": 100, "RefCount": 0}},
+                {"Name": "unmanaged", "UsageData": {"Size": 1000, "RefCount": 0}},
+            ]
+        }
+        for timestamp, name in enumerate(["old", "mid", "new"]):
+            with mock.patch.object(volumes.time, "time", return_value=timestamp):
+                volumes.touch_volume(name)
+        yield client
+
+
+class TestVolumeStore:
+    def test_create_volume(self, mock_volume_store):
+        volumes.create_volume("project.test", labels={"ixian.stage": "test"})
+        mock_volume_store.volumes.create.assert_called_once_with(
+            "project.test", labels={"ixian.stage": "test", "ixian.project": "project"}
+        )
+        assert "project.test" in volumes.read_volume_usage()
+
+    def test_evict_lru(self, mock_volume_store):
+        assert volumes.evict_volumes(350) == [("old", 300)]
+        assert set(volumes.read_volume_usage()) == {"mid", "new"}
+        mock_volume_store.volumes.list.assert_called_once_with(
+            filters={"label": ["ixian.project=project"]}
+        )
+
+    def test_within_budget(self, mock_volume_store):
+        assert volumes.evict_volumes(600) == []
+
+    def test_skip_volumes_in_use(self, mock_volume_store):
+        mock_volume_store.df.return_value["Volumes"][0]["UsageData"]["RefCount"] = 1
+        assert volumes.evict_volumes(150) == [("mid", 200), ("new", 100)]
+
+    def test_skip_volumes_that_fail_to_remove(self, mock_volume_store):
+        [new, old, mid] = mock_volume_store.volumes.list.return_value
+        old.remove.side_effect = docker.errors.APIError("volume is in use")
+        assert volumes.evict_volumes(350) == [("mid", 200), ("new", 100)]
+
+    def test_delete_all_volumes(self, mock_volume_store):
+        assert volumes.delete_all_volumes() == ["new", "old", "mid"]
+        assert volumes.read_volume_usage() == {}
+
+
+class TestComposeVolumes:
+    @pytest.fixture
+    def mock_compose_volumes(self, mock_volume_store):
+        volumes.CONFIG.DOCKER.NAMED_VOLUMES = [
+            "{PROJECT_NAME}.cache_loader",
+            "{PROJECT_NAME}.bower_components",
+            "{PROJECT_NAME}.bower_components",
+            "/host/path",
+            "{PWD}/src",
+        ]
+        # compose created the cache loader volume before it was labeled.
+        unlabeled = [mock_volume("project.cache_loader")]
+        labeled = mock_volume_store.volumes.list.return_value
+        mock_volume_store.volumes.list.side_effect = lambda filters: (
+            unlabeled if "name" in filters else labeled
+        )
+        yield mock_volume_store
+
+    def test_compose_volumes(self, mock_compose_volumes):
+        assert volumes.compose_volumes() == ["project.cache_loader", "project.bower_components"]
+
+    def test_missing_config(self, mock_compose_volumes):
+        def format(value):
+            if "NPM" in value:
+                raise AttributeError("NPM")
+            return value.format(PROJECT_NAME="project", PWD="/project")
+
+        volumes.CONFIG.DOCKER.NAMED_VOLUMES = ["{NPM.VOLUME}", "{PROJECT_NAME}.cache_loader"]
+        volumes.CONFIG.format.side_effect = format
+        assert volumes.compose_volumes() == ["project.cache_loader"]
+
+    def test_prepare_volumes(self, mock_compose_volumes):
+        with mock.patch.object(volumes.time, "time", return_value=10):
+            assert volumes.prepare_volumes() == ["project.bower_components"]
+        mock_compose_volumes.volumes.create.assert_called_once_with(
+            "project.bower_components", labels={"ixian.project": "project"}
+        )
+        usage = volumes.read_volume_usage()
+        assert usage["project.cache_loader"] == 10
+        assert usage["project.bower_components"] == 10
+        assert usage["old"] == 0
+
+    def test_evict_unlabeled(self, mock_compose_volumes):
+        mock_compose_volumes.df.return_value["Volumes"].append(
+            {"Name": "project.cache_loader", "UsageData": {"Size": 500, "RefCount": 0}}
+        )
+        assert volumes.evict_volumes(100) == [
+            ("old", 300),
+            ("project.cache_loader", 500),
+            ("mid", 200),
+        ]
+
+
+class TestVolumeLookup:
+    @pytest.fixture
+    def mock_client(self):
+        with mock.patch.object(volumes, "docker_client") as docker_client:
+            client = docker_client.return_value
+            # name filter matches partial names
+            client.volumes.list.return_value = [
+                mock_volume("project.npm"),
+                mock_volume("project.npm.old"),
+            ]
+            yield client
+
+    def test_find_volumes(self, mock_client):
+        found = volumes.find_volumes("project.npm", "project.bower", labels={"ixian.stage": None})
+        assert list(found) == ["project.npm"]
+        mock_client.volumes.list.assert_called_once_with(
+            filters={"name": ["project.npm", "project.bower"], "label": ["ixian.stage"]}
+        )
+
+    def test_volume_exists(self, mock_client):
+        assert volumes.volume_exists("project.npm")
+        assert not volumes.volume_exists("project")
+        mock_client.images.get.assert_not_called()
+
+    def test_delete_volume(self, mock_client):
+        [npm, npm_old] = mock_client.volumes.list.return_value
+        assert volumes.delete_volume("project.npm", "project.bower") == ["project.npm"]
+        npm.remove.assert_called_once_with(True)
+        npm_old.remove.assert_not_called()
+        assert mock_client.volumes.list.call_count == 1
+
+    def test_delete_no_volumes(self, mock_client):
+        """
+        Nothing is deleted without names, find_volumes would return every volume.
+        """
+        assert volumes.delete_volume() == []
+        mock_client.volumes.list.assert_not_called()
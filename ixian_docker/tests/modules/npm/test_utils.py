@@ -0,0 +1,209 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from unittest import mock
+
+import pytest
+
+from ixian_docker.modules.npm import utils
+from ixian_docker.modules.npm.utils import npm_local_package_index
+
+
+def write_package(path, name=None, **data):
+    path.mkdir(parents=True, exist_ok=True)
+    if name:
+        data["name"] = name
+    (path / "package.json").write_text(json.dumps(data))
+    return path
+
+
+@pytest.fixture
+def monorepo(tmp_path):
+    """
+    Project with local packages referenced in several ways:
+    - file: dependency
+    - nested file: dependency of a local package
+    - workspaces
+    - package-lock.json link
+    """
+    root = write_package(
+        tmp_path / "project",
+        "project",
+        dependencies={"react": "^16.0.0", "alpha": "file:../libs/alpha"},
+        devDependencies={"beta": "file:../libs/beta"},
+        workspaces=["packages/*"],
+    )
+    write_package(tmp_path / "libs" / "alpha", "alpha", dependencies={"gamma": "file:../gamma"})
+    write_package(tmp_path / "libs" / "beta", "beta", dependencies={"alpha": "file:../alpha"})
+    write_package(tmp_path / "libs" / "gamma", "gamma")
+    write_package(root / "packages" / "one", "one")
+    write_package(root / "packages" / "two", "two")
+    write_package(tmp_path / "libs" / "delta", "delta")
+    (root / "package-lock.json").write_text(
+        json.dumps(
+            {
+                "lockfileVersion": 2,
+                "packages": {
+                    "": {"name": "project"},
+                    "node_modules/delta": {"resolved": "../libs/delta", "link": True},
+                    "node_modules/react": {"version": "16.0.0"},
+                },
+            }
+        )
+    )
+    utils.PACKAGE_FILES.clear()
+    utils.LOCAL_PACKAGE_INDEXES.clear()
+    yield tmp_path
+    utils.PACKAGE_FILES.clear()
+    utils.LOCAL_PACKAGE_INDEXES.clear()
+
+
+class TestLocalPackageIndex:
+    def test_index(self, monorepo):
+        index = npm_local_package_index(str(monorepo / "project" / "package.json"))
+        assert index == {
+            "alpha": str(monorepo / "libs" / "alpha"),
+            "beta": str(monorepo / "libs" / "beta"),
+            "gamma": str(monorepo / "libs" / "gamma"),
+            "delta": str(monorepo / "libs" / "delta"),
+            "one": str(monorepo / "project" / "packages" / "one"),
+            "two": str(monorepo / "project" / "packages" / "two"),
+        }
+
+    def test_lock_file_v1(self, monorepo):
+        root = write_package(monorepo / "legacy", "legacy")
+        (root / "package-lock.json").write_text(
+            json.dumps(
+                {
+                    "lockfileVersion": 1,
+                    "dependencies": {
+                        "react": {
+                            "version": "16.0.0",
+                            "dependencies": {"gamma": {"version": "file:../libs/gamma"}},
+                        },
+                    },
+                }
+            )
+        )
+        index = npm_local_package_index(str(root / "package.json"))
+        assert index == {"gamma": str(monorepo / "libs" / "gamma")}
+
+    def test_cached(self, monorepo):
+        """
+        Index is only resolved again when a file read while resolving it changes.
+        """
+        package_json = str(monorepo / "project" / "package.json")
+        index = npm_local_package_index(package_json)
+        with mock.patch.object(utils, "read_package_file") as read_package_file:
+            assert npm_local_package_index(package_json) is index
+            read_package_file.assert_not_called()
+
+        # changing a nested package invalidates the cache
+        write_package(monorepo / "libs" / "gamma", "gamma", dependencies={"epsilon": "file:eps"})
+        write_package(monorepo / "libs" / "gamma" / "eps", "epsilon")
+        index = npm_local_package_index(package_json)
+        assert index["epsilon"] == str(monorepo / "libs" / "gamma" / "eps")
+
+    def test_new_workspace(self, monorepo):
+        """
+        A new directory matching a workspace pattern invalidates the cache.
+        """
+        package_json = str(monorepo / "project" / "package.json")
+        assert "three" not in npm_local_package_index(package_json)
+        write_package(monorepo / "project" / "packages" / "three", "three")
+        index = npm_local_package_index(package_json)
+        assert index["three"] == str(monorepo / "project" / "packages" / "three")
+
+    def test_workspace_package_json_added(self, monorepo):
+        """
+        Adding package.json to a workspace directory invalidates the cache.
+        """
+        package_json = str(monorepo / "project" / "package.json")
+        (monorepo / "project" / "packages" / "three").mkdir()
+        assert "three" not in npm_local_package_index(package_json)
+        write_package(monorepo / "project" / "packages" / "three", "three")
+        assert "three" in npm_local_package_index(package_json)
+
+    def test_duplicate_name(self, monorepo, caplog):
+        """
+        Directories with the same package name are indexed once, with a warning, and all mounted.
+        """
+        package_json = str(monorepo / "project" / "package.json")
+        duplicate = write_package(monorepo / "project" / "packages" / "three", "one")
+        index = npm_local_package_index(package_json)
+        assert index["one"] == str(monorepo / "project" / "packages" / "one")
+        assert "Local package one found in" in caplog.text
+
+        with mock.patch.object(utils, "CONFIG") as config:
+            config.NPM.PACKAGE_JSON = package_json
+            flags = utils.npm_local_package_mount_flags()
+        assert f"{duplicate}:{duplicate}" in flags
+
+    def test_mount_flags_deduplicated(self, monorepo):
+        package_json = str(monorepo / "project" / "package.json")
+        with mock.patch.object(utils, "CONFIG") as config:
+            config.NPM.PACKAGE_JSON = package_json
+            flags = utils.npm_local_package_mount_flags()
+        paths = sorted(npm_local_package_index(package_json).values())
+        assert flags == [f"{path}:{path}" for path in paths]
+
+
+class TestPackageFileHash:
+    IGNORE = ["version", "scripts"]
+
+    def test_ignored_fields(self, tmp_path):
+        """
+        Ignored fields, key order and formatting don't change the hash.
+        """
+        path = tmp_path / "package.json"
+        path.write_text(
+            json.dumps({"name": "a", "version": "1.0.0", "dependencies": {"b": "1", "c": "2"}})
+        )
+        original = utils.package_file_hash(str(path), self.IGNORE)
+
+        path.write_text(
+            json.dumps(
+                {
+                    "dependencies": {"c": "2", "b": "1"},
+                    "scripts": {"test": "jest"},
+                    "version": "1.0.1",
+                    "name": "a",
+                },
+                indent=4,
+            )
+        )
+        assert utils.package_file_hash(str(path), self.IGNORE) == original
+
+        # dependency changes do change the hash
+        path.write_text(json.dumps({"name": "a", "dependencies": {"b": "1", "c": "3"}}))
+        assert utils.package_file_hash(str(path), self.IGNORE) != original
+
+    def test_lock_file_root_package(self):
+        """
+        Root package entry in lock file is normalized too.
+        """
+        lock = {
+            "version": "1.0.0",
+            "packages": {
+                "": {"name": "a", "version": "1.0.0"},
+                "node_modules/b": {"version": "1.0.0"},
+            },
+        }
+        assert utils.normalize_package_file(lock, self.IGNORE) == {
+            "packages": {"": {"name": "a"}, "node_modules/b": {"version": "1.0.0"}}
+        }
+
+    def test_missing_file(self, tmp_path):
+        assert utils.package_file_hash(str(tmp_path / "package-lock.json"), self.IGNORE) is None
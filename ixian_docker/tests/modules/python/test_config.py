@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from unittest import mock
+
 import pytest
 
 from ixian.config import CONFIG
@@ -44,3 +46,22 @@ class TestPythonConfig:
 
     def test_task_hash(self, mock_environment, snapshot):
         snapshot.assert_match(CONFIG.TASKS.BUILD_PYTHON_IMAGE)
+
+
+class TestPipInstallArgs:
+    def test_requirements_and_constraints(self, mock_python_environment):
+        """
+        Every requirements file is installed by one pip command, constrained by every constraints
+        file.
+        """
+        with mock.patch.object(
+            CONFIG.PYTHON, "REQUIREMENTS_FILES", ["{PYTHON.ETC}/base.txt", "{PYTHON.ETC}/dev.txt"]
+        ), mock.patch.object(CONFIG.PYTHON, "CONSTRAINTS_FILES", ["{PYTHON.ETC}/constraints.txt"]):
+            etc = CONFIG.PYTHON.ETC
+            assert CONFIG.PYTHON.PIP_INSTALL_ARGS == (
+                f"-r {etc}/base.txt -r {etc}/dev.txt -c {etc}/constraints.txt"
+            )
+
+    def test_no_constraints(self, mock_python_environment):
+        with mock.patch.object(CONFIG.PYTHON, "CONSTRAINTS_FILES", []):
+            assert CONFIG.PYTHON.PIP_INSTALL_ARGS == f"-r {CONFIG.PYTHON.ETC}/requirements.txt"
@@ -0,0 +1,162 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from ixian.config import CONFIG
+from ixian_docker.modules.docker.utils import images, platforms
+from ixian_docker.modules.docker.utils.report import BUILD, LOCAL_HIT
+
+
+@pytest.fixture
+def tasks(mock_python_environment):
+    """
+    Python tasks module. It's imported once the modules are loaded, task classes read config.
+    """
+    from ixian_docker.modules.python import tasks
+
+    return tasks
+
+
+@pytest.fixture
+def mock_platform():
+    """Native platform is linux/amd64. Docker isn't used to resolve the platform."""
+    with mock.patch.object(
+        platforms, "native_platform", return_value="linux/amd64"
+    ) as native_platform, mock.patch.object(
+        images, "docker_client", side_effect=AssertionError("docker isn't available")
+    ):
+        yield native_platform
+
+
+@pytest.fixture
+def requirements(tmp_path):
+    """Requirements file on the host, PYTHON.HOST_ETC is patched to tmp_path."""
+    path = tmp_path / "requirements.txt"
+    path.write_text("requests==2.22.0\n")
+    with mock.patch.object(
+        type(CONFIG.PYTHON), "HOST_REQUIREMENTS_FILES", [str(path)]
+    ), mock.patch.object(type(CONFIG.PYTHON), "HOST_CONSTRAINTS_FILES", []):
+        yield path
+
+
+class TestWheelhouseHash:
+    def test_platform(self, mock_python_environment, mock_platform):
+        """
+        Platform is the native platform, DOCKER.PLATFORMS for multi-platform builds, or
+        PYTHON.WHEELHOUSE_PLATFORMS if it's set.
+        """
+        assert CONFIG.PYTHON.WHEELHOUSE_PLATFORM == "linux-amd64-glibc"
+        with mock.patch.object(type(CONFIG.DOCKER), "PLATFORMS", ["linux/arm64", "linux/amd64"]):
+            assert CONFIG.PYTHON.WHEELHOUSE_PLATFORM == "linux-amd64,linux-arm64-glibc"
+            with mock.patch.object(type(CONFIG.PYTHON), "WHEELHOUSE_PLATFORMS", ["linux/arm64"]):
+                assert CONFIG.PYTHON.WHEELHOUSE_PLATFORM == "linux-arm64-glibc"
+
+    def test_platform_changes_hash(self, mock_python_environment, mock_platform, requirements):
+        original = CONFIG.PYTHON.WHEELHOUSE_HASH
+        mock_platform.return_value = "linux/arm64"
+        assert CONFIG.PYTHON.WHEELHOUSE_HASH != original
+        mock_platform.return_value = "linux/amd64"
+        CONFIG.PYTHON.LIBC = "musl"
+        try:
+            assert CONFIG.PYTHON.WHEELHOUSE_HASH != original
+        finally:
+            CONFIG.PYTHON.LIBC = "glibc"
+
+    def test_requirements_change_hash(self, mock_python_environment, mock_platform, requirements):
+        original = CONFIG.PYTHON.WHEELHOUSE_HASH
+        requirements.write_text("requests==2.23.0\n")
+        assert CONFIG.PYTHON.WHEELHOUSE_HASH != original
+
+    def test_missing_file(self, mock_python_environment, mock_platform, requirements, caplog):
+        """
+        Missing files are logged and change the hash when they're created.
+        """
+        requirements.unlink()
+        missing = CONFIG.PYTHON.WHEELHOUSE_HASH
+        assert f"Python requirements file doesn't exist: {requirements}" in caplog.text
+        requirements.write_text("")
+        assert CONFIG.PYTHON.WHEELHOUSE_HASH != missing
+
+
+class TestBuildWheelhouseImage:
+    def test_execute(self, tasks, mock_platform, requirements):
+        task = SimpleNamespace(check=[mock.Mock()], __task__=SimpleNamespace(force=False))
+        with mock.patch.object(tasks, "build_image_if_needed") as build, mock.patch.object(
+            tasks, "get_dockerfile", return_value="Dockerfile.wheelhouse"
+        ):
+            tasks.BuildWheelhouseImage.execute(task)
+
+        build.assert_called_once()
+        kwargs = build.call_args[1]
+        assert kwargs["tag"] == CONFIG.PYTHON.WHEELHOUSE_IMAGE_TAG
+        assert kwargs["tag"].startswith(f"wheelhouse-{CONFIG.PYTHON.ABI}-")
+        assert kwargs["stage"] == "wheelhouse"
+        assert kwargs["dockerfile"] == "Dockerfile.wheelhouse"
+        assert kwargs["force"] is False
+        assert kwargs["buildargs"] == {
+            "FROM_REPOSITORY": CONFIG.DOCKER.REPOSITORY,
+            "FROM_TAG": CONFIG.DOCKER.BASE_IMAGE_TAG,
+        }
+
+
+@pytest.fixture
+def mock_python_build(tasks):
+    """Mocks the python image build. The build report has two builds of the python stage."""
+    records = [
+        {"stage": "python", "decision": BUILD, "size": 300, "layers": 8, "timings": {"build": 90}},
+        {"stage": "python", "decision": LOCAL_HIT, "size": 300, "layers": 8, "timings": {}},
+        {"stage": "python", "decision": BUILD, "size": 200, "layers": 5, "timings": {"build": 30}},
+    ]
+    with mock.patch.object(tasks, "build_image_if_needed") as build, mock.patch.object(
+        tasks, "get_dockerfile", return_value="Dockerfile.python"
+    ), mock.patch.object(tasks, "read_build_report", return_value=records), mock.patch.object(
+        tasks, "image_layers", return_value=[]
+    ) as image_layers:
+        yield build, image_layers
+
+
+class TestBuildPythonImage:
+    def execute(self, tasks):
+        task = SimpleNamespace(check=[mock.Mock()], __task__=SimpleNamespace(force=False))
+        tasks.BuildPythonImage.execute(task)
+
+    def test_report(self, tasks, mock_platform, mock_python_build, caplog):
+        """
+        Layers and a comparison with the previous build are logged when the image is built.
+        """
+        build, image_layers = mock_python_build
+        build.return_value = True
+        caplog.set_level("INFO")
+        self.execute(tasks)
+        image_layers.assert_called_once_with(CONFIG.PYTHON.IMAGE)
+        assert "size: 0B  layers: 0  build time: 30.0s" in caplog.text
+        assert (
+            "compared to previous build  size: 300B -> 200B (-100B)  layers: 8 -> 5 (-3)  "
+            "build time: 1m30s -> 30.0s (-1m00s)" in caplog.text
+        )
+
+    def test_not_built(self, tasks, mock_platform, mock_python_build, caplog):
+        """
+        Nothing is reported when an existing image is used.
+        """
+        build, image_layers = mock_python_build
+        build.return_value = False
+        caplog.set_level("INFO")
+        self.execute(tasks)
+        image_layers.assert_not_called()
+        assert "compared to previous build" not in caplog.text
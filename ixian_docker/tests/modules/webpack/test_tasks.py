@@ -0,0 +1,160 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from ixian.exceptions import ExecuteFailed
+
+SOURCE_HASH = "a" * 64
+VOLUME = "unittests.compiled_static.aaaaaaaaaaaaaaaa"
+PREVIOUS_VOLUME = "unittests.compiled_static.bbbbbbbbbbbbbbbb"
+
+
+@pytest.fixture
+def tasks(mock_webpack_environment):
+    """
+    Webpack tasks module. It's imported once the modules are loaded, task classes read config.
+    """
+    from ixian_docker.modules.webpack import tasks
+
+    return tasks
+
+
+@pytest.fixture
+def mock_webpack_volume(tasks):
+    """Mocks volumes, the webpack image and compose. No volume exists for SOURCE_HASH."""
+    with mock.patch.object(tasks, "CONFIG") as config, mock.patch.multiple(
+        tasks,
+        compiled_static_volume=mock.Mock(return_value=VOLUME),
+        volume_exists=mock.Mock(return_value=False),
+        create_compiled_static_volume=mock.DEFAULT,
+        image_source_hash=mock.Mock(return_value=None),
+        copy_compiled_static=mock.DEFAULT,
+        set_compiled_static_volume=mock.DEFAULT,
+        delete_volume=mock.DEFAULT,
+        run=mock.Mock(return_value=0),
+    ):
+        config.WEBPACK.SOURCE_HASH = SOURCE_HASH
+        config.WEBPACK.COMPILED_STATIC_VOLUME = PREVIOUS_VOLUME
+        config.WEBPACK.ARGS = []
+        yield tasks
+
+
+class TestWebpackVolume:
+    def execute(self, tasks):
+        tasks.WebpackVolume.execute(None)
+
+    def test_volume_exists(self, mock_webpack_volume):
+        mock_webpack_volume.volume_exists.return_value = True
+        self.execute(mock_webpack_volume)
+        mock_webpack_volume.create_compiled_static_volume.assert_not_called()
+        mock_webpack_volume.set_compiled_static_volume.assert_called_once_with(VOLUME)
+
+    def test_copy_from_image(self, mock_webpack_volume):
+        mock_webpack_volume.image_source_hash.return_value = SOURCE_HASH
+        self.execute(mock_webpack_volume)
+        mock_webpack_volume.create_compiled_static_volume.assert_called_once_with(SOURCE_HASH)
+        mock_webpack_volume.copy_compiled_static.assert_called_once_with(
+            mock_webpack_volume.CONFIG.WEBPACK.IMAGE, VOLUME
+        )
+        mock_webpack_volume.run.assert_not_called()
+        mock_webpack_volume.set_compiled_static_volume.assert_called_once_with(VOLUME)
+        mock_webpack_volume.delete_volume.assert_not_called()
+
+    def test_compile(self, mock_webpack_volume):
+        self.execute(mock_webpack_volume)
+        mock_webpack_volume.run.assert_called_once_with("./node_modules/.bin/webpack")
+        assert mock_webpack_volume.set_compiled_static_volume.call_args_list == [
+            mock.call(VOLUME),
+            mock.call(VOLUME),
+        ]
+        mock_webpack_volume.delete_volume.assert_not_called()
+
+    def test_compile_failed(self, mock_webpack_volume):
+        mock_webpack_volume.run.return_value = 1
+        with pytest.raises(ExecuteFailed):
+            self.execute(mock_webpack_volume)
+        mock_webpack_volume.delete_volume.assert_called_once_with(VOLUME)
+        mock_webpack_volume.set_compiled_static_volume.assert_called_with(PREVIOUS_VOLUME)
+
+    @pytest.mark.parametrize("failure", ["copy_compiled_static", "run"], ids=["copy", "compose"])
+    @pytest.mark.parametrize("exception", [RuntimeError, KeyboardInterrupt])
+    def test_exception(self, mock_webpack_volume, failure, exception):
+        """
+        A volume that wasn't fully populated is deleted on any error, including Ctrl-C.
+        """
+        mock_webpack_volume.image_source_hash.return_value = (
+            SOURCE_HASH if failure == "copy_compiled_static" else None
+        )
+        getattr(mock_webpack_volume, failure).side_effect = exception
+        with pytest.raises(exception):
+            self.execute(mock_webpack_volume)
+        mock_webpack_volume.delete_volume.assert_called_once_with(VOLUME)
+        mock_webpack_volume.set_compiled_static_volume.assert_called_with(PREVIOUS_VOLUME)
+
+
+@pytest.fixture
+def mock_webpack_build(tasks):
+    """Mocks the webpack image build and the cache image."""
+    with mock.patch.object(tasks, "CONFIG"), mock.patch.multiple(
+        tasks,
+        build_image_if_needed=mock.DEFAULT,
+        get_dockerfile=mock.DEFAULT,
+        get_cache_image=mock.DEFAULT,
+        export_cache_image=mock.DEFAULT,
+    ) as mocks:
+        mocks["get_dockerfile"].return_value = "Dockerfile.webpack"
+        mocks["get_cache_image"].return_value = "project:webpack-cache"
+        yield mocks
+
+
+class TestBuildWebpackImage:
+    def execute(self, tasks, force=False):
+        task = SimpleNamespace(check=[mock.Mock()], __task__=SimpleNamespace(force=force))
+        tasks.BuildWebpackImage.execute(task)
+
+    def test_not_built(self, tasks, mock_webpack_build):
+        """
+        The cache image isn't fetched when an existing image is used.
+        """
+        mock_webpack_build["build_image_if_needed"].return_value = False
+        self.execute(tasks)
+        mock_webpack_build["get_cache_image"].assert_not_called()
+        mock_webpack_build["export_cache_image"].assert_not_called()
+        # the dockerfile is rendered without the cache image
+        [[_, kwargs]] = mock_webpack_build["get_dockerfile"].call_args_list
+        assert kwargs["context"] == {"CACHE_IMAGE": None}
+
+    def test_built(self, tasks, mock_webpack_build):
+        """
+        The dockerfile is rendered with the cache image once a build is needed.
+        """
+        build = mock_webpack_build["build_image_if_needed"]
+        build.side_effect = lambda **kwargs: kwargs["before_build"]() or True
+        self.execute(tasks)
+        mock_webpack_build["get_cache_image"].assert_called_once_with()
+        assert mock_webpack_build["get_dockerfile"].call_args[1]["context"] == {
+            "CACHE_IMAGE": "project:webpack-cache"
+        }
+        mock_webpack_build["export_cache_image"].assert_called_once()
+
+    def test_force(self, tasks, mock_webpack_build):
+        """
+        Forced builds don't use the cache image.
+        """
+        self.execute(tasks, force=True)
+        assert mock_webpack_build["build_image_if_needed"].call_args[1]["before_build"] is None
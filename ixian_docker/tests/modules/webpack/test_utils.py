@@ -0,0 +1,96 @@
+# Copyright [2018-2020] Peter Krenesky
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+import pytest
+
+from ixian_docker.modules.webpack import utils
+
+
+@pytest.fixture
+def mock_cache_config():
+    with mock.patch.object(utils, "CONFIG") as config:
+        config.WEBPACK.REPOSITORY = "repo"
+        config.WEBPACK.CACHE_IMAGE_TAG = "webpack-cache-123"
+        config.WEBPACK.CACHE_IMAGE = "repo:webpack-cache-123"
+        config.WEBPACK.CACHE_PUSH = False
+        yield config
+
+
+class TestCacheImage:
+    @mock.patch.object(utils, "pull_image")
+    @mock.patch.object(utils, "image_exists_in_registry")
+    @mock.patch.object(utils, "image_exists", return_value=True)
+    def test_local(self, image_exists, exists_in_registry, pull_image, mock_cache_config):
+        assert utils.get_cache_image() == "repo:webpack-cache-123"
+        exists_in_registry.assert_not_called()
+        pull_image.assert_not_called()
+
+    @mock.patch.object(utils, "pull_image")
+    @mock.patch.object(utils, "image_exists_in_registry", return_value=True)
+    @mock.patch.object(utils, "image_exists", return_value=False)
+    def test_registry(self, image_exists, exists_in_registry, pull_image, mock_cache_config):
+        assert utils.get_cache_image() == "repo:webpack-cache-123"
+        pull_image.assert_called_once_with("repo", "webpack-cache-123")
+
+    @mock.patch.object(utils, "pull_image")
+    @mock.patch.object(utils, "image_exists_in_registry", return_value=False)
+    @mock.patch.object(utils, "image_exists", return_value=False)
+    def test_missing(self, image_exists, exists_in_registry, pull_image, mock_cache_config):
+        assert utils.get_cache_image() is None
+        pull_image.assert_not_called()
+
+    @pytest.mark.parametrize("push", [True, False])
+    @mock.patch.object(utils, "push_image")
+    @mock.patch.object(utils, "build_image")
+    def test_export(self, build_image, push_image, push, mock_cache_config):
+        mock_cache_config.WEBPACK.CACHE_PUSH = push
+        utils.export_cache_image("Dockerfile", buildargs={"FROM_TAG": "npm"})
+        build_image.assert_called_once_with(
+            "Dockerfile",
+            "repo:webpack-cache-123",
+            target=utils.CACHE_EXPORT_TARGET,
+            buildargs={"FROM_TAG": "npm"},
+        )
+        assert push_image.called == push
+
+
+class TestCompiledStaticVolume:
+    def test_volume_name(self, mock_cache_config):
+        mock_cache_config.WEBPACK.COMPILED_STATIC_VOLUME_PREFIX = "project.compiled_static"
+        assert utils.compiled_static_volume("0123456789abcdef0123") == (
+            "project.compiled_static.0123456789abcdef"
+        )
+
+    @mock.patch.object(utils, "create_volume")
+    def test_create_volume(self, create_volume, mock_cache_config):
+        mock_cache_config.WEBPACK.COMPILED_STATIC_VOLUME_PREFIX = "project.compiled_static"
+        utils.create_compiled_static_volume("0123456789abcdef0123")
+        create_volume.assert_called_once_with(
+            "project.compiled_static.0123456789abcdef",
+            labels={"ixian.stage": "webpack", "ixian.hash": "0123456789abcdef0123"},
+        )
+
+    @mock.patch.object(utils, "docker_client")
+    @mock.patch.object(utils, "image_exists")
+    def test_image_source_hash(self, image_exists, docker_client):
+        image_exists.return_value = False
+        assert utils.image_source_hash("repo:webpack-123") is None
+
+        image_exists.return_value = True
+        docker_client.return_value.images.get.return_value.labels = {
+            utils.SOURCE_HASH_LABEL: "abc"
+        }
+        assert utils.image_source_hash("repo:webpack-123") == "abc"
@@ -1,10 +1,10 @@
 import re
 
 
-def is_valid_hostname(hostname):
+def is_valid_hostname(hostname, require_dot=True):
     if len(hostname) > 255:
         return False
-    if "." not in hostname:
+    if require_dot and "." not in hostname:
         return False
     if hostname[-1] == ".":
         hostname = hostname[:-1]  # strip exactly one dot from the right, if present